@@ -0,0 +1,141 @@
+"""Startup time benchmark for the enferno command.
+
+Runs the CLI in fresh interpreters and fails when startup gets slower than a
+threshold or when commands that need no server import the SSH and template
+stacks again.
+
+Usage:
+    python -m enferno_cli.bench.startup --runs 20 --max-ms 300
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# Modules that only the setup command needs
+HEAVY_MODULES = ("paramiko", "cryptography", "jinja2", "yaml")
+
+COMMANDS = {
+    "--help": ["--help"],
+    "list-tasks": ["list-tasks"],
+}
+
+DEFAULT_RUNS = 10
+DEFAULT_MAX_MS = 400.0
+
+
+def measure_command(args: List[str], runs: int) -> List[float]:
+    """Time a CLI invocation in fresh interpreters.
+
+    Args:
+        args: Arguments passed to `python -m enferno_cli`
+        runs: Number of timed runs
+
+    Returns:
+        Wall times in milliseconds
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "enferno_cli", *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def loaded_heavy_modules(module: str = "enferno_cli.cli") -> List[str]:
+    """List the heavy modules that importing a module pulls in.
+
+    Args:
+        module: Module to import in a fresh interpreter
+
+    Returns:
+        Names from HEAVY_MODULES found in sys.modules after the import
+    """
+    code = (
+        f"import sys, {module}; "
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize timings with the statistics used across the benchmarks.
+
+    Args:
+        samples: Timings in milliseconds
+
+    Returns:
+        Mapping with min, p50, p95, max and mean
+    """
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))
+    return {
+        "min": ordered[0],
+        "p50": statistics.median(ordered),
+        "p95": ordered[p95_index],
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the startup benchmark.
+
+    Args:
+        argv: Command-line arguments, defaults to sys.argv
+
+    Returns:
+        Exit code, 1 if a regression was detected
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="timed runs per command")
+    parser.add_argument("--max-ms", type=float, default=DEFAULT_MAX_MS, help="fail above this median startup time")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {name: summarize(measure_command(command, args.runs)) for name, command in COMMANDS.items()}
+    heavy = loaded_heavy_modules()
+
+    failures = [
+        f"{name} median {stats['p50']:.0f} ms exceeds {args.max_ms:.0f} ms"
+        for name, stats in results.items()
+        if stats["p50"] > args.max_ms
+    ]
+    if heavy:
+        failures.append(f"importing enferno_cli.cli loads {', '.join(heavy)}")
+
+    if args.json:
+        print(json.dumps({"commands": results, "heavy_modules": heavy, "failures": failures}, indent=2))
+    else:
+        table = Table(title=f"CLI startup ({args.runs} runs)")
+        table.add_column("Command")
+        for column in ("min", "p50", "p95", "max"):
+            table.add_column(f"{column} (ms)", justify="right")
+        for name, stats in results.items():
+            table.add_row(name, *(f"{stats[column]:.1f}" for column in ("min", "p50", "p95", "max")))
+        console.print(table)
+        for failure in failures:
+            console.print(f"[bold red]{failure}[/]")
+        if not failures:
+            console.print("[green]Startup within budget[/]")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+"""Benchmark suite for the work every enferno run does.
+
+Times template rendering, task discovery, config loading, plan construction
+and a full setup against the in-process fake server with simulated latency.
+Results can be saved as JSON and compared against a saved baseline.
+
+Usage:
+    enferno bench --save baseline.json
+    enferno bench --baseline baseline.json --tolerance 0.1
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from rich.table import Table
+
+from enferno_cli.bench.startup import summarize
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import QuietSink, RichSink, console, events
+
+GROUPS = ("templates", "registry", "config", "plan", "setup")
+
+DEFAULT_RUNS = 20
+DEFAULT_SETUP_RUNS = 3
+DEFAULT_RTT_MS = 20.0
+DEFAULT_TOLERANCE = 0.10
+
+# Slowdowns smaller than this are timer noise on sub-millisecond benchmarks
+MIN_REGRESSION_MS = 0.5
+
+# Nginx tasks that request certificates; the setup benchmark uses nginx_basic instead
+SSL_TASKS = ("nginx", "nginx_ssl", "nginx_www")
+
+
+def time_calls(func: Callable[[], object], runs: int) -> List[float]:
+    """Time repeated calls of a function.
+
+    Args:
+        func: Function to call
+        runs: Number of timed calls
+
+    Returns:
+        Wall times in milliseconds
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def bench_config() -> ServerConfig:
+    """Build the configuration the benchmarks render and plan for."""
+    return ServerConfig(
+        host="203.0.113.10",
+        server_hostname="bench.example.com",
+        user_name="enferno",
+        password="bench",
+        ssl_email="admin@example.com",
+        postgres_enabled=True,
+        pgbouncer_enabled=True,
+    )
+
+
+def template_vars(config: ServerConfig) -> Dict:
+    """Collect the variables the tasks pass to templates.
+
+    Args:
+        config: Server configuration
+
+    Returns:
+        Sizing, pool and tuning variables computed as the tasks do for a default host
+    """
+    from enferno_cli.core.facts import HostFacts
+    from enferno_cli.core.sizing import size_celery, size_nginx, size_uwsgi
+    from enferno_cli.tasks.database import compute_postgres_settings
+    from enferno_cli.tasks.pgbouncer import PGBOUNCER_PORT, compute_pool_sizes
+
+    facts = HostFacts()
+    uwsgi, celery = size_uwsgi(facts, config), size_celery(facts, config)
+    variables: Dict = {}
+    for sizing in (uwsgi, celery, size_nginx(facts, config)):
+        variables.update(sizing.to_vars())
+    variables.update(compute_pool_sizes(uwsgi, celery), pgbouncer_port=PGBOUNCER_PORT)
+    variables.update(
+        settings=compute_postgres_settings(facts, config.postgres_profile),
+        cpu_count=facts.cpu_count,
+        memory_mb=facts.memory_mb,
+        disk_type=facts.disk_type,
+    )
+    return variables
+
+
+def bench_templates(runs: int) -> Dict[str, Dict]:
+    """Time rendering every template with a fresh renderer, as each task does.
+
+    Args:
+        runs: Timed runs per template
+
+    Returns:
+        Results keyed by 'template:<name>', plus an error entry for templates
+        that cannot be rendered without task-specific variables
+    """
+    from enferno_cli.core.templates import TEMPLATES_DIR, TemplateRenderer
+
+    config = bench_config()
+    variables = template_vars(config)
+    results = {}
+    for path in sorted(TEMPLATES_DIR.iterdir()):
+        if not path.is_file() or path.name.startswith("__"):
+            continue
+
+        def render(name: str = path.name) -> str:
+            return TemplateRenderer(config).render_to_string(name, variables)
+
+        try:
+            render()
+        except Exception as e:
+            results[f"template:{path.name}"] = {"error": str(e)}
+            continue
+        results[f"template:{path.name}"] = summarize(time_calls(render, runs))
+    return results
+
+
+def bench_registry(runs: int) -> Dict[str, Dict]:
+    """Time building the task registry and resolving every task class.
+
+    Args:
+        runs: Timed runs
+
+    Returns:
+        Results for 'registry'
+    """
+    from enferno_cli.core.registry import get_registry
+
+    def discover() -> None:
+        get_registry.cache_clear()
+        registry = get_registry()
+        for name in registry:
+            registry[name]
+
+    return {"registry": summarize(time_calls(discover, runs))}
+
+
+def bench_config_loading(runs: int) -> Dict[str, Dict]:
+    """Time loading a configuration from a .env file.
+
+    Args:
+        runs: Timed runs
+
+    Returns:
+        Results for 'config'
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        env_file = str(Path(tmp) / ".env")
+        with console.capture():
+            bench_config().to_env_file(env_file)
+        return {"config": summarize(time_calls(lambda: ServerConfig.from_env(env_file), runs))}
+
+
+def bench_plan(runs: int) -> Dict[str, Dict]:
+    """Time resolving the default task plan with its dependencies.
+
+    Args:
+        runs: Timed runs
+
+    Returns:
+        Results for 'plan'
+    """
+    from enferno_cli.core.manager import TaskManager
+
+    config = bench_config()
+
+    def plan() -> List[str]:
+        return TaskManager(config).plan()
+
+    with console.capture():
+        return {"plan": summarize(time_calls(plan, runs))}
+
+
+def bench_setup(runs: int, rtt_ms: float) -> Dict[str, Dict]:
+    """Time a full setup against the fake server with simulated round-trip time.
+
+    Args:
+        runs: Timed runs
+        rtt_ms: Simulated round-trip time in milliseconds
+
+    Returns:
+        Results for 'setup', with the command and channel counts of one run
+    """
+    from enferno_cli.core.manager import TaskManager
+    from enferno_cli.core.registry import get_registry
+    from enferno_cli.testing import FakeSSHServer, ScriptedShell
+
+    tasks = [name for name in get_registry().names() if name not in SSL_TASKS]
+    if "nginx_basic" not in tasks:
+        tasks.append("nginx_basic")
+
+    samples = []
+    stats = None
+    for _ in range(runs):
+        with FakeSSHServer(ScriptedShell.ubuntu(), rtt=rtt_ms / 1000) as server:
+            config = server.config(selected_tasks=tasks)
+            events.set_sinks([QuietSink()])
+            success = False
+            try:
+                start = time.perf_counter()
+                success = TaskManager(config).run_setup(preflight=False)
+                samples.append((time.perf_counter() - start) * 1000)
+            finally:
+                events.close(success)
+                events.set_sinks([RichSink()])
+            if not success:
+                raise RuntimeError("Setup against the fake server failed")
+            stats = server.stats
+
+    result = summarize(samples)
+    result.update({"rtt_ms": rtt_ms, "commands": stats.commands, "channels": stats.channels})
+    return {"setup": result}
+
+
+def run_suite(groups: List[str], runs: int, setup_runs: int, rtt_ms: float) -> Dict:
+    """Run the selected benchmark groups.
+
+    Args:
+        groups: Names from GROUPS
+        runs: Timed runs for the in-process benchmarks
+        setup_runs: Timed runs for the setup benchmark
+        rtt_ms: Simulated round-trip time for the setup benchmark
+
+    Returns:
+        Report with environment details and results per benchmark
+    """
+    from enferno_cli import __version__
+
+    benchmarks: Dict[str, Dict] = {}
+    if "templates" in groups:
+        benchmarks.update(bench_templates(runs))
+    if "registry" in groups:
+        benchmarks.update(bench_registry(runs))
+    if "config" in groups:
+        benchmarks.update(bench_config_loading(runs))
+    if "plan" in groups:
+        benchmarks.update(bench_plan(runs))
+    if "setup" in groups:
+        benchmarks.update(bench_setup(setup_runs, rtt_ms))
+
+    return {
+        "enferno_cli": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": benchmarks,
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> Dict[str, float]:
+    """Compare median timings against a baseline report.
+
+    Args:
+        report: Report from run_suite
+        baseline: Earlier report from run_suite
+
+    Returns:
+        Mapping of benchmark name to p50 ratio (current / baseline) for
+        benchmarks present in both reports
+    """
+    ratios = {}
+    for name, result in report["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if "p50" in result and previous and previous.get("p50"):
+            ratios[name] = result["p50"] / previous["p50"]
+    return ratios
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmark suite.
+
+    Args:
+        argv: Command-line arguments, defaults to sys.argv
+
+    Returns:
+        Exit code, 1 if a benchmark regressed against the baseline
+    """
+    parser = argparse.ArgumentParser(prog="enferno bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help=f"comma-separated groups to run ({', '.join(GROUPS)})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="timed runs per in-process benchmark")
+    parser.add_argument("--setup-runs", type=int, default=DEFAULT_SETUP_RUNS, help="timed runs of the setup benchmark")
+    parser.add_argument("--rtt-ms", type=float, default=DEFAULT_RTT_MS, help="simulated round-trip time for setup")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--save", help="write the report to this file, e.g. as a new baseline")
+    parser.add_argument("--baseline", help="compare against a report saved with --save")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed median slowdown against the baseline"
+    )
+    args = parser.parse_args(argv)
+
+    groups = [group.strip() for group in args.only.split(",")] if args.only else list(GROUPS)
+    unknown = [group for group in groups if group not in GROUPS]
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(unknown)}")
+
+    report = run_suite(groups, args.runs, args.setup_runs, args.rtt_ms)
+
+    ratios: Dict[str, float] = {}
+    if args.baseline:
+        ratios = compare(report, json.loads(Path(args.baseline).read_text()))
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "ratios": ratios}
+    # A regression is slower than the tolerance allows and by more than timer noise
+    regressions = {
+        name: ratio for name, ratio in ratios.items()
+        if ratio > 1 + args.tolerance
+        and report["benchmarks"][name]["p50"] * (1 - 1 / ratio) >= MIN_REGRESSION_MS
+    }
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(report, indent=2))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        table = Table(title="enferno bench")
+        table.add_column("Benchmark")
+        for column in ("min", "p50", "p95", "max"):
+            table.add_column(f"{column} (ms)", justify="right")
+        if ratios:
+            table.add_column("vs baseline", justify="right")
+        for name, result in report["benchmarks"].items():
+            if "error" in result:
+                row = [name, "[yellow]not rendered[/]", "", "", ""]
+            else:
+                row = [name, *(f"{result[column]:.2f}" for column in ("min", "p50", "p95", "max"))]
+            if ratios:
+                ratio = ratios.get(name)
+                style = "bold red" if name in regressions else "green"
+                row.append(f"[{style}]{ratio:.2f}x[/]" if ratio else "")
+            table.add_row(*row)
+        console.print(table)
+        if "setup" in report["benchmarks"]:
+            setup = report["benchmarks"]["setup"]
+            console.print(
+                f"Setup ran every task with nginx_basic instead of the SSL nginx tasks: {setup['commands']} commands over "
+                f"{setup['channels']} channels at {setup['rtt_ms']:.0f} ms RTT"
+            )
+        for name, ratio in regressions.items():
+            console.print(f"[bold red]{name} is {(ratio - 1) * 100:.0f}% slower than the baseline[/]")
+        if args.save:
+            console.print(f"Report written to [bold green]{args.save}[/]")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
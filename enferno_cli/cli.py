@@ -4,12 +4,10 @@ import sys
 from typing import List, Optional
 
 import click
-from rich.console import Console
+import rich
 
 from enferno_cli.core.config import ServerConfig
-from enferno_cli.core.manager import TaskManager
-
-console = Console()
+from enferno_cli.core.events import EventSink, JsonLinesSink, QuietSink, RichSink, console, events
 
 
 @click.group()
@@ -75,6 +73,75 @@ def cli():
     help="Set up PostgreSQL database",
     default=False,
 )
+@click.option(
+    "--pgbouncer",
+    is_flag=True,
+    help="Pool PostgreSQL connections through PgBouncer (requires --postgres)",
+    default=False,
+)
+@click.option(
+    "--skip-preflight",
+    is_flag=True,
+    help="Skip the DNS, port, disk, apt and sudo checks that run before the first task",
+    default=False,
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    help="Record task, command and transfer timings, print a summary and write a Chrome trace (Perfetto) JSON to this path",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+)
+@click.option(
+    "--events",
+    "events_path",
+    help="Write progress as newline-delimited JSON events to this file ('-' for stdout, console output then goes to stderr)",
+    default=None,
+)
+@click.option(
+    "--quiet",
+    is_flag=True,
+    help="Hold back progress output and only show it if setup fails",
+    default=False,
+)
+@click.option(
+    "--local",
+    is_flag=True,
+    help="Provision the machine this command runs on (image builds, cloud-init) without SSH",
+    default=False,
+)
+@click.option(
+    "--record",
+    "record_path",
+    help="Record every command, result, timing and transfer to this session file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+)
+@click.option(
+    "--replay",
+    "replay_path",
+    help="Replay a recorded session file instead of connecting to the server (skips preflight checks)",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--acme-server",
+    help="ACME directory URL for certificates (e.g. Let's Encrypt staging or a local test CA)",
+    default=None,
+)
+@click.option(
+    "--remote-helper",
+    is_flag=True,
+    help="Run every operation through a Python helper on one SSH channel instead of a channel per command",
+    default=False,
+)
+@click.option(
+    "--compile",
+    "compiled",
+    is_flag=True,
+    help="Compile the tasks into shell bundles that run on the server, uploaded once each (for slow or flaky links)",
+    default=False,
+)
 def setup(
     host: Optional[str],
     env_file: str,
@@ -86,8 +153,32 @@ def setup(
     skip_ssl: bool,
     use_www: bool,
     postgres: bool,
+    pgbouncer: bool,
+    skip_preflight: bool,
+    profile_path: Optional[str],
+    events_path: Optional[str],
+    quiet: bool,
+    local: bool,
+    record_path: Optional[str],
+    replay_path: Optional[str],
+    acme_server: Optional[str],
+    remote_helper: bool,
+    compiled: bool,
 ):
     """Set up a server with Enferno framework."""
+    # Imported here so that --help and other commands skip paramiko and jinja2
+    from enferno_cli.core.agent import AgentTransport, agent_running
+    from enferno_cli.core.local import LocalTransport
+    from enferno_cli.core.manager import TaskManager
+    from enferno_cli.core.profiler import profiler
+    from enferno_cli.core.registry import get_registry
+    from enferno_cli.core.session import RecordingSSHClient, ReplayTransport
+    
+    # Keep stdout pure JSON, before anything is printed (interactive prompts use Rich's global console)
+    if events_path == "-":
+        console.file = sys.stderr
+        rich.reconfigure(stderr=True)
+    
     # Try to load configuration from .env file
     config = ServerConfig.from_env(env_file)
     
@@ -109,9 +200,32 @@ def setup(
             config.postgres_enabled = True
             if "database" not in config.selected_tasks and not tasks:
                 config.selected_tasks.append("database")
+            if "postgres_tune" not in config.selected_tasks and not tasks:
+                config.selected_tasks.append("postgres_tune")
+        if pgbouncer:
+            config.pgbouncer_enabled = True
+            if "pgbouncer" not in config.selected_tasks and not tasks:
+                config.selected_tasks.append("pgbouncer")
         if use_www:
             config.use_www = True
     
+    if acme_server:
+        config.acme_server = acme_server
+    if remote_helper:
+        config.remote_helper = True
+    
+    if record_path and replay_path:
+        console.print("[bold red]Error: --record and --replay cannot be combined[/]")
+        sys.exit(1)
+    if local and (record_path or replay_path):
+        console.print("[bold red]Error: --local cannot be combined with --record or --replay[/]")
+        sys.exit(1)
+    if compiled and (local or replay_path):
+        console.print("[bold red]Error: --compile cannot be combined with --local or --replay[/]")
+        sys.exit(1)
+    if local and not config.host:
+        config.host = "localhost"
+    
     # Validate configuration
     if not config.host:
         console.print("[bold red]Error: No host specified[/]")
@@ -129,8 +243,7 @@ def setup(
         # If tasks are not explicitly specified, replace 'nginx' or 'nginx_ssl' or 'nginx_www' with 'nginx_basic'
         if not config.selected_tasks:
             # Get all available tasks
-            manager = TaskManager(config)
-            all_tasks = manager.get_task_names()
+            all_tasks = get_registry().names()
             # Filter out nginx tasks
             config.selected_tasks = [t for t in all_tasks if t not in ["nginx", "nginx_ssl", "nginx_www"]]
             # Add nginx_basic
@@ -155,9 +268,43 @@ def setup(
     # Validate selected tasks
     config.validate_selected_tasks()
     
+    # Choose where progress goes
+    sinks: List[EventSink] = [QuietSink() if quiet else RichSink()]
+    if events_path == "-":
+        sinks.append(JsonLinesSink(sys.stdout))
+    elif events_path:
+        sinks.append(JsonLinesSink(open(events_path, "w"), close_stream=True))
+    events.set_sinks(sinks)
+    
     # Run setup
-    manager = TaskManager(config)
-    success = manager.run_setup()
+    if profile_path:
+        profiler.enable()
+    
+    ssh = None
+    if local:
+        ssh = LocalTransport(config)
+    elif not record_path and not replay_path and agent_running():
+        ssh = AgentTransport(config)
+    elif record_path:
+        ssh = RecordingSSHClient(config, record_path)
+    elif replay_path:
+        try:
+            ssh = ReplayTransport(config, replay_path)
+        except (OSError, ValueError) as e:
+            console.print(f"[bold red]Error: Cannot replay {replay_path}: {e}[/]")
+            sys.exit(1)
+        # DNS and port checks would test the live network, not the recording
+        skip_preflight = True
+    
+    manager = TaskManager(config, ssh)
+    success = False
+    try:
+        success = manager.run_setup(preflight=not skip_preflight, compiled=compiled)
+    finally:
+        events.close(success)
+        if profile_path:
+            profiler.summary()
+            profiler.export_chrome_trace(profile_path)
     
     if not success:
         sys.exit(1)
@@ -194,20 +341,93 @@ def setup(
 @cli.command()
 def list_tasks():
     """List available tasks for Enferno server setup."""
-    # Create a dummy config for task discovery
-    config = ServerConfig(
-        host="localhost",
-        server_hostname="example.com",
-        user_name="user",
-        password="password",
-    )
+    from enferno_cli.core.registry import get_registry
     
-    manager = TaskManager(config)
-    tasks = manager.get_task_names()
+    tasks = get_registry()
     
     console.print("[bold]Available tasks for Enferno server setup:[/]")
-    for task in sorted(tasks):
-        console.print(f"- {task}")
+    for name in sorted(tasks):
+        console.print(f"- {name}")
+
+
+@cli.command(
+    context_settings={"ignore_unknown_options": True, "help_option_names": []},
+    add_help_option=False,
+)
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+def bench(args):
+    """Benchmark template rendering, task discovery, config loading, planning and setup (see bench --help)."""
+    from enferno_cli.bench.suite import main as bench_main
+    
+    sys.exit(bench_main(list(args)))
+
+
+@cli.group()
+def agent():
+    """Keep SSH connections open between runs in a background agent."""
+    pass
+
+
+@agent.command("start")
+@click.option(
+    "--idle",
+    help="Seconds to keep an unused connection open; the agent exits when it has none left",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--foreground",
+    is_flag=True,
+    help="Run in this terminal instead of in the background",
+    default=False,
+)
+def agent_start(idle: Optional[float], foreground: bool):
+    """Start the connection agent; setup attaches to it automatically."""
+    from enferno_cli.core.agent import DEFAULT_IDLE, ConnectionAgent, agent_running, default_socket_path, start_agent
+    
+    path = default_socket_path()
+    idle = DEFAULT_IDLE if idle is None else idle
+    if agent_running(path):
+        console.print(f"[yellow]An agent is already running on {path}[/]")
+        return
+    if foreground:
+        ConnectionAgent(path, idle).serve()
+    elif start_agent(path, idle):
+        console.print(f"[bold green]Agent started on {path} (idle timeout {idle:g}s)[/]")
+    else:
+        console.print("[bold red]Error: The agent did not start[/]")
+        sys.exit(1)
+
+
+@agent.command("status")
+def agent_status():
+    """Show the connections the agent holds."""
+    from enferno_cli.core.agent import agent_running, default_socket_path, request
+    
+    path = default_socket_path()
+    if not agent_running(path):
+        console.print("No agent running")
+        return
+    status = request(path, {"op": "status"})
+    console.print(f"Agent {status['pid']} on {path} (idle timeout {status['idle']:g}s)")
+    for host in status["hosts"]:
+        console.print(
+            f"- {host['user']}@{host['host']}:{host['port']}: {host['commands']} commands, "
+            f"{host['attached']} attached, idle {host['idle']:g}s"
+        )
+
+
+@agent.command("stop")
+def agent_stop():
+    """Stop the agent and close its connections."""
+    from enferno_cli.core.agent import agent_running, default_socket_path, request
+    
+    path = default_socket_path()
+    if not agent_running(path):
+        console.print("No agent running")
+        return
+    request(path, {"op": "stop"})
+    console.print("[bold green]Agent stopped[/]")
 
 
 def main():
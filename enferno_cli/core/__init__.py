@@ -1,9 +1,27 @@
 """Core functionality for server setup."""
 
-from enferno_cli.core.config import ServerConfig
-from enferno_cli.core.manager import TaskManager
-from enferno_cli.core.ssh import SSHClient
-from enferno_cli.core.task import Task
-from enferno_cli.core.templates import TemplateRenderer
+from importlib import import_module
 
-__all__ = ["ServerConfig", "TaskManager", "SSHClient", "Task", "TemplateRenderer"] 
\ No newline at end of file
+# Exports are imported on first access so that `import enferno_cli.core.config`
+# does not pull in paramiko and jinja2 (PEP 562)
+_EXPORTS = {
+    "ServerConfig": "enferno_cli.core.config",
+    "TaskManager": "enferno_cli.core.manager",
+    "SSHClient": "enferno_cli.core.ssh",
+    "AgentTransport": "enferno_cli.core.agent",
+    "LocalTransport": "enferno_cli.core.local",
+    "Transport": "enferno_cli.core.transport",
+    "Task": "enferno_cli.core.task",
+    "TemplateRenderer": "enferno_cli.core.templates",
+}
+
+__all__ = ["ServerConfig", "TaskManager", "SSHClient", "AgentTransport", "LocalTransport", "Transport", "Task", "TemplateRenderer"]
+
+
+def __getattr__(name):
+    """Import an exported name on first access."""
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
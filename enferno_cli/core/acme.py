@@ -0,0 +1,212 @@
+"""ACME certificate issuance scheduling shared by every run on this machine."""
+
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from enferno_cli.core.events import console
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; runs there are not serialized
+    fcntl = None
+
+LETSENCRYPT_DIRECTORY = "https://acme-v02.api.letsencrypt.org/directory"
+
+# Local state shared by concurrent enferno processes
+STATE_DIR = Path.home() / ".enferno"
+LEDGER_FILE = STATE_DIR / "acme-ledger.json"
+LOCK_FILE = STATE_DIR / "acme.lock"
+
+# Let's Encrypt production limits, kept slightly below the published values
+CERTIFICATES_PER_REGISTERED_DOMAIN = 45
+CERTIFICATES_PER_REGISTERED_DOMAIN_WINDOW = 7 * 24 * 3600
+DUPLICATE_CERTIFICATES = 4
+DUPLICATE_CERTIFICATES_WINDOW = 7 * 24 * 3600
+FAILED_VALIDATIONS_PER_HOSTNAME = 4
+FAILED_VALIDATIONS_WINDOW = 3600
+
+# Existing certificates valid for at least this long are reused instead of reissued
+REUSE_MIN_VALIDITY = 30 * 24 * 3600
+
+# Public suffixes with two labels; other names use the last label as the suffix
+MULTI_LABEL_SUFFIXES = {
+    "co.uk", "org.uk", "ac.uk", "gov.uk", "me.uk", "ltd.uk", "plc.uk",
+    "com.au", "net.au", "org.au", "edu.au", "gov.au",
+    "co.nz", "org.nz", "net.nz",
+    "co.jp", "ne.jp", "or.jp",
+    "co.za", "org.za",
+    "com.br", "net.br", "org.br",
+    "com.cn", "net.cn", "org.cn",
+    "com.tr", "com.mx", "com.ar", "com.sg", "com.my", "com.hk", "com.tw",
+    "co.in", "net.in", "org.in", "co.il", "co.kr", "or.kr",
+}
+
+
+def registered_domain(hostname: str) -> str:
+    """Return the registered domain that Let's Encrypt counts a hostname against.
+
+    This uses a short list of common multi-label public suffixes rather than the
+    full Public Suffix List, which is enough to group the hosts of one fleet.
+
+    Args:
+        hostname: Fully qualified host name
+
+    Returns:
+        Registered domain, e.g. 'example.co.uk' for 'www.example.co.uk'
+    """
+    labels = hostname.lower().rstrip(".").split(".")
+    suffix_labels = 2 if ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES else 1
+    return ".".join(labels[-(suffix_labels + 1):])
+
+
+def certificate_matches(
+    cert_text: str, domains: List[str], key_type: str, server: str, renewal_server: Optional[str]
+) -> bool:
+    """Check whether an existing certificate can be reused for a request.
+
+    Args:
+        cert_text: Output of `openssl x509 -noout -text` for the certificate
+        domains: Domains the certificate must cover
+        key_type: Requested key type ('ecdsa' or 'rsa')
+        server: ACME directory the certificate should come from
+        renewal_server: ACME directory recorded in the certbot renewal config
+
+    Returns:
+        True if the certificate covers the domains with the requested key type and CA
+    """
+    names = {name.lower() for name in re.findall(r"DNS:([^,\s]+)", cert_text)}
+    if not {domain.lower() for domain in domains} <= names:
+        return False
+
+    algorithm = "id-ecPublicKey" if key_type == "ecdsa" else "rsaEncryption"
+    if f"Public Key Algorithm: {algorithm}" not in cert_text:
+        return False
+
+    return (renewal_server or LETSENCRYPT_DIRECTORY) == server
+
+
+class IssuanceLedger:
+    """Record of recent certificate issuances, shared through a file lock."""
+
+    def __init__(self, path: Path = LEDGER_FILE, lock_path: Path = LOCK_FILE):
+        """Initialize the ledger with its state and lock files."""
+        self.path = path
+        self.lock_path = lock_path
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """Hold the exclusive issuance lock for the duration of the block."""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    console.print("[yellow]Waiting for another certificate issuance to finish...[/]")
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> List[Dict]:
+        """Load ledger entries, dropping those older than every limit window."""
+        try:
+            entries = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return []
+
+        horizon = time.time() - max(CERTIFICATES_PER_REGISTERED_DOMAIN_WINDOW, DUPLICATE_CERTIFICATES_WINDOW)
+        return [entry for entry in entries if entry.get("time", 0) >= horizon]
+
+    def save(self, entries: List[Dict]) -> None:
+        """Write ledger entries atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(entries, indent=2))
+        os.replace(tmp_path, self.path)
+
+    def check_budget(self, entries: List[Dict], domains: List[str], server: str) -> Optional[str]:
+        """Check a request against the rate limit budget.
+
+        Args:
+            entries: Current ledger entries
+            domains: Domains of the requested certificate
+            server: ACME directory the request goes to
+
+        Returns:
+            Reason the request would exceed a limit, or None if it fits the budget
+        """
+        now = time.time()
+        names = sorted(domain.lower() for domain in domains)
+        same_server = [entry for entry in entries if entry["server"] == server]
+
+        for domain in {registered_domain(name) for name in names}:
+            issued = [
+                entry for entry in same_server
+                if entry["success"]
+                and domain in entry["registered_domains"]
+                and entry["time"] >= now - CERTIFICATES_PER_REGISTERED_DOMAIN_WINDOW
+            ]
+            if len(issued) >= CERTIFICATES_PER_REGISTERED_DOMAIN:
+                return f"{len(issued)} certificates were issued for {domain} in the last 7 days"
+
+        duplicates = [
+            entry for entry in same_server
+            if entry["success"]
+            and entry["domains"] == names
+            and entry["time"] >= now - DUPLICATE_CERTIFICATES_WINDOW
+        ]
+        if len(duplicates) >= DUPLICATE_CERTIFICATES:
+            return f"{len(duplicates)} certificates for {', '.join(names)} were issued in the last 7 days"
+
+        for name in names:
+            failures = [
+                entry for entry in same_server
+                if not entry["success"]
+                and name in entry["domains"]
+                and entry["time"] >= now - FAILED_VALIDATIONS_WINDOW
+            ]
+            if len(failures) >= FAILED_VALIDATIONS_PER_HOSTNAME:
+                return f"{len(failures)} issuances for {name} failed in the last hour"
+
+        return None
+
+    def issue(self, domains: List[str], server: str, issue: Callable[[], bool]) -> bool:
+        """Run an issuance if it fits the budget, serialized with other runs.
+
+        Args:
+            domains: Domains of the requested certificate
+            server: ACME directory the request goes to
+            issue: Callable that performs the issuance and returns success
+
+        Returns:
+            True if the certificate was issued, False otherwise
+        """
+        names = sorted(domain.lower() for domain in domains)
+        with self.locked():
+            entries = self.load()
+            reason = self.check_budget(entries, names, server)
+            if reason:
+                console.print(f"[bold red]Not requesting a certificate: {reason}. Try again later.[/]")
+                return False
+
+            success = issue()
+
+            # Reload in case a process without the lock (e.g. on Windows) wrote meanwhile
+            entries = self.load()
+            entries.append({
+                "time": time.time(),
+                "server": server,
+                "domains": names,
+                "registered_domains": sorted({registered_domain(name) for name in names}),
+                "success": success,
+            })
+            self.save(entries)
+            return success
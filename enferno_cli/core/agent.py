@@ -0,0 +1,472 @@
+"""Background agent that keeps authenticated SSH connections open between runs.
+
+Like OpenSSH's ControlMaster, the agent holds one paramiko connection per host
+and user for an idle period. CLI invocations attach to it over a unix socket
+and send their commands and file transfers through it, so a repeated run
+starts executing without a new TCP connection, key exchange or authentication.
+
+The protocol is one JSON object per line in each direction. A client sends an
+'attach' request for a host first, then 'exec', 'put', 'get' and 'stat'
+requests that run on that host's connection. File paths on the client side
+are read and written by the agent, which runs as the same user on the same
+machine.
+
+Usage:
+    enferno agent start --idle 600
+    enferno agent status
+    enferno agent stop
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
+from enferno_cli.core.profiler import SSH, profiler
+from enferno_cli.core.ssh import SSHClient
+from enferno_cli.core.transport import Transport
+
+DEFAULT_IDLE = 600
+
+# How often the agent checks for idle connections, in seconds
+REAP_INTERVAL = 1.0
+
+# How long `enferno agent start` waits for the socket to accept connections
+START_TIMEOUT = 5.0
+
+# Errors that are re-raised with their own type on the client side
+_ERROR_TYPES = {"FileNotFoundError": FileNotFoundError, "TimeoutError": TimeoutError}
+
+HostKey = Tuple[str, int, str, Optional[str]]
+
+
+def default_socket_path() -> Path:
+    """Return the agent socket path for the current user.
+
+    ENFERNO_AGENT_SOCKET overrides the default, which is a private directory
+    under XDG_RUNTIME_DIR or the system temporary directory.
+    """
+    if os.getenv("ENFERNO_AGENT_SOCKET"):
+        return Path(os.environ["ENFERNO_AGENT_SOCKET"])
+    base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"enferno-agent-{os.getuid()}" / "agent.sock"
+
+
+def host_key(config: ServerConfig) -> HostKey:
+    """Identify the connection a configuration needs."""
+    return (config.host, config.ssh_port, config.ansible_user, config.ssh_key_path)
+
+
+def request(path: Union[str, Path], message: Dict, timeout: Optional[float] = 5.0) -> Dict:
+    """Send a single request to the agent and return its reply.
+
+    Args:
+        path: Agent socket path
+        message: Request to send
+        timeout: Socket timeout in seconds
+
+    Returns:
+        The agent's reply
+
+    Raises:
+        OSError: If the agent is not running
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        stream = sock.makefile("rwb")
+        stream.write(json.dumps(message).encode("utf-8") + b"\n")
+        stream.flush()
+        line = stream.readline()
+    if not line:
+        raise ConnectionError("Agent closed the connection")
+    return json.loads(line)
+
+
+def agent_running(path: Union[str, Path, None] = None) -> bool:
+    """Check whether an agent answers on the socket.
+
+    Args:
+        path: Agent socket path, defaults to default_socket_path()
+
+    Returns:
+        True if an agent replied to a ping
+    """
+    path = path or default_socket_path()
+    if not os.path.exists(path):
+        return False
+    try:
+        return request(path, {"op": "ping"}, timeout=1.0).get("ok", False)
+    except (OSError, ValueError):
+        return False
+
+
+def start_agent(path: Union[str, Path, None] = None, idle: float = DEFAULT_IDLE) -> bool:
+    """Start an agent in a detached background process.
+
+    Args:
+        path: Agent socket path, defaults to default_socket_path()
+        idle: Seconds to keep an unused connection open
+
+    Returns:
+        True once the agent accepts connections, False if it did not come up
+    """
+    path = path or default_socket_path()
+    subprocess.Popen(
+        [sys.executable, "-m", "enferno_cli.core.agent", "--socket", str(path), "--idle", str(idle)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if agent_running(path):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@dataclass
+class _Host:
+    """A connection held by the agent."""
+
+    client: SSHClient
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    last_used: float = field(default_factory=time.monotonic)
+    # Attached clients currently using the connection
+    users: int = 0
+    commands: int = 0
+
+
+class ConnectionAgent:
+    """Serve SSH connections to CLI invocations over a unix socket."""
+
+    def __init__(self, path: Union[str, Path], idle: float = DEFAULT_IDLE):
+        """Initialize the agent.
+
+        Args:
+            path: Socket path to listen on
+            idle: Seconds to keep a connection open after its last use; the
+                agent exits once it has had no connections for this long
+        """
+        self.path = Path(path)
+        self.idle = idle
+        self.hosts: Dict[HostKey, _Host] = {}
+        self.lock = threading.Lock()
+        self.clients = 0
+        self.last_activity = time.monotonic()
+        self.stopping = threading.Event()
+
+    def serve(self) -> None:
+        """Listen until stopped or idle, then close every connection."""
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Fails for a directory someone else created in a shared location
+        os.chmod(self.path.parent, 0o700)
+        if self.path.exists():
+            if agent_running(self.path):
+                raise RuntimeError(f"An agent is already listening on {self.path}")
+            self.path.unlink()
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the current user may attach; the socket hands out root shells
+        old_umask = os.umask(0o177)
+        try:
+            listener.bind(str(self.path))
+        finally:
+            os.umask(old_umask)
+        listener.listen()
+        listener.settimeout(REAP_INTERVAL)
+        console.print(f"[bold green]Agent listening on {self.path} (idle timeout {self.idle:g}s)[/]")
+
+        try:
+            while not self.stopping.is_set():
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    self._reap()
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+            if self.path.exists():
+                self.path.unlink()
+            with self.lock:
+                hosts, self.hosts = list(self.hosts.values()), {}
+            for host in hosts:
+                host.client.disconnect()
+            console.print("[bold green]Agent stopped[/]")
+
+    def _reap(self) -> None:
+        """Close connections idle past the timeout and stop when nothing is left."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                key for key, host in self.hosts.items()
+                if host.users == 0 and now - host.last_used > self.idle
+            ]
+            closing = [self.hosts.pop(key) for key in expired]
+            if not self.hosts and self.clients == 0 and now - self.last_activity > self.idle:
+                self.stopping.set()
+        for host in closing:
+            console.print(f"Closing idle connection to {host.client.config.host}")
+            host.client.disconnect()
+
+    def _handle(self, conn: socket.socket) -> None:
+        """Serve one attached client until it disconnects."""
+        with self.lock:
+            self.clients += 1
+        host: Optional[_Host] = None
+        try:
+            stream = conn.makefile("rwb")
+            for line in stream:
+                message = json.loads(line)
+                try:
+                    if message["op"] == "attach":
+                        if host is None:
+                            host, reply = self._attach(message)
+                        else:
+                            reply = {"ok": False, "error": "Already attached"}
+                    else:
+                        reply = self._dispatch(message, host)
+                except Exception as e:
+                    reply = {"ok": False, "error": str(e), "type": type(e).__name__}
+                stream.write(json.dumps(reply).encode("utf-8") + b"\n")
+                stream.flush()
+        except (OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+            with self.lock:
+                self.clients -= 1
+                self.last_activity = time.monotonic()
+                if host is not None:
+                    host.users -= 1
+                    host.last_used = time.monotonic()
+
+    def _attach(self, message: Dict) -> Tuple[_Host, Dict]:
+        """Find or open the connection for a client's host.
+
+        Args:
+            message: Attach request with host, port, user, key, password and
+                whether to run commands through the remote helper
+
+        Returns:
+            Tuple of (host entry, reply)
+        """
+        config = ServerConfig(
+            host=message["host"],
+            server_hostname=message["host"],
+            user_name="",
+            password=message.get("password") or "",
+            ssh_port=message["port"],
+            ssh_key_path=message.get("key"),
+            ansible_user=message["user"],
+            remote_helper=bool(message.get("remote_helper")),
+        )
+        key = host_key(config)
+        with self.lock:
+            host = self.hosts.get(key)
+            if host is None:
+                host = self.hosts[key] = _Host(SSHClient(config))
+            host.users += 1
+
+        reused = True
+        try:
+            # Other clients for the same host wait here instead of opening a second connection
+            with host.lock:
+                client = host.client
+                if not client.is_active():
+                    reused = False
+                    # A helper on a dropped connection went with it
+                    client.helper = None
+                    client.open()
+                if config.remote_helper and client.helper is None:
+                    from enferno_cli.core.helper import start_helper
+                    
+                    client.helper = start_helper(client.client, config.ansible_user, config.use_sudo)
+        except Exception:
+            with self.lock:
+                host.users -= 1
+                if self.hosts.get(key) is host and host.users == 0:
+                    del self.hosts[key]
+            raise
+        helper = host.client.helper
+        return host, {"ok": True, "reused": reused, "helper": helper.info.get("python") if helper else None}
+
+    def _dispatch(self, message: Dict, host: Optional[_Host]) -> Dict:
+        """Handle a request other than attach."""
+        op = message["op"]
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "status":
+            return {"ok": True, "pid": os.getpid(), "idle": self.idle, "hosts": self.status()}
+        if op == "stop":
+            self.stopping.set()
+            return {"ok": True}
+        if host is None:
+            return {"ok": False, "error": "Not attached to a host"}
+
+        host.last_used = time.monotonic()
+        client = host.client
+        if op == "exec":
+            host.commands += 1
+            exit_code, stdout, stderr = client._exec(message["cmd"], message["timeout"])
+            return {"ok": True, "rc": exit_code, "out": stdout, "err": stderr}
+        if op == "put":
+            client._put(message["local"], message["remote"])
+            return {"ok": True}
+        if op == "get":
+            client._get(message["remote"], message["local"])
+            return {"ok": True}
+        if op == "stat":
+            return {"ok": True, "exists": client._stat(message["remote"])}
+        return {"ok": False, "error": f"Unknown operation {op!r}"}
+
+    def status(self) -> List[Dict]:
+        """Describe the open connections."""
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "host": host.client.config.host,
+                    "port": host.client.config.ssh_port,
+                    "user": host.client.config.ansible_user,
+                    "attached": host.users,
+                    "commands": host.commands,
+                    "idle": round(now - host.last_used, 1),
+                }
+                for host in self.hosts.values()
+            ]
+
+
+class AgentTransport(Transport):
+    """Transport that runs everything through a connection held by the agent."""
+
+    def __init__(self, config: ServerConfig, path: Union[str, Path, None] = None):
+        """Initialize the transport.
+
+        Args:
+            config: Server configuration
+            path: Agent socket path, defaults to default_socket_path()
+        """
+        super().__init__(config)
+        self.path = Path(path or default_socket_path())
+        self.sock: Optional[socket.socket] = None
+        self.stream = None
+        # Serializes requests from threads sharing this transport
+        self.lock = threading.Lock()
+
+    def connect(self) -> bool:
+        """Attach to the agent's connection for this host, opening it if needed."""
+        try:
+            with profiler.span(f"attach {self.config.host}", SSH):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.connect(str(self.path))
+                self.stream = self.sock.makefile("rwb")
+                reply = self._request(
+                    op="attach",
+                    host=self.config.host,
+                    port=self.config.ssh_port,
+                    user=self.config.ansible_user,
+                    key=os.path.expanduser(self.config.ssh_key_path) if self.config.ssh_key_path else None,
+                    password=None if self.config.ssh_key_path else self.config.password,
+                    remote_helper=self.config.remote_helper,
+                )
+        except Exception as e:
+            self._close()
+            console.print(f"[bold red]Failed to connect through the agent: {str(e)}[/]")
+            return False
+
+        self._connected = True
+        how = "reused agent connection" if reply["reused"] else "new agent connection"
+        console.print(f"[bold green]Connected to {self.config.host} ({how})[/]")
+        if reply.get("helper"):
+            console.print(f"[green]Remote helper running in the agent (Python {reply['helper']})[/]")
+        elif self.config.remote_helper:
+            console.print("[yellow]The agent could not start the remote helper; using a channel per command[/]")
+        return True
+
+    def disconnect(self) -> None:
+        """Detach from the agent, which keeps the connection open."""
+        if self._connected:
+            self._close()
+            self._connected = False
+            console.print(f"[bold green]Detached from {self.config.host}; the agent keeps the connection open[/]")
+
+    def _close(self) -> None:
+        """Close the socket to the agent."""
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = self.stream = None
+
+    def _request(self, **message) -> Dict:
+        """Send a request on the attached socket and wait for the reply.
+
+        Raises:
+            ConnectionError: If the agent went away
+            FileNotFoundError, TimeoutError, RuntimeError: If the operation failed in the agent
+        """
+        with self.lock:
+            self.stream.write(json.dumps(message).encode("utf-8") + b"\n")
+            self.stream.flush()
+            line = self.stream.readline()
+        if not line:
+            raise ConnectionError("Agent closed the connection")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise _ERROR_TYPES.get(reply.get("type"), RuntimeError)(reply.get("error"))
+        return reply
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Run a command on the agent's connection."""
+        reply = self._request(op="exec", cmd=command, timeout=timeout)
+        return reply["rc"], reply["out"], reply["err"]
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Have the agent upload a local file."""
+        self._request(op="put", local=str(Path(local_path).resolve()), remote=remote_path)
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Have the agent download a file to a local path."""
+        self._request(op="get", remote=remote_path, local=str(Path(local_path).resolve()))
+
+    def _stat(self, remote_path: str) -> bool:
+        """Ask the agent whether a path exists on the server."""
+        return self._request(op="stat", remote=remote_path)["exists"]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run an agent in the foreground.
+
+    Args:
+        argv: Command-line arguments, defaults to sys.argv
+
+    Returns:
+        Exit code
+    """
+    parser = argparse.ArgumentParser(prog="enferno agent", description=__doc__.splitlines()[0])
+    parser.add_argument("--socket", default=None, help="socket path to listen on")
+    parser.add_argument("--idle", type=float, default=DEFAULT_IDLE, help="seconds to keep unused connections open")
+    args = parser.parse_args(argv)
+
+    try:
+        ConnectionAgent(args.socket or default_socket_path(), args.idle).serve()
+    except RuntimeError as e:
+        console.print(f"[bold red]{e}[/]")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+"""Compile a setup plan into one shell bundle that runs on the server.
+
+Over a slow or flaky link every command costs at least one round trip. With
+`setup --compile` the tasks run locally against a CompilingTransport, which
+records their commands and uploads instead of sending them. The recording
+becomes one POSIX shell script with the rendered files inlined. It is uploaded
+once and run detached from the SSH session, and its progress is streamed back.
+
+Tasks branch on what their commands return, so compiling assumes an answer
+for each command: exit code 0 and empty output, or an entry from ASSUMPTIONS
+for the probes whose output tasks read. The bundle checks every assumption as
+it runs. At the first command that answers differently it stops, and that task
+runs live over SSH from its start. Tasks that read output that cannot be
+predicted (Task.compilable is False) always run live. The plan around them is
+compiled into separate bundles.
+
+Finished tasks leave checkpoint files on the server, so running the same plan
+again after a dropped connection resumes after the last finished task.
+"""
+
+import base64
+import hashlib
+import os
+import re
+import shlex
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type, Union
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import (
+    COMMAND_FINISH,
+    COMMAND_START,
+    FILE_TRANSFER,
+    TASK_FINISH,
+    TASK_START,
+    console,
+    events,
+)
+from enferno_cli.core.facts import HostFacts
+from enferno_cli.core.profiler import PHASE, profiler
+from enferno_cli.core.task import Task
+from enferno_cli.core.transport import Transport
+from enferno_cli.tasks.firewall import UFW_PROBE
+
+# Checkpoints of interrupted bundles; removed when a bundle finishes
+CHECKPOINT_DIR = "/var/lib/enferno/checkpoints"
+# Bundles carry rendered secrets, so each is uploaded to a private directory
+BUNDLE_DIR_TEMPLATE = "/tmp/enferno-bundle.XXXXXX"
+
+# Lines of the bundle's output that carry progress start with this marker
+MARKER = "@@enferno"
+
+# Exit code of a bundle that stopped at a divergence
+DIVERGED_EXIT = 3
+
+
+@dataclass
+class Assumption:
+    """The answer compiled in for a command whose output a task reads."""
+
+    pattern: str
+    stdout: str = ""
+    exit_code: int = 0
+    # Extended regular expression the real stdout must contain; None checks only the exit code
+    expect: Optional[str] = None
+    # False for probes whose answer only decides whether idempotent work is repeated
+    check_exit: bool = True
+
+    def matches(self, command: str) -> bool:
+        """Whether the assumption applies to a command."""
+        return re.search(self.pattern, command) is not None
+
+
+# Answers of a supported Ubuntu server, in the state the earlier commands of the plan leave it in
+ASSUMPTIONS = [
+    Assumption(r"^python3 --version$", stdout="Python 3.12.3\n", expect=r"^Python 3\.(9|1[0-3])(\.|$)"),
+    Assumption(re.escape(UFW_PROBE), stdout="Status: inactive\n---\n", expect=r"^Status: inactive$"),
+    Assumption(r"ls -A \S+ \| wc -l", stdout="0\n", expect=r"^0$"),
+    Assumption(r"^systemctl is-active ", stdout="active\n", expect=r"^active$"),
+    Assumption(r"^dpkg-query ", exit_code=1, check_exit=False),
+    Assumption(r"^sha256sum ", exit_code=1, check_exit=False),
+]
+
+
+@dataclass
+class Step:
+    """One recorded operation of a compiled task."""
+
+    number: int
+    task: str
+    kind: str  # 'exec', 'write' or 'stat'
+    target: str  # command for exec, remote path for write and stat
+    data: bytes = b""
+    expect_exit: Optional[int] = 0
+    expect: Optional[str] = None
+
+
+@dataclass
+class Bundle:
+    """A compiled script and the steps it runs."""
+
+    tasks: List[str]
+    steps: Dict[int, Step]
+    script: str
+
+    @property
+    def id(self) -> str:
+        """Short hash identifying the script."""
+        return hashlib.sha256(self.script.encode("utf-8")).hexdigest()[:12]
+
+
+class CompilingTransport(Transport):
+    """Transport that records operations for a bundle instead of performing them."""
+
+    def __init__(self, config: ServerConfig, facts: HostFacts):
+        """Initialize the transport.
+
+        Args:
+            config: Server configuration
+            facts: Host facts gathered live, which sizing decisions are compiled from
+        """
+        super().__init__(config)
+        self.facts = facts
+        self.steps: List[Step] = []
+        self.task = ""
+
+    def connect(self) -> bool:
+        """Start recording."""
+        self._connected = True
+        return True
+
+    def _record(self, kind: str, target: str, **fields) -> Step:
+        """Append a step for the current task."""
+        step = Step(len(self.steps) + 1, self.task, kind, target, **fields)
+        self.steps.append(step)
+        return step
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Record a command and answer it as assumed."""
+        for assumption in ASSUMPTIONS:
+            if assumption.matches(command[len("sudo "):] if command.startswith("sudo ") else command):
+                self._record(
+                    "exec",
+                    command,
+                    expect_exit=assumption.exit_code if assumption.check_exit else None,
+                    expect=assumption.expect,
+                )
+                return assumption.exit_code, assumption.stdout, ""
+        self._record("exec", command)
+        return 0, "", ""
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Record an upload with the file's current contents."""
+        self._record("write", remote_path, data=Path(local_path).read_bytes())
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Downloads need the server, so they cannot be compiled."""
+        raise RuntimeError(f"Cannot download {remote_path} while compiling")
+
+    def _stat(self, remote_path: str) -> bool:
+        """Record an existence check, assuming the path exists."""
+        self._record("stat", remote_path)
+        return True
+
+
+def compile_tasks(config: ServerConfig, facts: HostFacts, task_classes: List[Type[Task]]) -> Optional[Bundle]:
+    """Compile the leading tasks of a plan that can run in a bundle.
+
+    Compilation stops before the first task that is not compilable or that
+    fails under the assumed answers; that task has to run live.
+
+    Args:
+        config: Server configuration
+        facts: Host facts gathered live
+        task_classes: Remaining tasks of the plan, in order
+
+    Returns:
+        The bundle, or None if the first task cannot be compiled
+    """
+    transport = CompilingTransport(config, facts)
+    compiled: List[str] = []
+
+    # Compiling runs the tasks, but nothing has happened on the server yet
+    sinks, profiling = events.sinks, profiler.enabled
+    events.set_sinks([])
+    profiler.enabled = False
+    try:
+        with console.capture():
+            for task_class in task_classes:
+                task = task_class(config, transport)
+                if not task.compilable:
+                    break
+                transport.task = task.name
+                recorded = len(transport.steps)
+                if not task.execute():
+                    del transport.steps[recorded:]
+                    break
+                compiled.append(task.name)
+    finally:
+        events.set_sinks(sinks)
+        profiler.enabled = profiling
+
+    if not compiled:
+        return None
+    return Bundle(compiled, {step.number: step for step in transport.steps}, render_script(config, compiled, transport.steps))
+
+
+def _step_body(config: ServerConfig, step: Step) -> str:
+    """Shell commands performing one step, with the privileges it had over SSH."""
+    user = shlex.quote(config.ansible_user)
+    if step.kind == "write":
+        encoded = base64.encodebytes(step.data).decode("ascii")
+        target = shlex.quote(step.target)
+        # Written as the login user, as SFTP would
+        if config.use_sudo:
+            writer = f"runuser -u {user} -- sh -c 'base64 -d > \"$1\"' sh {target}"
+        else:
+            writer = f"base64 -d > {target}"
+        return f"{writer} <<'ENFERNO_EOF'\n{encoded}ENFERNO_EOF"
+    if step.kind == "stat":
+        return f"test -e {shlex.quote(step.target)}"
+
+    command = step.target
+    as_root = not config.use_sudo
+    if command.startswith("sudo "):
+        as_root = True
+        # The bundle already runs as root; sudo with options (-u postgres) still runs
+        if not command[len("sudo "):].startswith("-"):
+            command = command[len("sudo "):]
+    body = f"bash -c {shlex.quote(command)}"
+    return body if as_root else f"runuser -u {user} -- {body}"
+
+
+def render_script(config: ServerConfig, tasks: List[str], steps: List[Step]) -> str:
+    """Render the bundle script.
+
+    Args:
+        config: Server configuration
+        tasks: Compiled task names, in order
+        steps: Recorded steps of those tasks
+
+    Returns:
+        POSIX shell script to run as root on the server
+    """
+    from enferno_cli import __version__
+
+    lines = [
+        "#!/bin/sh",
+        f"# enferno {__version__} compiled setup for {config.host}: {', '.join(tasks)}",
+        "# Progress lines start with " + MARKER + "; each task checkpoints when it finishes.",
+        "set -u",
+        "# The script holds rendered secrets; sh keeps reading it from the open file",
+        'rm -f "$0"',
+        "export DEBIAN_FRONTEND=noninteractive",
+        "# Commands start in the login user's home, as they do over SSH",
+        f"cd ~{config.ansible_user} 2>/dev/null || cd /",
+        f"STATE={CHECKPOINT_DIR}",
+        'mkdir -p "$STATE"',
+        'exec 9>"$STATE/.lock"',
+        f'flock -n 9 || {{ echo "{MARKER} busy"; exit 4; }}',
+        'OUT=$(mktemp) ERR=$(mktemp)',
+        'trap \'rm -f "$OUT" "$ERR"\' EXIT',
+        "TASK=",
+        "",
+        "now_ms() { date +%s%3N; }",
+        "",
+        "diverge() {",
+        f'    echo "{MARKER} diverged $TASK $1 $2"',
+        '    tail -n 20 "$ERR"; tail -n 20 "$OUT"',
+        f"    exit {DIVERGED_EXIT}",
+        "}",
+        "",
+        "# run_step NUMBER EXPECTED_EXIT|- EXPECTED_OUTPUT_REGEX|'' FUNCTION",
+        "run_step() {",
+        f'    echo "{MARKER} run $1"',
+        "    start=$(now_ms)",
+        '    "$4" >"$OUT" 2>"$ERR" </dev/null',
+        "    rc=$?",
+        f'    echo "{MARKER} step $1 $rc $(( $(now_ms) - start ))"',
+        '    if [ "$2" != "-" ] && [ "$rc" -ne "$2" ]; then diverge "$1" "exit code $rc, compiled for $2"; fi',
+        '    if [ -n "$3" ] && ! grep -Eq -- "$3" "$OUT"; then diverge "$1" "output does not match $3"; fi',
+        "}",
+        "",
+        "# begin_task NAME CHECKPOINT: false if an earlier run finished the task",
+        "begin_task() {",
+        '    TASK=$1',
+        f'    if [ -e "$STATE/$2" ]; then echo "{MARKER} skip $1"; return 1; fi',
+        f'    echo "{MARKER} task_start $1"',
+        "}",
+        "",
+        "end_task() {",
+        '    touch "$STATE/$2"',
+        f'    echo "{MARKER} task_finish $1"',
+        "}",
+    ]
+
+    for step in steps:
+        lines += ["", f"step_{step.number}() {{", _step_body(config, step), "}"]
+
+    for task in tasks:
+        task_steps = [step for step in steps if step.task == task]
+        # The checkpoint names the task's exact steps, so a changed plan runs it again
+        digest = hashlib.sha256()
+        for step in task_steps:
+            digest.update(f"{step.kind}\0{step.target}\0".encode("utf-8") + step.data)
+        checkpoint = f"{task}.{digest.hexdigest()[:12]}"
+        lines += ["", f"if begin_task {task} {checkpoint}; then"]
+        for step in task_steps:
+            expect_exit = "-" if step.expect_exit is None else str(step.expect_exit)
+            lines.append(f"    run_step {step.number} {expect_exit} {shlex.quote(step.expect or '')} step_{step.number}")
+        lines.append(f"    end_task {task} {checkpoint}")
+        lines.append("fi")
+
+    lines += ["", 'rm -f "$STATE"/*.*', f'echo "{MARKER} done"', ""]
+    return "\n".join(lines)
+
+
+@dataclass
+class BundleProgress:
+    """Turn the bundle's progress lines into events."""
+
+    bundle: Bundle
+    host: str
+    descriptions: Dict[str, str]
+    completed: List[str] = field(default_factory=list)
+    diverged: Optional[str] = None
+    busy: bool = False
+    done: bool = False
+    started: Dict[str, float] = field(default_factory=dict)
+
+    def line(self, text: str) -> None:
+        """Handle one line of the bundle's output."""
+        if not text.startswith(MARKER + " "):
+            console.print(text, markup=False, highlight=False, style="dim")
+            return
+
+        kind, _, rest = text[len(MARKER) + 1:].partition(" ")
+        fields = rest.split(" ")
+        if kind == "task_start":
+            self.started[fields[0]] = time.perf_counter()
+            events.emit(TASK_START, task=fields[0], description=self.descriptions.get(fields[0], ""))
+        elif kind == "task_finish":
+            self.completed.append(fields[0])
+            start = self.started.get(fields[0], time.perf_counter())
+            events.emit(
+                TASK_FINISH,
+                task=fields[0],
+                result="ok",
+                success=True,
+                duration_ms=round((time.perf_counter() - start) * 1000, 3),
+            )
+        elif kind == "skip":
+            self.completed.append(fields[0])
+            console.print(f"[green]Already finished by an earlier run of this plan: {fields[0]}[/]")
+        elif kind == "run":
+            step = self.bundle.steps[int(fields[0])]
+            if step.kind == "exec":
+                events.emit(COMMAND_START, host=self.host, command=step.target)
+        elif kind == "step":
+            self._finish_step(self.bundle.steps[int(fields[0])], int(fields[1]), float(fields[2]))
+        elif kind == "diverged":
+            self.diverged = fields[0]
+            step = self.bundle.steps[int(fields[1])]
+            console.print(
+                f"[yellow]The server answered differently than compiled at `{step.target[:80]}` "
+                f"({' '.join(fields[2:])}); running {fields[0]} live[/]"
+            )
+        elif kind == "busy":
+            self.busy = True
+        elif kind == "done":
+            self.done = True
+
+    def _finish_step(self, step: Step, exit_code: int, duration_ms: float) -> None:
+        """Emit the event for a finished step."""
+        if step.kind == "write":
+            events.emit(
+                FILE_TRANSFER,
+                host=self.host,
+                direction="upload",
+                local_path="(bundle)",
+                remote_path=step.target,
+                bytes=len(step.data),
+                duration_ms=duration_ms,
+                success=exit_code == 0,
+                error=None if exit_code == 0 else f"exit code {exit_code}",
+            )
+        elif step.kind == "exec":
+            events.emit(
+                COMMAND_FINISH,
+                host=self.host,
+                command=step.target,
+                exit_code=exit_code,
+                duration_ms=duration_ms,
+                stdout_bytes=0,
+                stderr="",
+            )
+
+
+def run_bundle(ssh: Transport, bundle: Bundle, descriptions: Dict[str, str]) -> Optional[List[str]]:
+    """Upload a bundle, run it on the server and stream its progress.
+
+    Args:
+        ssh: Connected transport
+        bundle: Compiled bundle
+        descriptions: Task descriptions for task_start events
+
+    Returns:
+        Names of the tasks the bundle finished, in order, or None if it could
+        not be run or the connection was lost
+    """
+    console.print(
+        f"[cyan]Running {len(bundle.tasks)} tasks ({len(bundle.steps)} steps) as one bundle: {', '.join(bundle.tasks)}[/]"
+    )
+    exit_code, stdout, stderr = ssh.execute(f"mktemp -d {BUNDLE_DIR_TEMPLATE}")
+    if exit_code != 0 or not stdout.strip():
+        console.print(f"[bold red]Failed to create a directory for the bundle: {stderr.strip()}[/]")
+        return None
+    bundle_dir = stdout.strip()
+    remote_path = f"{bundle_dir}/{bundle.id}.sh"
+    log_path = f"{bundle_dir}/{bundle.id}.log"
+
+    fd, local_path = tempfile.mkstemp(suffix=".sh")
+    try:
+        with os.fdopen(fd, "w") as script:
+            script.write(bundle.script)
+        if not ssh.upload_file(local_path, remote_path):
+            console.print("[bold red]Failed to upload the bundle[/]")
+            ssh.execute(f"rm -rf {bundle_dir}", sudo=True)
+            return None
+    finally:
+        os.unlink(local_path)
+
+    # Detached from the session, so a dropped connection does not stop it; the log is followed until it exits
+    launcher = (
+        f"setsid sh {remote_path} > {log_path} 2>&1 < /dev/null & pid=$!; "
+        f"tail -n +1 --pid=$pid -f {log_path}; wait $pid"
+    )
+    progress = BundleProgress(bundle, ssh.config.host, descriptions)
+    try:
+        with profiler.span(f"bundle {bundle.id}", PHASE):
+            exit_code = ssh.stream(f"sh -c {shlex.quote(launcher)}", progress.line, sudo=True)
+    except Exception as e:
+        console.print(f"[bold red]Lost the connection while the bundle was running: {e}[/]")
+        console.print(
+            f"[yellow]The bundle keeps running on the server (log: {log_path}). "
+            "Run the same setup again to resume after its last finished task.[/]"
+        )
+        return None
+
+    # The bundle has exited and its output was streamed; only a lost connection keeps the log
+    ssh.execute(f"rm -rf {bundle_dir}", sudo=True)
+
+    if progress.busy:
+        console.print("[bold red]Another compiled setup is still running on the server (see /tmp/enferno-bundle.*/*.log)[/]")
+        return None
+    if not progress.done and progress.diverged is None:
+        console.print(f"[bold red]The bundle stopped unexpectedly with exit code {exit_code}[/]")
+        return None
+    return progress.completed
@@ -6,12 +6,10 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional
 
-import yaml
 from dotenv import load_dotenv
-from rich.console import Console
 from rich.prompt import Confirm, Prompt
 
-console = Console()
+from enferno_cli.core.events import console
 
 
 def get_password(prompt_text: str) -> str:
@@ -25,6 +23,14 @@ DEFAULT_CONFIG_FILE = ".env"
 DEFAULT_SSH_PORT = 22
 DEFAULT_PYTHON_PORT = 5000
 DEFAULT_SSL_ENABLED = True
+DEFAULT_SSL_KEY_TYPE = "ecdsa"
+DEFAULT_SSL_RESOLVER = "127.0.0.53"
+DEFAULT_POSTGRES_PROFILE = "web"
+DEFAULT_NGINX_CONCURRENCY = "medium"
+DEFAULT_MICROCACHE_TTL = 1
+DEFAULT_UWSGI_TRANSPORT = "http"
+DEFAULT_CELERY_POOL = "prefork"
+DEFAULT_CELERY_PREFETCH_MULTIPLIER = 4
 
 
 @dataclass
@@ -48,16 +54,57 @@ class ServerConfig:
     ssl_enabled: bool = DEFAULT_SSL_ENABLED
     ssl_email: Optional[str] = None
     use_www: bool = False
+    ssl_key_type: str = DEFAULT_SSL_KEY_TYPE
+    ssl_session_tickets: bool = True
+    ssl_early_data: bool = False
+    ssl_resolver: str = DEFAULT_SSL_RESOLVER
+    acme_server: Optional[str] = None
+    acme_ca_bundle: Optional[str] = None
     
     # Additional settings
     cloudflare_enabled: bool = False
     postgres_enabled: bool = False
     
+    # PostgreSQL tuning
+    postgres_profile: str = DEFAULT_POSTGRES_PROFILE
+    postgres_max_connections: Optional[int] = None
+    postgres_disk_type: Optional[str] = None
+    pgbouncer_enabled: bool = False
+    
+    # Firewall settings
+    firewall_extra_ports: List[str] = field(default_factory=list)
+    
+    # SQLite settings
+    sqlite_path: Optional[str] = None
+    
+    # Nginx settings
+    nginx_concurrency: str = DEFAULT_NGINX_CONCURRENCY
+    microcache_enabled: bool = False
+    microcache_ttl: int = DEFAULT_MICROCACHE_TTL
+    static_brotli: bool = False
+    
+    # Worker settings (uwsgi values are sized from the host when unset)
+    uwsgi_transport: str = DEFAULT_UWSGI_TRANSPORT
+    uwsgi_processes: Optional[int] = None
+    uwsgi_threads: Optional[int] = None
+    uwsgi_listen: Optional[int] = None
+    uwsgi_reload_on_rss: Optional[int] = None
+    
+    # Celery settings (autoscale bounds are sized from the host when unset)
+    celery_pool: str = DEFAULT_CELERY_POOL
+    celery_autoscale_min: Optional[int] = None
+    celery_autoscale_max: Optional[int] = None
+    celery_prefetch_multiplier: int = DEFAULT_CELERY_PREFETCH_MULTIPLIER
+    celery_max_tasks_per_child: Optional[int] = None
+    celery_max_memory_per_child: Optional[int] = None
+    celery_beat_separate: bool = False
+    
     # Task selection
     selected_tasks: List[str] = field(default_factory=list)
     
     # Connection settings
     ansible_user: str = "root"
+    remote_helper: bool = False
     
     @property
     def use_sudo(self) -> bool:
@@ -98,6 +145,8 @@ class ServerConfig:
             for key, value in self.to_dict().items():
                 if isinstance(value, bool):
                     value = str(value).lower()
+                elif isinstance(value, list):
+                    value = ",".join(str(item) for item in value)
                 f.write(f"{key.upper()}={value}\n")
         
         console.print(f"Configuration saved to [bold green]{path}[/]")
@@ -128,8 +177,51 @@ class ServerConfig:
         ssl_enabled = os.getenv("SSL_ENABLED", str(DEFAULT_SSL_ENABLED)).lower() in ("true", "1", "yes")
         ssl_email = os.getenv("SSL_EMAIL")
         use_www = os.getenv("USE_WWW", "false").lower() in ("true", "1", "yes")
+        ssl_key_type = os.getenv("SSL_KEY_TYPE", DEFAULT_SSL_KEY_TYPE).lower()
+        ssl_session_tickets = os.getenv("SSL_SESSION_TICKETS", "true").lower() in ("true", "1", "yes")
+        ssl_early_data = os.getenv("SSL_EARLY_DATA", "false").lower() in ("true", "1", "yes")
+        ssl_resolver = os.getenv("SSL_RESOLVER", DEFAULT_SSL_RESOLVER)
+        acme_server = os.getenv("ACME_SERVER")
+        acme_ca_bundle = os.getenv("ACME_CA_BUNDLE")
         cloudflare_enabled = os.getenv("CLOUDFLARE_ENABLED", "false").lower() in ("true", "1", "yes")
         postgres_enabled = os.getenv("POSTGRES_ENABLED", "false").lower() in ("true", "1", "yes")
+        postgres_profile = os.getenv("POSTGRES_PROFILE", DEFAULT_POSTGRES_PROFILE).lower()
+        postgres_max_connections = os.getenv("POSTGRES_MAX_CONNECTIONS")
+        postgres_max_connections = int(postgres_max_connections) if postgres_max_connections else None
+        postgres_disk_type = os.getenv("POSTGRES_DISK_TYPE")
+        pgbouncer_enabled = os.getenv("PGBOUNCER_ENABLED", "false").lower() in ("true", "1", "yes")
+        sqlite_path = os.getenv("SQLITE_PATH")
+        firewall_extra_ports = [p.strip() for p in os.getenv("FIREWALL_EXTRA_PORTS", "").split(",") if p.strip()]
+        
+        # Nginx settings
+        nginx_concurrency = os.getenv("NGINX_CONCURRENCY", DEFAULT_NGINX_CONCURRENCY).lower()
+        microcache_enabled = os.getenv("MICROCACHE_ENABLED", "false").lower() in ("true", "1", "yes")
+        microcache_ttl = int(os.getenv("MICROCACHE_TTL", DEFAULT_MICROCACHE_TTL))
+        static_brotli = os.getenv("STATIC_BROTLI", "false").lower() in ("true", "1", "yes")
+        
+        # Worker settings
+        uwsgi_transport = os.getenv("UWSGI_TRANSPORT", DEFAULT_UWSGI_TRANSPORT).lower()
+        uwsgi_processes = os.getenv("UWSGI_PROCESSES")
+        uwsgi_processes = int(uwsgi_processes) if uwsgi_processes else None
+        uwsgi_threads = os.getenv("UWSGI_THREADS")
+        uwsgi_threads = int(uwsgi_threads) if uwsgi_threads else None
+        uwsgi_listen = os.getenv("UWSGI_LISTEN")
+        uwsgi_listen = int(uwsgi_listen) if uwsgi_listen else None
+        uwsgi_reload_on_rss = os.getenv("UWSGI_RELOAD_ON_RSS")
+        uwsgi_reload_on_rss = int(uwsgi_reload_on_rss) if uwsgi_reload_on_rss else None
+        
+        # Celery settings
+        celery_pool = os.getenv("CELERY_POOL", DEFAULT_CELERY_POOL).lower()
+        celery_autoscale_min = os.getenv("CELERY_AUTOSCALE_MIN")
+        celery_autoscale_min = int(celery_autoscale_min) if celery_autoscale_min else None
+        celery_autoscale_max = os.getenv("CELERY_AUTOSCALE_MAX")
+        celery_autoscale_max = int(celery_autoscale_max) if celery_autoscale_max else None
+        celery_prefetch_multiplier = int(os.getenv("CELERY_PREFETCH_MULTIPLIER", DEFAULT_CELERY_PREFETCH_MULTIPLIER))
+        celery_max_tasks_per_child = os.getenv("CELERY_MAX_TASKS_PER_CHILD")
+        celery_max_tasks_per_child = int(celery_max_tasks_per_child) if celery_max_tasks_per_child else None
+        celery_max_memory_per_child = os.getenv("CELERY_MAX_MEMORY_PER_CHILD")
+        celery_max_memory_per_child = int(celery_max_memory_per_child) if celery_max_memory_per_child else None
+        celery_beat_separate = os.getenv("CELERY_BEAT_SEPARATE", "false").lower() in ("true", "1", "yes")
         
         # Task selection
         tasks_str = os.getenv("SELECTED_TASKS", "")
@@ -137,6 +229,7 @@ class ServerConfig:
         
         # Connection settings
         ansible_user = os.getenv("ANSIBLE_USER", "root")
+        remote_helper = os.getenv("REMOTE_HELPER", "false").lower() in ("true", "1", "yes")
         
         config = cls(
             host=host,
@@ -149,10 +242,39 @@ class ServerConfig:
             ssl_enabled=ssl_enabled,
             ssl_email=ssl_email,
             use_www=use_www,
+            ssl_key_type=ssl_key_type,
+            ssl_session_tickets=ssl_session_tickets,
+            ssl_early_data=ssl_early_data,
+            ssl_resolver=ssl_resolver,
+            acme_server=acme_server,
+            acme_ca_bundle=acme_ca_bundle,
             cloudflare_enabled=cloudflare_enabled,
             postgres_enabled=postgres_enabled,
+            postgres_profile=postgres_profile,
+            postgres_max_connections=postgres_max_connections,
+            postgres_disk_type=postgres_disk_type,
+            pgbouncer_enabled=pgbouncer_enabled,
+            sqlite_path=sqlite_path,
+            firewall_extra_ports=firewall_extra_ports,
+            nginx_concurrency=nginx_concurrency,
+            microcache_enabled=microcache_enabled,
+            microcache_ttl=microcache_ttl,
+            static_brotli=static_brotli,
+            uwsgi_transport=uwsgi_transport,
+            uwsgi_processes=uwsgi_processes,
+            uwsgi_threads=uwsgi_threads,
+            uwsgi_listen=uwsgi_listen,
+            uwsgi_reload_on_rss=uwsgi_reload_on_rss,
+            celery_pool=celery_pool,
+            celery_autoscale_min=celery_autoscale_min,
+            celery_autoscale_max=celery_autoscale_max,
+            celery_prefetch_multiplier=celery_prefetch_multiplier,
+            celery_max_tasks_per_child=celery_max_tasks_per_child,
+            celery_max_memory_per_child=celery_max_memory_per_child,
+            celery_beat_separate=celery_beat_separate,
             selected_tasks=selected_tasks,
             ansible_user=ansible_user,
+            remote_helper=remote_helper,
         )
         
         # Validate selected tasks
@@ -243,6 +365,19 @@ class ServerConfig:
             default=postgres_default
         )
         
+        # PgBouncer requires PostgreSQL
+        pgbouncer_enabled = False
+        if postgres_enabled:
+            env_pgbouncer = os.getenv("PGBOUNCER_ENABLED")
+            pgbouncer_default = False
+            if env_pgbouncer is not None:
+                pgbouncer_default = env_pgbouncer.lower() in ("true", "1", "yes")
+            
+            pgbouncer_enabled = Confirm.ask(
+                "[bold]Use PgBouncer connection pooling?[/]",
+                default=pgbouncer_default
+            )
+        
         # SSL settings
         if skip_ssl:
             console.print("[yellow]SSL setup will be skipped as requested with --skip-ssl[/]")
@@ -310,6 +445,7 @@ class ServerConfig:
             use_www=use_www,
             cloudflare_enabled=cloudflare_enabled,
             postgres_enabled=postgres_enabled,
+            pgbouncer_enabled=pgbouncer_enabled,
             ansible_user=ansible_user,
         )
         
@@ -321,7 +457,7 @@ class ServerConfig:
         
         # Add PostgreSQL if enabled
         if postgres_enabled:
-            config.selected_tasks.append("database")
+            config.selected_tasks.extend(["database", "postgres_tune"])
         
         # Add Nginx task based on SSL and www preferences
         if ssl_enabled:
@@ -335,6 +471,15 @@ class ServerConfig:
         # Add Enferno task
         config.selected_tasks.append("enferno")
         
+        # Precompress static assets for nginx
+        config.selected_tasks.append("static")
+        
+        # Add PgBouncer once the application .env exists, otherwise tune SQLite
+        if pgbouncer_enabled:
+            config.selected_tasks.append("pgbouncer")
+        elif not postgres_enabled:
+            config.selected_tasks.append("sqlite")
+        
         # Add service task
         config.selected_tasks.append("service")
         
@@ -0,0 +1,189 @@
+"""Structured progress events and the sinks that consume them."""
+
+import io
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import IO, Dict, List, Optional
+
+from rich.console import Console
+
+# Shared by every module, so sinks can redirect or silence all human-readable output
+console = Console()
+
+# Event types
+TASK_START = "task_start"
+TASK_FINISH = "task_finish"
+COMMAND_START = "command_start"
+COMMAND_FINISH = "command_finish"
+FILE_TRANSFER = "transfer"
+FACT = "fact"
+
+# Longest stderr kept on a command_finish event
+STDERR_LIMIT = 4096
+
+
+@dataclass
+class Event:
+    """A single progress event."""
+
+    type: str
+    seq: int
+    time: float
+    data: Dict = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        """Flatten the event into a JSON-serializable dict."""
+        return {"event": self.type, "seq": self.seq, "time": round(self.time, 6), **self.data}
+
+
+class EventSink:
+    """Base class for event consumers."""
+
+    def handle(self, event: Event) -> None:
+        """Consume one event."""
+
+    def close(self, success: bool) -> None:
+        """Finish the run.
+
+        Args:
+            success: Whether the run succeeded
+        """
+
+
+class RichSink(EventSink):
+    """Render events as the familiar colored console output."""
+
+    def handle(self, event: Event) -> None:
+        """Print the event to the shared console."""
+        data = event.data
+        if event.type == TASK_START:
+            console.print(f"[bold cyan]Running task: {data['task']}[/]")
+            console.print(f"[dim]{data['description']}[/]")
+        elif event.type == TASK_FINISH:
+            if data["success"]:
+                console.print(f"[bold green]Task completed successfully: {data['task']}[/]")
+            elif data["result"] == "failed":
+                console.print(f"[bold red]Task failed: {data['task']}[/]")
+            else:
+                phase = data["result"].split()[0].replace("_", "-").capitalize()
+                console.print(f"[bold red]{phase} failed for task: {data['task']}[/]")
+        elif event.type == COMMAND_START:
+            console.print(f"[dim]Executing: {data['command']}[/]")
+        elif event.type == COMMAND_FINISH:
+            if data.get("error"):
+                console.print(f"[bold red]Error executing command: {data['error']}[/]")
+            elif data["exit_code"] != 0:
+                console.print(f"[bold red]Command failed with exit code {data['exit_code']}[/]")
+                if data.get("stderr"):
+                    console.print(f"[red]{data['stderr']}[/]")
+        elif event.type == FILE_TRANSFER:
+            if data["success"] and data["direction"] == "upload":
+                console.print(f"[green]Uploaded {data['local_path']} to {data['remote_path']}[/]")
+            elif data["success"]:
+                console.print(f"[green]Downloaded {data['remote_path']} to {data['local_path']}[/]")
+            else:
+                console.print(f"[bold red]Failed to {data['direction']} file: {data['error']}[/]")
+        elif event.type == FACT:
+            console.print(f"[cyan]Host facts: {data['summary']}[/]")
+
+
+class JsonLinesSink(EventSink):
+    """Write each event as one line of JSON."""
+
+    def __init__(self, stream: IO[str], close_stream: bool = False):
+        """Initialize the sink.
+
+        Args:
+            stream: Text stream to write to
+            close_stream: Close the stream when the run finishes
+        """
+        self.stream = stream
+        self.close_stream = close_stream
+
+    def handle(self, event: Event) -> None:
+        """Write the event and flush, so consumers see progress immediately."""
+        self.stream.write(json.dumps(event.to_dict(), default=str) + "\n")
+        self.stream.flush()
+
+    def close(self, success: bool) -> None:
+        """Write the final event and close the stream if the sink owns it."""
+        self.stream.write(json.dumps({"event": "run_finish", "time": round(time.time(), 6), "success": success}) + "\n")
+        self.stream.flush()
+        if self.close_stream:
+            self.stream.close()
+
+
+class QuietSink(EventSink):
+    """Hold all output back and only show it if the run fails.
+
+    Console output is captured into a buffer instead of being rendered; the
+    events are kept in memory for callers that want to inspect them.
+    """
+
+    def __init__(self, output: Optional[IO[str]] = None):
+        """Initialize the sink and start capturing console output.
+
+        Args:
+            output: Where to write the captured output on failure (default stderr)
+        """
+        self.output = output
+        self.events: List[Event] = []
+        self.buffer = io.StringIO()
+        self._rich = RichSink()
+        self._previous_file = console.file
+        console.file = self.buffer
+
+    def handle(self, event: Event) -> None:
+        """Keep the event and render it into the buffer."""
+        self.events.append(event)
+        self._rich.handle(event)
+
+    def close(self, success: bool) -> None:
+        """Stop capturing and replay the captured output if the run failed."""
+        console.file = self._previous_file
+        if not success:
+            (self.output or sys.stderr).write(self.buffer.getvalue())
+
+
+class EventStream:
+    """Dispatch events to the configured sinks, one event at a time."""
+
+    def __init__(self):
+        """Initialize the stream with the Rich console sink."""
+        self.sinks: List[EventSink] = [RichSink()]
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def set_sinks(self, sinks: List[EventSink]) -> None:
+        """Replace the sinks events are dispatched to."""
+        with self._lock:
+            self.sinks = list(sinks)
+
+    def emit(self, event_type: str, **data) -> None:
+        """Emit an event to every sink.
+
+        Events are dispatched under a lock, so events from concurrent threads are
+        written whole and in sequence order.
+
+        Args:
+            event_type: One of the event types
+            **data: Event fields
+        """
+        with self._lock:
+            self._seq += 1
+            event = Event(event_type, self._seq, time.time(), data)
+            for sink in self.sinks:
+                sink.handle(event)
+
+    def close(self, success: bool) -> None:
+        """Tell every sink that the run finished."""
+        with self._lock:
+            for sink in self.sinks:
+                sink.close(success)
+
+
+# Shared by every module of one run
+events = EventStream()
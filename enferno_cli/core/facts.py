@@ -0,0 +1,103 @@
+"""Host facts gathered from the remote server."""
+
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+
+from enferno_cli.core.events import FACT, console, events
+
+# Single round-trip probe; every line is emitted as key=value
+FACTS_PROBE = (
+    "echo cpu_count=$(nproc); "
+    "echo memory_kb=$(awk '/^MemTotal:/ {print $2}' /proc/meminfo); "
+    "echo rotational=$(lsblk -dno ROTA \"$(findmnt -no SOURCE --target /)\" 2>/dev/null | head -n1); "
+    "echo somaxconn=$(cat /proc/sys/net/core/somaxconn); "
+    "echo nr_open=$(cat /proc/sys/fs/nr_open)"
+)
+
+
+@dataclass
+class HostFacts:
+    """Hardware facts about the remote server."""
+
+    cpu_count: int = 1
+    memory_kb: int = 1024 * 1024
+    rotational: Optional[bool] = None
+    somaxconn: int = 4096
+    nr_open: int = 1048576
+
+    @property
+    def memory_mb(self) -> int:
+        """Total memory in megabytes."""
+        return self.memory_kb // 1024
+
+    @property
+    def disk_type(self) -> str:
+        """Disk type of the root filesystem ('ssd', 'hdd' or 'unknown')."""
+        if self.rotational is None:
+            return "unknown"
+        return "hdd" if self.rotational else "ssd"
+
+
+def parse_facts(output: str) -> HostFacts:
+    """Parse the output of FACTS_PROBE into HostFacts.
+
+    Missing or malformed values fall back to the HostFacts defaults.
+    """
+    values: Dict[str, str] = {}
+    for line in output.splitlines():
+        key, sep, value = line.strip().partition("=")
+        if sep and value:
+            values[key] = value.strip()
+
+    facts = HostFacts()
+    if values.get("cpu_count", "").isdigit():
+        facts.cpu_count = max(1, int(values["cpu_count"]))
+    if values.get("memory_kb", "").isdigit():
+        facts.memory_kb = int(values["memory_kb"])
+    if values.get("somaxconn", "").isdigit():
+        facts.somaxconn = int(values["somaxconn"])
+    if values.get("nr_open", "").isdigit():
+        facts.nr_open = int(values["nr_open"])
+    if values.get("rotational") in ("0", "1"):
+        facts.rotational = values["rotational"] == "1"
+    return facts
+
+
+def gather_facts(ssh, refresh: bool = False) -> HostFacts:
+    """Gather host facts, caching them on the SSH client.
+
+    Args:
+        ssh: Connected SSH client
+        refresh: Probe the host again even if facts are cached
+
+    Returns:
+        HostFacts for the connected host
+    """
+    if ssh.facts is not None and not refresh:
+        return ssh.facts
+
+    exit_code, stdout, stderr = ssh.execute(FACTS_PROBE)
+    if exit_code != 0:
+        console.print("[yellow]Could not read host facts, using conservative defaults[/]")
+        facts = HostFacts()
+    else:
+        facts = parse_facts(stdout)
+
+    record_facts(ssh, facts)
+    return facts
+
+
+def record_facts(ssh, facts: HostFacts) -> None:
+    """Cache host facts on the SSH client and emit them as a fact event.
+
+    Args:
+        ssh: Connected SSH client
+        facts: Facts gathered from the host
+    """
+    ssh.facts = facts
+    events.emit(
+        FACT,
+        host=ssh.config.host,
+        summary=f"{facts.cpu_count} CPUs, {facts.memory_mb} MB RAM, {facts.disk_type} storage",
+        **asdict(facts),
+    )
@@ -0,0 +1,130 @@
+"""Client for the remote helper that serves operations over one SSH channel.
+
+Running each command over its own exec channel costs a channel open, a PTY,
+a sudo process and a shell start on the server. With the helper, the CLI
+sends a small stdlib-only Python program (enferno_cli/remote/helper.py) when
+it connects and keeps its channel open; commands, file transfers, hashes,
+package queries and service actions are then framed JSON requests to it.
+"""
+
+import shlex
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from enferno_cli.core.events import console
+from enferno_cli.remote.helper import PROTOCOL_VERSION, read_frame, write_frame
+
+HELPER_SOURCE = Path(__file__).resolve().parent.parent / "remote" / "helper.py"
+
+# Seconds to wait for the helper to answer its first request
+START_TIMEOUT = 10.0
+
+# Errors that are re-raised with their own type on the client side
+_ERROR_TYPES = {"FileNotFoundError": FileNotFoundError, "PermissionError": PermissionError}
+
+
+class HelperError(RuntimeError):
+    """An operation failed inside the remote helper."""
+
+
+class RemoteHelper:
+    """Send requests to a running helper and wait for the replies."""
+
+    def __init__(self, reader, writer, channel=None):
+        """Initialize the client.
+
+        Args:
+            reader: Binary stream with the helper's replies
+            writer: Binary stream to the helper's stdin
+            channel: paramiko channel the streams belong to, closed on close()
+        """
+        self.reader = reader
+        self.writer = writer
+        self.channel = channel
+        self.info: Dict = {}
+        # One request is in flight at a time
+        self.lock = threading.Lock()
+
+    def call(self, op: str, data: bytes = b"", **fields) -> Tuple[Dict, bytes]:
+        """Run an operation in the helper.
+
+        Args:
+            op: Operation name
+            data: Raw payload, e.g. file contents to write
+            **fields: Operation arguments
+
+        Returns:
+            Tuple of (reply fields, raw payload)
+
+        Raises:
+            ConnectionError: If the helper has exited
+            FileNotFoundError, PermissionError, HelperError: If the operation failed
+        """
+        with self.lock:
+            write_frame(self.writer, dict(fields, op=op), data)
+            frame = read_frame(self.reader)
+        if frame is None:
+            raise ConnectionError("The remote helper exited")
+        reply, payload = frame
+        if not reply.get("ok"):
+            raise _ERROR_TYPES.get(reply.get("type"), HelperError)(reply.get("error"))
+        return reply, payload
+
+    def close(self) -> None:
+        """Ask the helper to exit and close its channel."""
+        try:
+            self.call("exit")
+        except (OSError, ValueError):
+            pass
+        if self.channel is not None:
+            self.channel.close()
+
+
+def bootstrap_command(size: int, sudo: bool) -> str:
+    """Build the command that reads the helper source from stdin and runs it.
+
+    Args:
+        size: Length of the helper source in bytes
+        sudo: Whether the login user needs sudo to become root
+
+    Returns:
+        Shell command for the exec channel
+    """
+    program = f"import sys; exec(compile(sys.stdin.buffer.read({size}), 'enferno-helper', 'exec'))"
+    command = f"python3 -u -c {shlex.quote(program)}"
+    return f"sudo -n {command}" if sudo else command
+
+
+def start_helper(client, user: str, sudo: bool) -> Optional[RemoteHelper]:
+    """Start the helper over a new exec channel of a connected paramiko client.
+
+    Args:
+        client: Connected paramiko.SSHClient
+        user: Login user, whose identity non-sudo commands keep
+        sudo: Whether the login user needs sudo to become root
+
+    Returns:
+        The running helper, or None if the server cannot run it (no python3,
+        sudo needs a password, or the server does not run commands)
+    """
+    source = HELPER_SOURCE.read_bytes()
+    stdin, stdout, stderr = client.exec_command(bootstrap_command(len(source), sudo))
+    channel = stdout.channel
+    helper = RemoteHelper(stdout, stdin, channel)
+    try:
+        channel.settimeout(START_TIMEOUT)
+        stdin.write(source)
+        stdin.flush()
+        helper.info, _ = helper.call("hello", user=user)
+        channel.settimeout(None)
+    except Exception as e:
+        channel.close()
+        console.print(f"[yellow]Remote helper unavailable ({e or type(e).__name__}); using a channel per command[/]")
+        return None
+
+    if helper.info.get("version") != PROTOCOL_VERSION:
+        helper.close()
+        console.print("[yellow]Remote helper version mismatch; using a channel per command[/]")
+        return None
+    return helper
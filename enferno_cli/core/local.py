@@ -0,0 +1,61 @@
+"""Transport that provisions the machine the CLI runs on."""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Tuple, Union
+
+from enferno_cli.core.events import console
+from enferno_cli.core.transport import Transport
+
+
+class LocalTransport(Transport):
+    """Run commands with subprocess and transfer files with plain file I/O.
+
+    Used when baking images or running from cloud-init on the target itself,
+    where connecting back to localhost over SSH would only add a handshake,
+    channel overhead and loopback copies.
+    """
+
+    is_local = True
+
+    def connect(self) -> bool:
+        """Start provisioning this machine; there is nothing to connect to."""
+        if not self._connected:
+            self._connected = True
+            console.print("[bold green]Provisioning this machine directly[/]")
+        return True
+
+    def sudo_command(self, command: str) -> str:
+        """Prefix a command with sudo unless already running as root."""
+        if os.geteuid() == 0:
+            return command
+        return super().sudo_command(command)
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Run a command through bash, the shell tasks get over SSH.
+
+        Like the SSH transport, commands are not killed on timeout; package
+        installs routinely take longer than the default.
+        """
+        result = subprocess.run(
+            ["/bin/bash", "-c", command],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            errors="replace",
+        )
+        return result.returncode, result.stdout, result.stderr
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Copy a file into place."""
+        shutil.copyfile(local_path, remote_path)
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Copy a file out."""
+        shutil.copyfile(remote_path, local_path)
+
+    def _stat(self, remote_path: str) -> bool:
+        """Check whether a path exists."""
+        return os.path.lexists(remote_path)
@@ -1,55 +1,34 @@
 """Task manager for server setup."""
 
-import importlib
-import pkgutil
-from typing import Dict, List, Optional, Type
+from typing import List, Optional
 
-from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
+from enferno_cli.core.compiler import compile_tasks, run_bundle
 from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
+from enferno_cli.core.facts import gather_facts
+from enferno_cli.core.preflight import run_preflight
+from enferno_cli.core.profiler import PHASE, profiler
+from enferno_cli.core.registry import TaskRegistry, get_registry
 from enferno_cli.core.ssh import SSHClient
-from enferno_cli.core.task import Task
-
-console = Console()
+from enferno_cli.core.transport import Transport
 
 
 class TaskManager:
     """Task manager for server setup."""
 
-    def __init__(self, config: ServerConfig):
+    def __init__(self, config: ServerConfig, ssh: Optional[Transport] = None):
         """Initialize the task manager.
 
         Args:
             config: Server configuration.
+            ssh: Transport to run tasks through (default: a new SSHClient for config).
         """
         self.config = config
-        self.ssh = SSHClient(config)
-        self.tasks: Dict[str, Type[Task]] = {}
+        self.ssh = ssh or SSHClient(config)
+        self.tasks: TaskRegistry = get_registry()
         self.executed_tasks: List[str] = []
-        self._discover_tasks()
-
-    def _discover_tasks(self) -> None:
-        """Discover available tasks."""
-        import enferno_cli.tasks
-
-        # Find all modules in the tasks package
-        for _, name, _ in pkgutil.iter_modules(enferno_cli.tasks.__path__):
-            # Import the module
-            module = importlib.import_module(f"enferno_cli.tasks.{name}")
-            
-            # Find all classes in the module that are subclasses of Task
-            for attr_name in dir(module):
-                attr = getattr(module, attr_name)
-                if (
-                    isinstance(attr, type)
-                    and issubclass(attr, Task)
-                    and attr is not Task
-                    and hasattr(attr, "name")
-                ):
-                    self.tasks[attr.name] = attr
-        
-        console.print(f"[green]Discovered {len(self.tasks)} tasks[/]")
 
     def get_task_names(self) -> List[str]:
         """Get names of all available tasks.
@@ -57,7 +36,7 @@ class TaskManager:
         Returns:
             List of task names
         """
-        return list(self.tasks.keys())
+        return self.tasks.names()
 
     def get_task_dependencies(self, task_name: str) -> List[str]:
         """Get dependencies for a task.
@@ -81,6 +60,38 @@ class TaskManager:
         
         return dependencies
 
+    def plan(self) -> List[str]:
+        """Resolve the tasks a setup run executes, dependencies first.
+        
+        Returns:
+            Task names in execution order
+            
+        Raises:
+            ValueError: If a selected task does not exist
+        """
+        unknown_tasks = [task for task in self.config.selected_tasks if task not in self.tasks]
+        if unknown_tasks:
+            raise ValueError(f"Task not found: {unknown_tasks}")
+        
+        order: List[str] = []
+        
+        def visit(task_name: str) -> None:
+            if task_name in order or task_name not in self.tasks:
+                return
+            if task_name == "database" and not self.config.postgres_enabled:
+                return
+            for dep in self.get_task_dependencies(task_name):
+                visit(dep)
+            order.append(task_name)
+        
+        roots = self.config.selected_tasks or [
+            task_name for task_name in self.get_task_names()
+            if task_name != "database" or self.config.postgres_enabled
+        ]
+        for task_name in roots:
+            visit(task_name)
+        return order
+
     def run_task(self, task_name: str) -> bool:
         """Run a single task.
         
@@ -149,9 +160,47 @@ class TaskManager:
         
         return all_success
 
-    def run_setup(self) -> bool:
+    def run_compiled(self) -> bool:
+        """Run all tasks as compiled bundles, running live where compiling stops.
+        
+        The longest compilable run of pending tasks goes to the server as one
+        bundle. A task that cannot be compiled, or at which a bundle diverged
+        from its compiled assumptions, runs live before compiling the rest.
+        
+        Returns:
+            True if all tasks were successful, False otherwise
+        """
+        try:
+            pending = [task_name for task_name in self.plan() if task_name not in self.executed_tasks]
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
+            return False
+        
+        facts = gather_facts(self.ssh)
+        descriptions = {task_name: self.tasks[task_name].description for task_name in pending}
+        while pending:
+            bundle = compile_tasks(self.config, facts, [self.tasks[task_name] for task_name in pending])
+            if bundle is not None:
+                completed = run_bundle(self.ssh, bundle, descriptions)
+                if completed is None:
+                    return False
+                self.executed_tasks.extend(completed)
+                pending = [task_name for task_name in pending if task_name not in self.executed_tasks]
+                if completed == bundle.tasks:
+                    continue
+            
+            # Not compilable, or the bundle diverged at this task
+            if not self.run_task(pending.pop(0)):
+                return False
+        return True
+
+    def run_setup(self, preflight: bool = True, compiled: bool = False) -> bool:
         """Run the server setup.
         
+        Args:
+            preflight: Run the preflight checks before the first task
+            compiled: Run the tasks as compiled bundles (see run_compiled)
+            
         Returns:
             True if setup was successful, False otherwise
         """
@@ -164,8 +213,16 @@ class TaskManager:
             return False
         
         try:
+            # Fail fast before any task changes the server
+            if preflight:
+                with profiler.span("preflight", PHASE):
+                    preflight_ok = run_preflight(self.config, self.ssh, network=not self.ssh.is_local)
+                if not preflight_ok:
+                    console.print("[bold red]Server setup aborted by preflight checks![/]")
+                    return False
+            
             # Run all tasks
-            success = self.run_all_tasks()
+            success = self.run_compiled() if compiled else self.run_all_tasks()
             
             if success:
                 console.print("[bold green]Server setup completed successfully![/]")
@@ -0,0 +1,222 @@
+"""Preflight checks run before any task changes the server."""
+
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Set
+
+from rich.table import Table
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
+from enferno_cli.core.facts import FACTS_PROBE, parse_facts, record_facts
+
+OK = "ok"
+WARN = "warn"
+FAIL = "fail"
+
+# Tasks that request a certificate over HTTP-01 and need DNS and port 80
+SSL_TASKS = {"nginx", "nginx_ssl", "nginx_www"}
+
+MIN_FREE_DISK_MB = 1024
+LOW_FREE_DISK_MB = 2048
+# A 512 MB plan reports about 450-480 MB of MemTotal after the kernel's reservations
+MIN_MEMORY_MB = 400
+LOW_MEMORY_MB = 1024
+SUPPORTED_OS = {"ubuntu"}
+
+PORT_TIMEOUT = 3
+
+# Host facts plus the state that makes apt or sudo fail, in one round trip
+REMOTE_PROBE = FACTS_PROBE + "; " + (
+    "echo disk_free_kb=$(df -Pk / | awk 'NR==2 {print $4}'); "
+    # The dpkg locks are only readable by root; holding one is what makes apt fail
+    "echo apt_busy=$($([ \"$(id -u)\" = 0 ] || echo sudo -n) fuser /var/lib/dpkg/lock-frontend /var/lib/dpkg/lock "
+    ">/dev/null 2>&1 && echo 1 || echo 0); "
+    "echo has_apt=$(command -v apt-get >/dev/null && echo 1 || echo 0); "
+    "echo os_id=$(. /etc/os-release && echo $ID); "
+    "echo os_version=$(. /etc/os-release && echo $VERSION_ID); "
+    "echo uid=$(id -u); "
+    "echo sudo=$(sudo -n true 2>/dev/null && echo 1 || echo 0)"
+)
+
+
+@dataclass
+class CheckResult:
+    """Outcome of a single preflight check."""
+
+    name: str
+    status: str
+    detail: str
+
+
+def _resolve(name: str) -> Set[str]:
+    """Resolve a name to its IPv4 and IPv6 addresses."""
+    try:
+        return {info[4][0] for info in socket.getaddrinfo(name, None, proto=socket.IPPROTO_TCP)}
+    except socket.gaierror:
+        return set()
+
+
+def check_dns(config: ServerConfig, required: bool) -> List[CheckResult]:
+    """Check that the domain's A/AAAA records point at the server.
+
+    Records proxied through Cloudflare resolve to its edge addresses, so with
+    cloudflare_enabled a mismatch is only a warning.
+
+    Args:
+        config: Server configuration
+        required: Whether a mismatch fails the run (certificates are requested)
+
+    Returns:
+        One result per domain
+    """
+    host_addresses = _resolve(config.host)
+    names = [config.server_hostname]
+    if config.use_www:
+        names.append(f"www.{config.server_hostname}")
+
+    results = []
+    for name in names:
+        addresses = _resolve(name)
+        if not addresses:
+            status, detail = FAIL if required else WARN, "no A/AAAA records"
+        elif addresses & host_addresses:
+            status, detail = OK, ", ".join(sorted(addresses))
+        elif config.cloudflare_enabled:
+            status, detail = WARN, f"resolves to {', '.join(sorted(addresses))} (proxied through Cloudflare?)"
+        else:
+            status = FAIL if required else WARN
+            detail = f"resolves to {', '.join(sorted(addresses))}, not {config.host}"
+        results.append(CheckResult(f"DNS {name}", status, detail))
+    return results
+
+
+def check_port(host: str, port: int, required: bool) -> CheckResult:
+    """Check that a TCP port on the server is reachable from here.
+
+    A refused connection still proves that packets reach the host, which is all
+    that matters before nginx is installed; only a timeout points at a firewall.
+
+    Args:
+        host: Server address
+        port: TCP port
+        required: Whether an unreachable port fails the run
+
+    Returns:
+        Result of the check
+    """
+    name = f"Port {port}"
+    try:
+        with socket.create_connection((host, port), timeout=PORT_TIMEOUT):
+            return CheckResult(name, OK, "open")
+    except ConnectionRefusedError:
+        return CheckResult(name, OK, "reachable, nothing listening yet")
+    except OSError as e:
+        return CheckResult(name, FAIL if required else WARN, f"unreachable ({e or 'timed out'})")
+
+
+def check_remote(ssh) -> List[CheckResult]:
+    """Check disk, memory, apt, OS release and sudo with a single remote command.
+
+    The probe also yields the host facts, which are recorded on the SSH client so
+    tasks do not probe the host again.
+
+    Args:
+        ssh: Connected SSH client
+
+    Returns:
+        Results of the remote checks
+    """
+    exit_code, stdout, stderr = ssh.execute(REMOTE_PROBE)
+    if exit_code != 0:
+        return [CheckResult("Remote probe", FAIL, (stderr or stdout).strip() or f"exit code {exit_code}")]
+
+    values: Dict[str, str] = {}
+    for line in stdout.splitlines():
+        key, sep, value = line.strip().partition("=")
+        if sep:
+            values[key] = value.strip()
+    facts = parse_facts(stdout)
+    record_facts(ssh, facts)
+
+    results = []
+
+    disk_free_mb = int(values["disk_free_kb"]) // 1024 if values.get("disk_free_kb", "").isdigit() else None
+    if disk_free_mb is None:
+        results.append(CheckResult("Disk space", WARN, "could not read free space on /"))
+    else:
+        status = FAIL if disk_free_mb < MIN_FREE_DISK_MB else WARN if disk_free_mb < LOW_FREE_DISK_MB else OK
+        results.append(CheckResult("Disk space", status, f"{disk_free_mb} MB free on /"))
+
+    status = FAIL if facts.memory_mb < MIN_MEMORY_MB else WARN if facts.memory_mb < LOW_MEMORY_MB else OK
+    results.append(CheckResult("Memory", status, f"{facts.memory_mb} MB, {facts.cpu_count} CPUs"))
+
+    if values.get("has_apt") != "1":
+        results.append(CheckResult("Package manager", FAIL, "apt-get not found"))
+    elif values.get("apt_busy", "0") != "0":
+        results.append(CheckResult("Package manager", FAIL, "the dpkg lock is held (e.g. by unattended-upgrades); retry when it is released"))
+    else:
+        results.append(CheckResult("Package manager", OK, "dpkg lock free"))
+
+    os_id = values.get("os_id", "")
+    os_name = f"{os_id} {values.get('os_version', '')}".strip() or "unknown"
+    results.append(CheckResult("OS release", OK if os_id in SUPPORTED_OS else WARN, os_name))
+
+    if values.get("uid") == "0":
+        results.append(CheckResult("sudo", OK, "connected as root"))
+    elif values.get("sudo") == "1":
+        results.append(CheckResult("sudo", OK, "passwordless sudo available"))
+    else:
+        results.append(CheckResult("sudo", FAIL, "the SSH user cannot run sudo without a password"))
+
+    return results
+
+
+def run_preflight(config: ServerConfig, ssh, network: bool = True) -> bool:
+    """Run all preflight checks concurrently and print a consolidated report.
+
+    Args:
+        config: Server configuration
+        ssh: Connected transport
+        network: Check DNS and ports from here; pointless when provisioning this machine
+
+    Returns:
+        True if no check failed, False otherwise
+    """
+    console.print("[cyan]Running preflight checks...[/]")
+
+    selected = set(config.selected_tasks)
+    ssl_required = config.ssl_enabled and (not selected or bool(selected & SSL_TASKS))
+
+    checks: List[Callable[[], object]] = [lambda: check_remote(ssh)]
+    if network:
+        checks += [
+            lambda: check_dns(config, ssl_required),
+            lambda: check_port(config.host, 80, ssl_required),
+            lambda: check_port(config.host, 443, False),
+        ]
+    results: List[CheckResult] = []
+    with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+        for outcome in executor.map(lambda check: check(), checks):
+            results.extend(outcome if isinstance(outcome, list) else [outcome])
+
+    styles = {OK: "[green]ok[/]", WARN: "[yellow]warn[/]", FAIL: "[bold red]fail[/]"}
+    table = Table(title="Preflight checks")
+    table.add_column("Check")
+    table.add_column("Status")
+    table.add_column("Detail")
+    for result in results:
+        table.add_row(result.name, styles[result.status], result.detail)
+    console.print(table)
+
+    failed = [result for result in results if result.status == FAIL]
+    if failed:
+        console.print(
+            f"[bold red]{len(failed)} preflight check(s) failed. "
+            "Fix them or rerun with --skip-preflight.[/]"
+        )
+        return False
+
+    console.print("[green]Preflight checks passed[/]")
+    return True
@@ -0,0 +1,186 @@
+"""Wall-time profiler for tasks, remote commands and file transfers."""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+from rich.table import Table
+
+from enferno_cli.core.events import console
+
+# Span categories
+TASK = "task"
+PHASE = "phase"
+COMMAND = "command"
+TRANSFER = "transfer"
+SSH = "ssh"
+
+SLOWEST_COMMANDS = 10
+
+
+@dataclass
+class Span:
+    """A timed section of the run."""
+
+    name: str
+    category: str
+    start_ns: int
+    duration_ns: int
+    thread_id: int
+    task: Optional[str] = None
+    args: Dict = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration in milliseconds."""
+        return self.duration_ns / 1_000_000
+
+
+class Profiler:
+    """Collects spans while enabled; a disabled profiler records nothing."""
+
+    def __init__(self):
+        """Initialize a disabled profiler."""
+        self.enabled = False
+        self.spans: List[Span] = []
+        self._origin_ns = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enable(self) -> None:
+        """Start recording, discarding earlier spans."""
+        self.spans = []
+        self._origin_ns = time.perf_counter_ns()
+        self.enabled = True
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[Dict]:
+        """Time the enclosed block.
+
+        Args:
+            name: Span name, e.g. the task or command
+            category: One of the span categories
+            **args: Details to attach to the span
+
+        Yields:
+            The args dict, so the block can attach results such as byte counts
+        """
+        if not self.enabled:
+            yield args
+            return
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        task = name if category == TASK else next(
+            (entry[0] for entry in reversed(stack) if entry[1] == TASK), None
+        )
+
+        stack.append((name, category))
+        start_ns = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            duration_ns = time.perf_counter_ns() - start_ns
+            stack.pop()
+            with self._lock:
+                self.spans.append(Span(
+                    name=name,
+                    category=category,
+                    start_ns=start_ns - self._origin_ns,
+                    duration_ns=duration_ns,
+                    thread_id=threading.get_ident(),
+                    task=task,
+                    args=args,
+                ))
+
+    def by_category(self, category: str) -> List[Span]:
+        """Spans of one category in start order."""
+        return sorted((span for span in self.spans if span.category == category), key=lambda span: span.start_ns)
+
+    def summary(self) -> None:
+        """Print where the run spent its time."""
+        if not self.spans:
+            console.print("[yellow]No profile data recorded[/]")
+            return
+
+        commands = self.by_category(COMMAND)
+        transfers = self.by_category(TRANSFER)
+        per_task: Dict[Optional[str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for span in commands:
+            per_task[span.task]["commands"] += 1
+            per_task[span.task]["command_ms"] += span.duration_ms
+        for span in transfers:
+            per_task[span.task]["transfers"] += 1
+            per_task[span.task]["transfer_ms"] += span.duration_ms
+
+        table = Table(title="Time by task")
+        table.add_column("Task")
+        table.add_column("Wall (ms)", justify="right")
+        table.add_column("Commands", justify="right")
+        table.add_column("Command (ms)", justify="right")
+        table.add_column("Transfers", justify="right")
+        table.add_column("Transfer (ms)", justify="right")
+        for span in sorted(self.by_category(TASK), key=lambda span: span.duration_ns, reverse=True):
+            stats = per_task[span.name]
+            table.add_row(
+                span.name,
+                f"{span.duration_ms:.0f}",
+                f"{stats['commands']:.0f}",
+                f"{stats['command_ms']:.0f}",
+                f"{stats['transfers']:.0f}",
+                f"{stats['transfer_ms']:.0f}",
+            )
+        console.print(table)
+
+        slowest = Table(title=f"Slowest {SLOWEST_COMMANDS} commands")
+        slowest.add_column("Task")
+        slowest.add_column("Command")
+        slowest.add_column("Time (ms)", justify="right")
+        slowest.add_column("Exit", justify="right")
+        for span in sorted(commands, key=lambda span: span.duration_ns, reverse=True)[:SLOWEST_COMMANDS]:
+            slowest.add_row(span.task or "-", span.name, f"{span.duration_ms:.0f}", str(span.args.get("exit_code", "")))
+        console.print(slowest)
+
+        total_ms = max(span.start_ns + span.duration_ns for span in self.spans) / 1_000_000
+        bytes_out = sum(span.args.get("bytes_out", 0) for span in commands + transfers)
+        bytes_in = sum(span.args.get("bytes_in", 0) for span in commands + transfers)
+        console.print(
+            f"[bold]Total {total_ms / 1000:.1f}s:[/] {len(commands)} commands "
+            f"({sum(span.duration_ms for span in commands) / 1000:.1f}s), {len(transfers)} transfers "
+            f"({sum(span.duration_ms for span in transfers) / 1000:.1f}s), "
+            f"{bytes_out} bytes out, {bytes_in} bytes in"
+        )
+
+    def export_chrome_trace(self, path: Union[str, Path]) -> None:
+        """Write the spans as Chrome trace / Perfetto JSON.
+
+        Args:
+            path: Output file, loadable in chrome://tracing or ui.perfetto.dev
+        """
+        pid = os.getpid()
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start_ns / 1000,
+                "dur": span.duration_ns / 1000,
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {key: value for key, value in span.args.items() if value is not None},
+            }
+            for span in sorted(self.spans, key=lambda span: span.start_ns)
+        ]
+        Path(path).write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+        console.print(f"Profile written to [bold green]{path}[/]")
+
+
+# Shared by every module of one run
+profiler = Profiler()
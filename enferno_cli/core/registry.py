@@ -0,0 +1,85 @@
+"""Registry of the tasks available to the task manager."""
+
+from functools import lru_cache
+from importlib import import_module
+from typing import Dict, Iterator, List, Type
+
+from enferno_cli.core.events import console
+from enferno_cli.core.task import Task
+
+ENTRY_POINT_GROUP = "enferno_cli.tasks"
+
+
+class TaskRegistry:
+    """Maps task names to task classes, importing each class on first use."""
+
+    def __init__(self, specs: Dict[str, str]):
+        """Initialize the registry.
+
+        Args:
+            specs: Task name to "module:class" import path
+        """
+        self.specs = dict(specs)
+        self._classes: Dict[str, Type[Task]] = {}
+
+    def __contains__(self, name: object) -> bool:
+        """Check whether a task is registered."""
+        return name in self.specs
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over task names in registration order."""
+        return iter(self.specs)
+
+    def __len__(self) -> int:
+        """Number of registered tasks."""
+        return len(self.specs)
+
+    def names(self) -> List[str]:
+        """Names of all registered tasks."""
+        return list(self.specs)
+
+    def __getitem__(self, name: str) -> Type[Task]:
+        """Import and return the class of a task.
+
+        Raises:
+            KeyError: If the task is not registered
+            TypeError: If the import path does not name a Task subclass
+        """
+        if name not in self._classes:
+            module_name, _, class_name = self.specs[name].partition(":")
+            task_class = getattr(import_module(module_name), class_name)
+            if not (isinstance(task_class, type) and issubclass(task_class, Task)):
+                raise TypeError(f"{self.specs[name]} registered for task '{name}' is not a Task")
+            self._classes[name] = task_class
+        return self._classes[name]
+
+
+def _entry_point_specs() -> Dict[str, str]:
+    """Read tasks registered by installed packages without importing them."""
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    # Python 3.9 returns a dict of groups, 3.10+ a selectable collection
+    group = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, "select") else eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep.value for ep in group}
+
+
+@lru_cache(maxsize=None)
+def get_registry() -> TaskRegistry:
+    """Build the task registry once per process.
+
+    Built-in tasks come from the manifest in enferno_cli.tasks; packages can add
+    tasks through the "enferno_cli.tasks" entry point group. Built-in names win.
+
+    Returns:
+        TaskRegistry with every available task
+    """
+    from enferno_cli.tasks import TASKS
+
+    specs = dict(TASKS)
+    for name, value in _entry_point_specs().items():
+        if name in specs:
+            console.print(f"[yellow]Ignoring entry point task '{name}': a built-in task has that name[/]")
+            continue
+        specs[name] = value
+    return TaskRegistry(specs)
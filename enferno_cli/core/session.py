@@ -0,0 +1,219 @@
+"""Record provisioning runs to a session file and replay them without a server."""
+
+import base64
+import gzip
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
+from enferno_cli.core.ssh import SSHClient
+from enferno_cli.core.transport import Transport
+
+SESSION_VERSION = 1
+
+# Long random tokens (generated passwords, temp names) are ignored when matching
+VOLATILE_TOKEN = re.compile(r"[A-Za-z0-9_\-]{16,}")
+
+
+def _normalize(command: str) -> str:
+    """Mask the parts of a command that change from run to run."""
+    return VOLATILE_TOKEN.sub("*", command)
+
+
+def save_session(path: Union[str, Path], host: str, entries: List[Dict]) -> None:
+    """Write a session file: gzip-compressed JSON lines, header first.
+
+    The file can contain secrets from commands and their output, so it is only
+    readable by the current user.
+
+    Args:
+        path: Session file path
+        host: Host the session was recorded against
+        entries: Recorded operations in order
+    """
+    header = {"session": SESSION_VERSION, "host": host, "recorded": round(time.time()), "operations": len(entries)}
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as out:
+        for record in [header] + entries:
+            out.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+
+
+def load_session(path: Union[str, Path]) -> Tuple[Dict, List[Dict]]:
+    """Read a session file.
+
+    Args:
+        path: Session file path
+
+    Returns:
+        Tuple of (header, entries)
+
+    Raises:
+        ValueError: If the file is not a session file of a supported version
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as session_file:
+        records = [json.loads(line) for line in session_file if line.strip()]
+    if not records or records[0].get("session") != SESSION_VERSION:
+        raise ValueError(f"{path} is not a version {SESSION_VERSION} session file")
+    return records[0], records[1:]
+
+
+class RecordingSSHClient(SSHClient):
+    """SSH client that records every operation and writes a session file on disconnect."""
+
+    def __init__(self, config: ServerConfig, path: Union[str, Path]):
+        """Initialize the client.
+
+        Args:
+            config: Server configuration
+            path: Session file to write
+        """
+        super().__init__(config)
+        self.path = path
+        self.entries: List[Dict] = []
+
+    def _record(self, op: str, start: float, **fields) -> None:
+        """Append an operation with its duration."""
+        self.entries.append({"op": op, **fields, "ms": round((time.perf_counter() - start) * 1000, 3)})
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Run and record a command."""
+        start = time.perf_counter()
+        try:
+            exit_code, stdout, stderr = super()._exec(command, timeout)
+        except Exception as e:
+            self._record("exec", start, cmd=command, error=str(e))
+            raise
+        self._record("exec", start, cmd=command, rc=exit_code, out=stdout, err=stderr)
+        return exit_code, stdout, stderr
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Upload and record a file transfer."""
+        start = time.perf_counter()
+        try:
+            super()._put(local_path, remote_path)
+        except Exception as e:
+            self._record("put", start, path=remote_path, error=str(e))
+            raise
+        self._record("put", start, path=remote_path, bytes=os.path.getsize(local_path))
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Download a file and record its content."""
+        start = time.perf_counter()
+        try:
+            super()._get(remote_path, local_path)
+        except Exception as e:
+            self._record("get", start, path=remote_path, error=str(e))
+            raise
+        self._record("get", start, path=remote_path, data=base64.b64encode(Path(local_path).read_bytes()).decode("ascii"))
+
+    def _stat(self, remote_path: str) -> bool:
+        """Check and record whether a path exists."""
+        start = time.perf_counter()
+        try:
+            exists = super()._stat(remote_path)
+        except Exception as e:
+            self._record("stat", start, path=remote_path, error=str(e))
+            raise
+        self._record("stat", start, path=remote_path, exists=exists)
+        return exists
+
+    def disconnect(self) -> None:
+        """Disconnect and write the session file."""
+        super().disconnect()
+        if self.entries:
+            save_session(self.path, self.config.host, self.entries)
+            console.print(f"[green]Recorded {len(self.entries)} operations to {self.path}[/]")
+
+
+class ReplayTransport(Transport):
+    """Transport that answers from a recorded session instead of a server.
+
+    Operations are matched in order against the recording, first by exact
+    command or path and then with volatile tokens masked. Operations missing from
+    the recording succeed with empty output and are reported as misses.
+    """
+
+    def __init__(self, config: ServerConfig, path: Union[str, Path], speed: float = 0.0):
+        """Initialize the client.
+
+        Args:
+            config: Server configuration
+            path: Session file to replay
+            speed: Fraction of the recorded durations to wait (0 replays instantly, 1 in real time)
+
+        Raises:
+            ValueError: If the file is not a supported session file
+        """
+        super().__init__(config)
+        self.path = path
+        self.speed = speed
+        self.header, self.entries = load_session(path)
+        self.cursor = 0
+        self.misses: List[str] = []
+
+    def connect(self) -> bool:
+        """Start replaying; there is nothing to connect to."""
+        self._connected = True
+        console.print(
+            f"[bold green]Replaying {len(self.entries)} operations recorded against "
+            f"{self.header.get('host')} from {self.path}[/]"
+        )
+        return True
+
+    def disconnect(self) -> None:
+        """Stop replaying and report operations that were not in the recording."""
+        if not self._connected:
+            return
+        self._connected = False
+        if self.misses:
+            console.print(f"[yellow]{len(self.misses)} operations were not in the recording:[/]")
+            for miss in self.misses:
+                console.print(f"[yellow]  {miss}[/]")
+
+    def _next(self, op: str, key: str, value: str) -> Optional[Dict]:
+        """Find the next recorded operation matching a request and advance past it."""
+        remaining = range(self.cursor, len(self.entries))
+        for matches in (
+            lambda entry: entry[key] == value,
+            lambda entry: _normalize(entry[key]) == _normalize(value),
+        ):
+            for index in remaining:
+                entry = self.entries[index]
+                if entry["op"] == op and matches(entry):
+                    self.cursor = index + 1
+                    if self.speed:
+                        time.sleep(entry["ms"] / 1000 * self.speed)
+                    if "error" in entry:
+                        raise RuntimeError(entry["error"])
+                    return entry
+
+        self.misses.append(f"{op} {value}")
+        return None
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Replay a command."""
+        entry = self._next("exec", "cmd", command)
+        if entry is None:
+            return 0, "", ""
+        return entry["rc"], entry["out"], entry["err"]
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Replay an upload."""
+        self._next("put", "path", remote_path)
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Replay a download, writing the recorded content."""
+        entry = self._next("get", "path", remote_path)
+        if entry is None:
+            raise FileNotFoundError(remote_path)
+        Path(local_path).write_bytes(base64.b64decode(entry["data"]))
+
+    def _stat(self, remote_path: str) -> bool:
+        """Replay an existence check."""
+        entry = self._next("stat", "path", remote_path)
+        return bool(entry and entry["exists"])
@@ -0,0 +1,200 @@
+"""Worker sizing policies derived from host facts."""
+
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.facts import HostFacts
+
+# Share of host memory budgeted for uwsgi workers; the rest is left for
+# celery, redis, the database and the page cache
+UWSGI_MEMORY_FRACTION = 0.5
+UWSGI_MIN_PROCESSES = 2
+UWSGI_MAX_PROCESSES = 64
+UWSGI_DEFAULT_THREADS = 2
+UWSGI_MIN_LISTEN = 128
+UWSGI_LISTEN_PER_THREAD = 16
+
+# Connections per nginx worker for each expected concurrency profile
+NGINX_CONCURRENCY_PROFILES = {
+    "low": 1024,
+    "medium": 4096,
+    "high": 16384,
+}
+NGINX_KEEPALIVE_REQUESTS = 1000
+# Shared TLS session cache per concurrency profile; 1 MB holds about 4000 sessions
+NGINX_SSL_SESSION_CACHE_MB = {
+    "low": 10,
+    "medium": 50,
+    "high": 200,
+}
+
+CELERY_POOLS = ("prefork", "threads", "gevent")
+# Concurrency per core for pools that mostly wait on IO
+CELERY_THREADS_PER_CORE = 4
+CELERY_GREENLETS_PER_CORE = 50
+
+
+@dataclass
+class UwsgiSizing:
+    """Resolved uwsgi worker settings."""
+
+    processes: int
+    threads: int
+    listen: int
+    reload_on_rss: int
+
+    def to_vars(self) -> Dict[str, int]:
+        """Template variables for the uwsgi service."""
+        return {f"uwsgi_{key}": value for key, value in asdict(self).items()}
+
+
+def size_uwsgi(facts: HostFacts, config: ServerConfig) -> UwsgiSizing:
+    """Size uwsgi workers from host capacity.
+
+    Processes scale with cores (two per core) but are capped so that every worker
+    can grow to its reload-on-rss limit within the memory budget. Values set in
+    the configuration take precedence over the computed ones.
+
+    Args:
+        facts: Hardware facts for the application host
+        config: Server configuration with optional overrides
+
+    Returns:
+        UwsgiSizing for the host
+    """
+    reload_on_rss = config.uwsgi_reload_on_rss or (256 if facts.memory_mb >= 2048 else 128)
+
+    memory_budget = int(facts.memory_mb * UWSGI_MEMORY_FRACTION)
+    processes = config.uwsgi_processes or max(
+        UWSGI_MIN_PROCESSES,
+        min(facts.cpu_count * 2, memory_budget // reload_on_rss, UWSGI_MAX_PROCESSES),
+    )
+    threads = config.uwsgi_threads or UWSGI_DEFAULT_THREADS
+
+    # uwsgi refuses to start with a listen queue larger than net.core.somaxconn
+    listen = config.uwsgi_listen or max(UWSGI_MIN_LISTEN, processes * threads * UWSGI_LISTEN_PER_THREAD)
+    listen = min(listen, facts.somaxconn)
+
+    return UwsgiSizing(
+        processes=processes,
+        threads=threads,
+        listen=listen,
+        reload_on_rss=reload_on_rss,
+    )
+
+
+@dataclass
+class CelerySizing:
+    """Resolved celery worker settings."""
+
+    pool: str
+    autoscale_min: int
+    autoscale_max: int
+
+    @property
+    def autoscale(self) -> bool:
+        """Whether the pool supports autoscaling (only prefork does)."""
+        return self.pool == "prefork"
+
+    @property
+    def processes(self) -> int:
+        """Maximum number of worker processes."""
+        return self.autoscale_max if self.pool == "prefork" else 1
+
+    def to_vars(self) -> Dict[str, object]:
+        """Template variables for the celery service."""
+        return {
+            "celery_pool": self.pool,
+            "celery_autoscale": self.autoscale,
+            "celery_autoscale_min": self.autoscale_min,
+            "celery_autoscale_max": self.autoscale_max,
+        }
+
+
+def size_celery(facts: HostFacts, config: ServerConfig) -> CelerySizing:
+    """Size celery workers from host capacity.
+
+    Prefork workers are CPU bound and autoscale between half the cores and one
+    process per core. Thread and gevent pools serve IO-bound queues and run a fixed
+    concurrency that is a multiple of the core count. Values set in the
+    configuration take precedence over the computed ones.
+
+    Args:
+        facts: Hardware facts for the application host
+        config: Server configuration with optional overrides
+
+    Returns:
+        CelerySizing for the host
+    """
+    pool = config.celery_pool
+    if pool not in CELERY_POOLS:
+        raise ValueError(f"Unknown celery pool '{pool}'. Choose one of: {', '.join(CELERY_POOLS)}")
+
+    if pool == "threads":
+        default_max = facts.cpu_count * CELERY_THREADS_PER_CORE
+    elif pool == "gevent":
+        default_max = facts.cpu_count * CELERY_GREENLETS_PER_CORE
+    else:
+        default_max = facts.cpu_count
+
+    autoscale_max = config.celery_autoscale_max or default_max
+    autoscale_min = config.celery_autoscale_min or max(1, autoscale_max // 2)
+
+    return CelerySizing(
+        pool=pool,
+        autoscale_min=min(autoscale_min, autoscale_max),
+        autoscale_max=autoscale_max,
+    )
+
+
+@dataclass
+class NginxSizing:
+    """Resolved nginx worker and connection settings."""
+
+    worker_connections: int
+    worker_rlimit_nofile: int
+    keepalive_timeout: int
+    keepalive_requests: int
+    open_file_cache: int
+    ssl_session_cache: int
+
+    def to_vars(self) -> Dict[str, int]:
+        """Template variables for nginx.conf and its systemd limits."""
+        return {f"nginx_{key}": value for key, value in asdict(self).items()}
+
+
+def size_nginx(facts: HostFacts, config: ServerConfig) -> NginxSizing:
+    """Size nginx connection limits from host capacity.
+
+    Every proxied request holds two descriptors (client and upstream), so the
+    per-worker descriptor limit is twice the connection count, bounded by the
+    kernel's fs.nr_open. Busier profiles use shorter keepalive timeouts so idle
+    clients release their connections sooner, and a larger TLS session cache
+    (bounded to a sixteenth of memory) so returning clients can resume sessions.
+
+    Args:
+        facts: Hardware facts for the web host
+        config: Server configuration with the concurrency profile
+
+    Returns:
+        NginxSizing for the host
+    """
+    profile = config.nginx_concurrency
+    if profile not in NGINX_CONCURRENCY_PROFILES:
+        raise ValueError(
+            f"Unknown nginx concurrency profile '{profile}'. "
+            f"Choose one of: {', '.join(NGINX_CONCURRENCY_PROFILES)}"
+        )
+
+    rlimit_nofile = min(NGINX_CONCURRENCY_PROFILES[profile] * 2, facts.nr_open)
+    worker_connections = rlimit_nofile // 2
+
+    return NginxSizing(
+        worker_connections=worker_connections,
+        worker_rlimit_nofile=rlimit_nofile,
+        keepalive_timeout=15 if profile == "high" else 30,
+        keepalive_requests=NGINX_KEEPALIVE_REQUESTS,
+        open_file_cache=min(10000, worker_connections * 2),
+        ssl_session_cache=max(1, min(NGINX_SSL_SESSION_CACHE_MB[profile], facts.memory_mb // 16)),
+    )
@@ -1,186 +1,212 @@
 """SSH connection management for server setup."""
 
 import os
-import time
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
-import paramiko
-from rich.console import Console
 from rich.progress import Progress
 
 from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
+from enferno_cli.core.profiler import COMMAND, SSH, profiler
+from enferno_cli.core.transport import COMMAND_NAME_LENGTH, Transport, hash_command, package_query_command
 
-console = Console()
 
-
-class SSHClient:
+class SSHClient(Transport):
     """SSH client for executing commands on remote servers."""
 
     def __init__(self, config: ServerConfig):
         """Initialize SSH client with server configuration."""
-        self.config = config
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self._connected = False
+        super().__init__(config)
+        # paramiko (and its cryptography backend) is imported on first connect
+        self.client = None
+        # Remote helper serving all operations over one channel, if enabled and started
+        self.helper = None
+
+    def open(self) -> None:
+        """Open and authenticate the paramiko connection.
+        
+        Raises:
+            FileNotFoundError: If the configured SSH key does not exist
+            Exception: Any paramiko or socket error from connecting
+        """
+        import paramiko
+        
+        if self.client is None:
+            self.client = paramiko.SSHClient()
+            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        
+        connect_kwargs = {
+            "hostname": self.config.host,
+            "port": self.config.ssh_port,
+            "username": self.config.ansible_user,
+            "timeout": 10,
+        }
+
+        # Use key-based authentication if a key path is provided
+        if self.config.ssh_key_path:
+            key_path = os.path.expanduser(self.config.ssh_key_path)
+            if not os.path.exists(key_path):
+                raise FileNotFoundError(f"SSH key not found at {key_path}")
+            connect_kwargs["key_filename"] = key_path
+        else:
+            # Use password authentication
+            connect_kwargs["password"] = self.config.password
+
+        self.client.connect(**connect_kwargs)
+        self._connected = True
+
+    def is_active(self) -> bool:
+        """Whether the connection is open and its transport still alive."""
+        transport = self.client.get_transport() if self.client else None
+        return bool(self._connected and transport and transport.is_active())
 
     def connect(self) -> bool:
         """Connect to the remote server."""
         try:
-            connect_kwargs = {
-                "hostname": self.config.host,
-                "port": self.config.ssh_port,
-                "username": self.config.ansible_user,
-                "timeout": 10,
-            }
-
-            # Use key-based authentication if a key path is provided
-            if self.config.ssh_key_path:
-                key_path = os.path.expanduser(self.config.ssh_key_path)
-                if os.path.exists(key_path):
-                    connect_kwargs["key_filename"] = key_path
-                else:
-                    console.print(f"[bold red]SSH key not found at {key_path}[/]")
-                    return False
-            else:
-                # Use password authentication
-                connect_kwargs["password"] = self.config.password
-
-            with Progress() as progress:
+            with profiler.span(f"connect {self.config.host}", SSH), Progress(console=console) as progress:
                 task = progress.add_task("[cyan]Connecting to server...", total=1)
-                self.client.connect(**connect_kwargs)
+                self.open()
                 progress.update(task, completed=1)
 
-            self._connected = True
             console.print(f"[bold green]Connected to {self.config.host}[/]")
-            return True
+        except FileNotFoundError as e:
+            console.print(f"[bold red]{e}[/]")
+            return False
         except Exception as e:
             console.print(f"[bold red]Failed to connect: {str(e)}[/]")
             return False
+        
+        if self.config.remote_helper and self.helper is None:
+            from enferno_cli.core.helper import start_helper
+            
+            with profiler.span("start remote helper", SSH):
+                self.helper = start_helper(self.client, self.config.ansible_user, self.config.use_sudo)
+            if self.helper:
+                console.print(f"[green]Remote helper running (Python {self.helper.info['python']})[/]")
+        return True
 
     def disconnect(self) -> None:
         """Disconnect from the remote server."""
         if self._connected:
+            if self.helper:
+                self.helper.close()
+                self.helper = None
             self.client.close()
             self._connected = False
             console.print(f"[bold green]Disconnected from {self.config.host}[/]")
 
-    def execute(self, command: str, sudo: bool = False, timeout: int = 60) -> Tuple[int, str, str]:
-        """Execute a command on the remote server.
+    def stream(self, command: str, on_line: Callable[[str], None], sudo: bool = False) -> int:
+        """Execute a long-running command over its own channel, passing on output as it arrives.
         
         Args:
             command: The command to execute
+            on_line: Called with each line of stdout, without the newline
             sudo: Whether to run the command with sudo
-            timeout: Timeout in seconds for command execution (kept for compatibility)
             
         Returns:
-            Tuple of (exit_code, stdout, stderr)
+            Exit code of the command
+            
+        Raises:
+            Exception: If the connection fails while the command runs
         """
         if not self._connected:
             if not self.connect():
-                return (-1, "", "Not connected to server")
-
-        # Add sudo if needed
-        if sudo and not command.startswith("sudo "):
-            command = f"sudo {command}"
-
-        console.print(f"[dim]Executing: {command}[/]")
+                return -1
+        if sudo:
+            command = self.sudo_command(command)
         
-        try:
-            # Use timeout parameter for the exec_command call
-            stdin, stdout, stderr = self.client.exec_command(command, get_pty=True, timeout=timeout)
-            exit_status = stdout.channel.recv_exit_status()
-            
-            stdout_str = stdout.read().decode("utf-8")
-            stderr_str = stderr.read().decode("utf-8")
-            
-            if exit_status != 0:
-                console.print(f"[bold red]Command failed with exit code {exit_status}[/]")
-                if stderr_str:
-                    console.print(f"[red]{stderr_str}[/]")
-            
-            return (exit_status, stdout_str, stderr_str)
-        except Exception as e:
-            console.print(f"[bold red]Error executing command: {str(e)}[/]")
-            return (-1, "", str(e))
-
-    def upload_file(self, local_path: Union[str, Path], remote_path: str) -> bool:
-        """Upload a file to the remote server.
+        with profiler.span(command[:COMMAND_NAME_LENGTH], COMMAND):
+            stdin, stdout, stderr = self.client.exec_command(command)
+            for line in stdout:
+                on_line(line.rstrip("\r\n"))
+            return stdout.channel.recv_exit_status()
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Run a command in the remote helper or over a new exec channel.
         
         Args:
-            local_path: Path to the local file
-            remote_path: Path where to save the file on the remote server
+            command: Full command, including any sudo prefix
+            timeout: Timeout in seconds for the exec_command call
             
         Returns:
-            True if successful, False otherwise
+            Tuple of (exit_code, stdout, stderr)
         """
-        if not self._connected:
-            if not self.connect():
-                return False
-
+        if self.helper:
+            reply, _ = self.helper.call("exec", cmd=command)
+            return reply["rc"], reply["out"], reply["err"]
+        stdin, stdout, stderr = self.client.exec_command(command, get_pty=True, timeout=timeout)
+        exit_status = stdout.channel.recv_exit_status()
+        return exit_status, stdout.read().decode("utf-8"), stderr.read().decode("utf-8")
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Copy a local file to the server through the helper or over SFTP."""
+        if self.helper:
+            self.helper.call("write", Path(local_path).read_bytes(), path=remote_path)
+            return
+        sftp = self.client.open_sftp()
         try:
-            sftp = self.client.open_sftp()
             sftp.put(str(local_path), remote_path)
+        finally:
             sftp.close()
-            console.print(f"[green]Uploaded {local_path} to {remote_path}[/]")
-            return True
-        except Exception as e:
-            console.print(f"[bold red]Failed to upload file: {str(e)}[/]")
-            return False
-
-    def download_file(self, remote_path: str, local_path: Union[str, Path]) -> bool:
-        """Download a file from the remote server.
-        
-        Args:
-            remote_path: Path to the file on the remote server
-            local_path: Path where to save the file locally
-            
-        Returns:
-            True if successful, False otherwise
-        """
-        if not self._connected:
-            if not self.connect():
-                return False
 
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Copy a file from the server through the helper or over SFTP."""
+        if self.helper:
+            _, data = self.helper.call("read", path=remote_path)
+            Path(local_path).write_bytes(data)
+            return
+        sftp = self.client.open_sftp()
         try:
-            sftp = self.client.open_sftp()
             sftp.get(remote_path, str(local_path))
+        finally:
             sftp.close()
-            console.print(f"[green]Downloaded {remote_path} to {local_path}[/]")
-            return True
-        except Exception as e:
-            console.print(f"[bold red]Failed to download file: {str(e)}[/]")
-            return False
-
-    def file_exists(self, remote_path: str) -> bool:
-        """Check if a file exists on the remote server.
-        
-        Args:
-            remote_path: Path to the file on the remote server
-            
-        Returns:
-            True if the file exists, False otherwise
-        """
-        if not self._connected:
-            if not self.connect():
-                return False
 
+    def _stat(self, remote_path: str) -> bool:
+        """Check through the helper or over SFTP whether a path exists on the server."""
+        if self.helper:
+            return self.helper.call("stat", path=remote_path)[0]["exists"]
+        sftp = self.client.open_sftp()
         try:
-            sftp = self.client.open_sftp()
             sftp.stat(remote_path)
-            sftp.close()
             return True
         except FileNotFoundError:
             return False
-        except Exception as e:
-            console.print(f"[bold red]Error checking if file exists: {str(e)}[/]")
-            return False
+        finally:
+            sftp.close()
 
-    def __enter__(self):
-        """Context manager entry."""
-        self.connect()
-        return self
+    def file_hash(self, remote_path: str) -> Optional[str]:
+        """Get the SHA-256 of a file on the server, in the helper if it is running."""
+        if not self.helper:
+            return super().file_hash(remote_path)
+        
+        def hash_in_helper() -> Tuple[int, str, str]:
+            digest = self.helper.call("hash", path=remote_path)[0]["sha256"]
+            return (0, digest, "") if digest else (1, "", "")
+        
+        exit_code, stdout, stderr = self._traced(self.sudo_command(hash_command(remote_path)), hash_in_helper)
+        return stdout if exit_code == 0 and stdout else None
+
+    def package_versions(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Get installed package versions, in the helper if it is running."""
+        if not self.helper:
+            return super().package_versions(names)
+        versions: Dict[str, Optional[str]] = {name: None for name in names}
+        
+        def query_in_helper() -> Tuple[int, str, str]:
+            versions.update(self.helper.call("packages", names=list(names))[0]["versions"])
+            return 0, "", ""
+        
+        self._traced(package_query_command(names), query_in_helper)
+        return versions
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        self.disconnect() 
\ No newline at end of file
+    def service(self, action: str, *names: str) -> Tuple[int, str, str]:
+        """Run a systemctl action, in the helper if it is running."""
+        if not self.helper:
+            return super().service(action, *names)
+        
+        def service_in_helper() -> Tuple[int, str, str]:
+            reply, _ = self.helper.call("service", action=action, names=list(names))
+            return reply["rc"], reply["out"], reply["err"]
+        
+        return self._traced(self.sudo_command(f"systemctl {action} {' '.join(names)}"), service_in_helper)
@@ -1,15 +1,15 @@
 """Base task class for server setup tasks."""
 
+import time
 from abc import ABC, abstractmethod
 from typing import List, Optional
 
-from rich.console import Console
-
 from enferno_cli.core.config import ServerConfig
-from enferno_cli.core.ssh import SSHClient
+from enferno_cli.core.events import TASK_FINISH, TASK_START, events
+from enferno_cli.core.facts import HostFacts, gather_facts
+from enferno_cli.core.profiler import PHASE, TASK, profiler
 from enferno_cli.core.templates import TemplateRenderer
-
-console = Console()
+from enferno_cli.core.transport import Transport
 
 
 class Task(ABC):
@@ -18,9 +18,12 @@ class Task(ABC):
     name: str = "base_task"
     description: str = "Base task class"
     depends_on: List[str] = []
+    # Whether `setup --compile` can put the task in a bundle; tasks whose
+    # commands depend on remote output that cannot be predicted run live
+    compilable: bool = True
 
-    def __init__(self, config: ServerConfig, ssh: SSHClient):
-        """Initialize task with server configuration and SSH client."""
+    def __init__(self, config: ServerConfig, ssh: Transport):
+        """Initialize task with server configuration and the transport to the server."""
         self.config = config
         self.ssh = ssh
         self.renderer = TemplateRenderer(config)
@@ -57,27 +60,64 @@ class Task(ABC):
         Returns:
             True if the task was successful, False otherwise
         """
-        console.print(f"[bold cyan]Running task: {self.name}[/]")
-        console.print(f"[dim]{self.description}[/]")
-
-        # Run pre-task
-        if not self.pre_run():
-            console.print(f"[bold red]Pre-run failed for task: {self.name}[/]")
-            return False
-
-        # Run main task
-        self.success = self.run()
-        if not self.success:
-            console.print(f"[bold red]Task failed: {self.name}[/]")
-            return False
-
-        # Run post-task
-        if not self.post_run():
-            console.print(f"[bold red]Post-run failed for task: {self.name}[/]")
-            return False
-
-        console.print(f"[bold green]Task completed successfully: {self.name}[/]")
-        return True
+        events.emit(TASK_START, task=self.name, description=self.description)
+        start = time.perf_counter()
+
+        with profiler.span(self.name, TASK) as span:
+            # Run pre-task
+            with profiler.span("pre_run", PHASE):
+                pre_run_ok = self.pre_run()
+            if not pre_run_ok:
+                span["result"] = "pre_run failed"
+                return self._finish(span["result"], start)
+
+            # Run main task
+            with profiler.span("run", PHASE):
+                self.success = self.run()
+            if not self.success:
+                span["result"] = "failed"
+                return self._finish(span["result"], start)
+
+            # Run post-task
+            with profiler.span("post_run", PHASE):
+                post_run_ok = self.post_run()
+            if not post_run_ok:
+                span["result"] = "post_run failed"
+                return self._finish(span["result"], start)
+
+            span["result"] = "ok"
+
+        return self._finish("ok", start)
+
+    def _finish(self, result: str, start: float) -> bool:
+        """Emit the task_finish event.
+        
+        Args:
+            result: 'ok', 'failed', 'pre_run failed' or 'post_run failed'
+            start: perf_counter value when the task started
+            
+        Returns:
+            True if the task was successful, False otherwise
+        """
+        success = result == "ok"
+        events.emit(
+            TASK_FINISH,
+            task=self.name,
+            result=result,
+            success=success,
+            duration_ms=round((time.perf_counter() - start) * 1000, 3),
+        )
+        return success
+
+    def get_host_facts(self) -> HostFacts:
+        """Get hardware facts for the remote server.
+        
+        The host is probed once per connection and the result is shared by all tasks.
+        
+        Returns:
+            HostFacts for the remote server
+        """
+        return gather_facts(self.ssh)
 
     def sudo_execute(self, command: str) -> bool:
         """Execute a command with sudo.
@@ -5,12 +5,8 @@ import tempfile
 from pathlib import Path
 from typing import Dict, Optional, Union
 
-import jinja2
-from rich.console import Console
-
 from enferno_cli.core.config import ServerConfig
-
-console = Console()
+from enferno_cli.core.events import console
 
 # Get the templates directory
 TEMPLATES_DIR = Path(__file__).parent.parent / "templates"
@@ -21,6 +17,8 @@ class TemplateRenderer:
 
     def __init__(self, config: ServerConfig):
         """Initialize template renderer with server configuration."""
+        import jinja2
+        
         self.config = config
         self.env = jinja2.Environment(
             loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
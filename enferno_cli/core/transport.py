@@ -0,0 +1,349 @@
+"""Transport interface that tasks use to run commands and move files."""
+
+import os
+import shlex
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import (
+    COMMAND_FINISH,
+    COMMAND_START,
+    FILE_TRANSFER,
+    STDERR_LIMIT,
+    console,
+    events,
+)
+from enferno_cli.core.profiler import COMMAND, TRANSFER, profiler
+
+# Commands are named by their first characters in profiles
+COMMAND_NAME_LENGTH = 80
+
+# dpkg-query output format for package_versions
+DPKG_FORMAT = "${Package}\\t${db:Status-Status}\\t${Version}\\n"
+
+
+class Transport:
+    """Base class for running commands and transferring files on the target host.
+    
+    Subclasses implement connect/disconnect and the _exec, _put, _get and _stat
+    primitives; events, profiling and error handling live here so every
+    transport reports the same way.
+    """
+
+    # Whether the target host is the machine the CLI runs on
+    is_local = False
+
+    def __init__(self, config: ServerConfig):
+        """Initialize the transport with server configuration."""
+        self.config = config
+        self._connected = False
+        # Host facts are gathered lazily by tasks and cached per transport
+        self.facts = None
+
+    def connect(self) -> bool:
+        """Open the transport.
+        
+        Returns:
+            True if the transport is ready, False otherwise
+        """
+        raise NotImplementedError
+
+    def disconnect(self) -> None:
+        """Close the transport."""
+        self._connected = False
+
+    def sudo_command(self, command: str) -> str:
+        """Prefix a command so it runs as root."""
+        if command.startswith("sudo "):
+            return command
+        return f"sudo {command}"
+
+    def execute(self, command: str, sudo: bool = False, timeout: int = 60) -> Tuple[int, str, str]:
+        """Execute a command on the remote server.
+        
+        Args:
+            command: The command to execute
+            sudo: Whether to run the command with sudo
+            timeout: Timeout in seconds for command execution (kept for compatibility)
+            
+        Returns:
+            Tuple of (exit_code, stdout, stderr)
+        """
+        if not self._connected:
+            if not self.connect():
+                return (-1, "", "Not connected to server")
+
+        # Add sudo if needed
+        if sudo:
+            command = self.sudo_command(command)
+
+        return self._traced(command, lambda: self._exec(command, timeout))
+
+    def _traced(self, command: str, operation: Callable[[], Tuple[int, str, str]]) -> Tuple[int, str, str]:
+        """Run an operation as a command: emit its events and profile it.
+        
+        Transports that serve an operation without running `command` (e.g. in
+        the remote helper) use this so event consumers still see it.
+        
+        Args:
+            command: Shell command the operation stands for
+            operation: Callable returning (exit_code, stdout, stderr)
+            
+        Returns:
+            Tuple of (exit_code, stdout, stderr), exit code -1 if the operation raised
+        """
+        events.emit(COMMAND_START, host=self.config.host, command=command)
+        start = time.perf_counter()
+        
+        try:
+            with profiler.span(command[:COMMAND_NAME_LENGTH], COMMAND, bytes_out=len(command)) as span:
+                exit_status, stdout_str, stderr_str = operation()
+                span["exit_code"] = exit_status
+                span["bytes_in"] = len(stdout_str) + len(stderr_str)
+            
+            events.emit(
+                COMMAND_FINISH,
+                host=self.config.host,
+                command=command,
+                exit_code=exit_status,
+                duration_ms=self._elapsed_ms(start),
+                stdout_bytes=len(stdout_str),
+                stderr=stderr_str[-STDERR_LIMIT:] if exit_status != 0 else "",
+            )
+            return (exit_status, stdout_str, stderr_str)
+        except Exception as e:
+            events.emit(
+                COMMAND_FINISH,
+                host=self.config.host,
+                command=command,
+                exit_code=-1,
+                duration_ms=self._elapsed_ms(start),
+                error=str(e),
+            )
+            return (-1, "", str(e))
+
+    def stream(self, command: str, on_line: Callable[[str], None], sudo: bool = False) -> int:
+        """Execute a long-running command, passing each line of its output on.
+        
+        This implementation delivers the lines once the command has finished;
+        transports that can read output as it arrives override it.
+        
+        Args:
+            command: The command to execute
+            on_line: Called with each line of stdout, without the newline
+            sudo: Whether to run the command with sudo
+            
+        Returns:
+            Exit code of the command, -1 if it could not be run
+        """
+        exit_code, stdout, stderr = self.execute(command, sudo=sudo)
+        for line in stdout.splitlines():
+            on_line(line)
+        return exit_code
+
+    @staticmethod
+    def _elapsed_ms(start: float) -> float:
+        """Milliseconds since a perf_counter value."""
+        return round((time.perf_counter() - start) * 1000, 3)
+
+    def upload_file(self, local_path: Union[str, Path], remote_path: str) -> bool:
+        """Upload a file to the remote server.
+        
+        Args:
+            local_path: Path to the local file
+            remote_path: Path where to save the file on the remote server
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self._connected:
+            if not self.connect():
+                return False
+
+        start = time.perf_counter()
+        try:
+            size = os.path.getsize(local_path)
+            with profiler.span(f"upload {remote_path}", TRANSFER, bytes_out=size):
+                self._put(local_path, remote_path)
+            self._transfer_event("upload", local_path, remote_path, start, size=size)
+            return True
+        except Exception as e:
+            self._transfer_event("upload", local_path, remote_path, start, error=str(e))
+            return False
+
+    def download_file(self, remote_path: str, local_path: Union[str, Path]) -> bool:
+        """Download a file from the remote server.
+        
+        Args:
+            remote_path: Path to the file on the remote server
+            local_path: Path where to save the file locally
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        if not self._connected:
+            if not self.connect():
+                return False
+
+        start = time.perf_counter()
+        try:
+            with profiler.span(f"download {remote_path}", TRANSFER) as span:
+                self._get(remote_path, local_path)
+                span["bytes_in"] = os.path.getsize(local_path)
+            self._transfer_event("download", local_path, remote_path, start, size=span["bytes_in"])
+            return True
+        except Exception as e:
+            self._transfer_event("download", local_path, remote_path, start, error=str(e))
+            return False
+
+    def _transfer_event(
+        self,
+        direction: str,
+        local_path: Union[str, Path],
+        remote_path: str,
+        start: float,
+        size: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Emit a transfer event.
+        
+        Args:
+            direction: 'upload' or 'download'
+            local_path: Local side of the transfer
+            remote_path: Remote side of the transfer
+            start: perf_counter value when the transfer started
+            size: Bytes transferred, if it succeeded
+            error: Error message, if it failed
+        """
+        events.emit(
+            FILE_TRANSFER,
+            host=self.config.host,
+            direction=direction,
+            local_path=str(local_path),
+            remote_path=remote_path,
+            bytes=size,
+            duration_ms=self._elapsed_ms(start),
+            success=error is None,
+            error=error,
+        )
+
+    def file_exists(self, remote_path: str) -> bool:
+        """Check if a file exists on the remote server.
+        
+        Args:
+            remote_path: Path to the file on the remote server
+            
+        Returns:
+            True if the file exists, False otherwise
+        """
+        if not self._connected:
+            if not self.connect():
+                return False
+
+        try:
+            with profiler.span(f"stat {remote_path}", TRANSFER):
+                return self._stat(remote_path)
+        except Exception as e:
+            console.print(f"[bold red]Error checking if file exists: {str(e)}[/]")
+            return False
+
+    def file_hash(self, remote_path: str) -> Optional[str]:
+        """Get the SHA-256 of a file on the remote server.
+        
+        Args:
+            remote_path: Path to the file on the remote server
+            
+        Returns:
+            Hex digest, or None if the file does not exist or cannot be read
+        """
+        exit_code, stdout, stderr = self.execute(hash_command(remote_path), sudo=True)
+        fields = stdout.split()
+        return fields[0] if exit_code == 0 and fields else None
+
+    def package_versions(self, names: List[str]) -> Dict[str, Optional[str]]:
+        """Get the installed versions of Debian packages.
+        
+        Args:
+            names: Package names
+            
+        Returns:
+            Mapping of package name to installed version, None if not installed
+        """
+        exit_code, stdout, stderr = self.execute(package_query_command(names))
+        return parse_package_versions(names, stdout)
+
+    def service(self, action: str, *names: str) -> Tuple[int, str, str]:
+        """Run a systemctl action on services.
+        
+        Args:
+            action: systemctl action, e.g. 'restart' or 'is-active'
+            *names: Service names
+            
+        Returns:
+            Tuple of (exit_code, stdout, stderr)
+        """
+        return self.execute(f"systemctl {action} {' '.join(names)}", sudo=True)
+
+    def _exec(self, command: str, timeout: int) -> Tuple[int, str, str]:
+        """Run a command on the target host.
+        
+        Args:
+            command: Full command, including any sudo prefix
+            timeout: Timeout in seconds, where the transport supports one
+            
+        Returns:
+            Tuple of (exit_code, stdout, stderr)
+        """
+        raise NotImplementedError
+
+    def _put(self, local_path: Union[str, Path], remote_path: str) -> None:
+        """Copy a local file to the target host."""
+        raise NotImplementedError
+
+    def _get(self, remote_path: str, local_path: Union[str, Path]) -> None:
+        """Copy a file from the target host."""
+        raise NotImplementedError
+
+    def _stat(self, remote_path: str) -> bool:
+        """Check whether a path exists on the target host."""
+        raise NotImplementedError
+
+    def __enter__(self):
+        """Context manager entry."""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.disconnect() 
+
+
+def hash_command(remote_path: str) -> str:
+    """Shell command printing the SHA-256 of a file."""
+    return f"sha256sum {shlex.quote(remote_path)} 2>/dev/null"
+
+
+def package_query_command(names: List[str]) -> str:
+    """Shell command printing package states and versions in DPKG_FORMAT."""
+    return f"dpkg-query -W -f '{DPKG_FORMAT}' {' '.join(shlex.quote(name) for name in names)} 2>/dev/null"
+
+
+def parse_package_versions(names: List[str], output: str) -> Dict[str, Optional[str]]:
+    """Parse dpkg-query output written with DPKG_FORMAT.
+    
+    Args:
+        names: Package names that were queried
+        output: dpkg-query output
+        
+    Returns:
+        Mapping of package name to installed version, None if not installed
+    """
+    versions: Dict[str, Optional[str]] = {name: None for name in names}
+    for line in output.splitlines():
+        fields = line.strip().split("\t")
+        if len(fields) == 3 and fields[1] == "installed":
+            # Multi-arch packages are reported as name:arch
+            versions[fields[0].split(":")[0]] = fields[2]
+    return versions
@@ -0,0 +1,5 @@
+"""Code that is sent to and runs on the server being provisioned.
+
+Modules here use only the Python standard library available on a stock
+Ubuntu server. The CLI imports them only to share protocol code.
+"""
@@ -0,0 +1,194 @@
+"""Remote helper that serves provisioning operations over stdin/stdout.
+
+The CLI starts `python3 -c` over an SSH exec channel, sends this file on
+its stdin and keeps the channel open for the whole run. Each operation is
+one frame in each direction:
+
+    !II header-length data-length | JSON header | raw data
+
+The request header names the operation in 'op'; file contents travel as raw
+data rather than inside the JSON. Replies carry 'ok' and either the result
+fields or 'error' and 'type'.
+
+The helper runs as root. Commands that start with 'sudo ' run as root, with
+a plain prefix dropped so no sudo process is started. Other commands and
+file writes run as, or are owned by, the login user, so the result matches
+running them over their own channel.
+
+Only the standard library of Python 3.8 (Ubuntu 20.04) may be used here.
+"""
+
+import hashlib
+import json
+import os
+import pwd
+import struct
+import subprocess
+import sys
+
+PROTOCOL_VERSION = 1
+FRAME = struct.Struct("!II")
+
+# Login user the CLI connected as, set by 'hello'
+_login = None
+
+
+def read_frame(stream):
+    """Read one frame, returning (header, data) or None at end of input."""
+    prefix = stream.read(FRAME.size)
+    if len(prefix) < FRAME.size:
+        return None
+    header_length, data_length = FRAME.unpack(prefix)
+    header = json.loads(stream.read(header_length).decode("utf-8"))
+    return header, stream.read(data_length)
+
+
+def write_frame(stream, header, data=b""):
+    """Write one frame and flush it."""
+    encoded = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    stream.write(FRAME.pack(len(encoded), len(data)) + encoded + data)
+    stream.flush()
+
+
+def _as_login():
+    """Return a preexec_fn that drops to the login user, or None to stay root."""
+    if _login is None or os.geteuid() != 0 or _login.pw_uid == 0:
+        return None
+
+    def drop():
+        os.initgroups(_login.pw_name, _login.pw_gid)
+        os.setgid(_login.pw_gid)
+        os.setuid(_login.pw_uid)
+
+    return drop
+
+
+def _login_env():
+    """Environment for commands run as the login user."""
+    env = dict(os.environ)
+    if _login is not None:
+        env.update(HOME=_login.pw_dir, USER=_login.pw_name, LOGNAME=_login.pw_name)
+    return env
+
+
+def _run(argv, as_login=False):
+    """Run a program and return its result fields."""
+    result = subprocess.run(
+        argv,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        preexec_fn=_as_login() if as_login else None,
+        env=_login_env() if as_login else None,
+    )
+    return {
+        "rc": result.returncode,
+        "out": result.stdout.decode("utf-8", "replace"),
+        "err": result.stderr.decode("utf-8", "replace"),
+    }
+
+
+def op_hello(request, data):
+    """Record the login user and describe the helper."""
+    global _login
+    _login = pwd.getpwnam(request["user"])
+    return {"version": PROTOCOL_VERSION, "uid": os.geteuid(), "python": sys.version.split()[0]}, b""
+
+
+def op_exec(request, data):
+    """Run a shell command, as root if it starts with sudo."""
+    command = request["cmd"]
+    if not command.startswith("sudo "):
+        return _run(["/bin/bash", "-c", command], as_login=True), b""
+    # A plain sudo prefix is dropped; sudo with options (-u postgres) still runs
+    if not command[len("sudo "):].startswith("-"):
+        command = command[len("sudo "):]
+    return _run(["/bin/bash", "-c", command]), b""
+
+
+def op_write(request, data):
+    """Write a file, owned by the login user if it is new."""
+    path = request["path"]
+    created = not os.path.exists(path)
+    with open(path, "wb") as target:
+        target.write(data)
+    if created and _login is not None and os.geteuid() == 0:
+        os.chown(path, _login.pw_uid, _login.pw_gid)
+    return {"bytes": len(data)}, b""
+
+
+def op_read(request, data):
+    """Read a file."""
+    with open(request["path"], "rb") as source:
+        return {}, source.read()
+
+
+def op_stat(request, data):
+    """Check whether a path exists."""
+    return {"exists": os.path.exists(request["path"])}, b""
+
+
+def op_hash(request, data):
+    """SHA-256 of a file, or null if it does not exist."""
+    digest = hashlib.sha256()
+    try:
+        with open(request["path"], "rb") as source:
+            for block in iter(lambda: source.read(1 << 16), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return {"sha256": None}, b""
+    return {"sha256": digest.hexdigest()}, b""
+
+
+def op_packages(request, data):
+    """Installed versions of Debian packages, null for those not installed."""
+    versions = {name: None for name in request["names"]}
+    result = _run(["dpkg-query", "-W", "-f", "${Package}\t${db:Status-Status}\t${Version}\n"] + request["names"])
+    for line in result["out"].splitlines():
+        fields = line.split("\t")
+        if len(fields) == 3 and fields[1] == "installed":
+            versions[fields[0].split(":")[0]] = fields[2]
+    return {"versions": versions}, b""
+
+
+def op_service(request, data):
+    """Run a systemctl action on services."""
+    return _run(["systemctl", request["action"]] + request["names"]), b""
+
+
+OPERATIONS = {
+    "hello": op_hello,
+    "exec": op_exec,
+    "write": op_write,
+    "read": op_read,
+    "stat": op_stat,
+    "hash": op_hash,
+    "packages": op_packages,
+    "service": op_service,
+}
+
+
+def serve(reader, writer):
+    """Answer requests until the client sends 'exit' or closes the channel."""
+    while True:
+        frame = read_frame(reader)
+        if frame is None:
+            return
+        request, data = frame
+        if request["op"] == "exit":
+            write_frame(writer, {"ok": True})
+            return
+        operation = OPERATIONS.get(request["op"])
+        if operation is None:
+            write_frame(writer, {"ok": False, "error": "Unknown operation " + repr(request["op"]), "type": "ValueError"})
+            continue
+        try:
+            reply, payload = operation(request, data)
+            reply["ok"] = True
+        except Exception as e:
+            reply, payload = {"ok": False, "error": str(e), "type": type(e).__name__}, b""
+        write_frame(writer, reply, payload)
+
+
+if __name__ == "__main__":
+    serve(sys.stdin.buffer, sys.stdout.buffer)
@@ -3,5 +3,23 @@
 This package contains tasks for setting up an Ubuntu server with the Enferno framework.
 """
 
-# This file is intentionally left empty to make the directory a Python package.
-# Tasks are discovered dynamically by the TaskManager. 
\ No newline at end of file
+# Task name to "module:class", so the registry can import a task's module only
+# when that task runs. Keep in sync when adding a task; third-party packages
+# register theirs under the "enferno_cli.tasks" entry point group instead.
+TASKS = {
+    "database": "enferno_cli.tasks.database:DatabaseTask",
+    "postgres_tune": "enferno_cli.tasks.database:PostgresTuneTask",
+    "enferno": "enferno_cli.tasks.enferno:EnfernoTask",
+    "firewall": "enferno_cli.tasks.firewall:FirewallTask",
+    "nginx_basic": "enferno_cli.tasks.nginx:NginxBasicTask",
+    "nginx_ssl": "enferno_cli.tasks.nginx:NginxSSLTask",
+    "nginx": "enferno_cli.tasks.nginx:NginxTask",
+    "nginx_www": "enferno_cli.tasks.nginx:NginxWWWTask",
+    "packages": "enferno_cli.tasks.packages:PackagesTask",
+    "pgbouncer": "enferno_cli.tasks.pgbouncer:PgBouncerTask",
+    "python": "enferno_cli.tasks.python:PythonTask",
+    "service": "enferno_cli.tasks.service:ServiceTask",
+    "sqlite": "enferno_cli.tasks.sqlite:SQLiteTask",
+    "static": "enferno_cli.tasks.static:StaticTask",
+    "user": "enferno_cli.tasks.user:UserTask",
+}
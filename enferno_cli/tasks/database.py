@@ -1,13 +1,89 @@
 """Task for setting up PostgreSQL database."""
 
+import hashlib
 import time
-from typing import Optional
-
-from rich.console import Console
+from pathlib import Path
+from typing import Dict, Optional
 
+from enferno_cli.core.events import console
+from enferno_cli.core.facts import HostFacts
 from enferno_cli.core.task import Task
 
-console = Console()
+# Workload profiles for PostgreSQL tuning (modelled on pgtune)
+POSTGRES_PROFILES = {
+    "web": {"max_connections": 200, "work_mem_divisor": 1, "min_wal_size": "1GB", "max_wal_size": "4GB"},
+    "oltp": {"max_connections": 300, "work_mem_divisor": 1, "min_wal_size": "2GB", "max_wal_size": "8GB"},
+    "mixed": {"max_connections": 100, "work_mem_divisor": 2, "min_wal_size": "1GB", "max_wal_size": "4GB"},
+}
+
+POSTGRES_TUNE_FILE = "enferno-tune.conf"
+
+
+def _format_kb(value_kb: int) -> str:
+    """Format a size in kilobytes using PostgreSQL memory units."""
+    if value_kb >= 1024 * 1024 and value_kb % (1024 * 1024) == 0:
+        return f"{value_kb // (1024 * 1024)}GB"
+    if value_kb >= 1024:
+        return f"{value_kb // 1024}MB"
+    return f"{value_kb}kB"
+
+
+def compute_postgres_settings(
+    facts: HostFacts,
+    profile: str,
+    max_connections: Optional[int] = None,
+    disk_type: Optional[str] = None,
+) -> Dict[str, str]:
+    """Compute PostgreSQL settings for the host hardware and workload profile.
+    
+    Args:
+        facts: Hardware facts for the database host
+        profile: Workload profile name (web, oltp or mixed)
+        max_connections: Override for the profile's connection limit
+        disk_type: Override for the detected disk type (ssd or hdd)
+        
+    Returns:
+        Mapping of setting name to postgresql.conf value
+    """
+    params = POSTGRES_PROFILES[profile]
+    memory_kb = facts.memory_kb
+    cpus = facts.cpu_count
+    connections = max_connections or params["max_connections"]
+    ssd = (disk_type or facts.disk_type) != "hdd"
+
+    shared_buffers = memory_kb // 4
+    effective_cache_size = memory_kb * 3 // 4
+    maintenance_work_mem = min(memory_kb // 16, 2 * 1024 * 1024)
+    wal_buffers = min(max(shared_buffers * 3 // 100, 64), 16 * 1024)
+    parallel_per_gather = max(1, min(4, cpus // 2))
+    work_mem = (memory_kb - shared_buffers) // (connections * 3) // parallel_per_gather
+    work_mem = max(64, work_mem // params["work_mem_divisor"])
+
+    settings = {
+        "max_connections": str(connections),
+        "shared_buffers": _format_kb(shared_buffers),
+        "effective_cache_size": _format_kb(effective_cache_size),
+        "maintenance_work_mem": _format_kb(maintenance_work_mem),
+        "work_mem": _format_kb(work_mem),
+        "wal_buffers": _format_kb(wal_buffers),
+        "min_wal_size": params["min_wal_size"],
+        "max_wal_size": params["max_wal_size"],
+        "checkpoint_completion_target": "0.9",
+        "default_statistics_target": "100",
+        "random_page_cost": "1.1" if ssd else "4",
+        "effective_io_concurrency": "200" if ssd else "2",
+    }
+
+    # Parallel query settings only pay off with enough cores
+    if cpus >= 4:
+        settings.update({
+            "max_worker_processes": str(cpus),
+            "max_parallel_workers_per_gather": str(parallel_per_gather),
+            "max_parallel_workers": str(cpus),
+            "max_parallel_maintenance_workers": str(parallel_per_gather),
+        })
+
+    return settings
 
 
 class DatabaseTask(Task):
@@ -46,14 +122,14 @@ class DatabaseTask(Task):
             
         # Check PostgreSQL service status without using status (which uses a pager)
         console.print("[cyan]Checking PostgreSQL service status...[/]")
-        exit_code, stdout, stderr = self.ssh.execute("systemctl is-active postgresql", sudo=True)
+        exit_code, stdout, stderr = self.ssh.service("is-active", "postgresql")
         console.print(f"[cyan]PostgreSQL status: {stdout.strip()}[/]")
         
         if exit_code != 0 or stdout.strip() != "active":
             console.print("[bold red]PostgreSQL service is not running. Attempting to start it...[/]")
             
             # Try to start PostgreSQL service
-            start_exit_code, start_stdout, start_stderr = self.ssh.execute("systemctl start postgresql", sudo=True)
+            start_exit_code, start_stdout, start_stderr = self.ssh.service("start", "postgresql")
             if start_exit_code != 0:
                 console.print(f"[bold red]Failed to start PostgreSQL service. Error: {start_stderr}[/]")
                 console.print("[yellow]You may need to fix PostgreSQL manually:[/]")
@@ -61,7 +137,7 @@ class DatabaseTask(Task):
                 return False
             
             # Check again if it's running
-            check_exit_code, check_stdout, check_stderr = self.ssh.execute("systemctl is-active postgresql", sudo=True)
+            check_exit_code, check_stdout, check_stderr = self.ssh.service("is-active", "postgresql")
             if check_exit_code != 0 or check_stdout.strip() != "active":
                 console.print("[bold red]PostgreSQL service failed to start properly.[/]")
                 return False
@@ -153,4 +229,99 @@ class DatabaseTask(Task):
             console.print(f"[yellow]Failed to update authentication method, but continuing... Error: {stderr}[/]")
         
         console.print(f"[green]Successfully set up PostgreSQL database for {self.config.user_name} with superuser privileges[/]")
-        return True 
\ No newline at end of file
+        return True 
+
+
+class PostgresTuneTask(Task):
+    """Task for tuning PostgreSQL settings to the host hardware."""
+
+    name = "postgres_tune"
+    description = "Tune PostgreSQL settings for the host hardware"
+    depends_on = ["database"]
+
+    @property
+    def compilable(self) -> bool:
+        """The conf.d path depends on the installed PostgreSQL version, so only the skipped task compiles."""
+        return not self.config.postgres_enabled
+
+    def run(self) -> bool:
+        """Run the task."""
+        # Check if PostgreSQL is enabled in the config
+        if not self.config.postgres_enabled:
+            console.print("[yellow]PostgreSQL setup is disabled in configuration. Skipping tuning...[/]")
+            return True
+        
+        profile = self.config.postgres_profile.lower()
+        if profile not in POSTGRES_PROFILES:
+            console.print(
+                f"[bold red]Unknown PostgreSQL profile '{profile}'. "
+                f"Choose one of: {', '.join(POSTGRES_PROFILES)}[/]"
+            )
+            return False
+        
+        console.print(f"[cyan]Tuning PostgreSQL for the {profile} workload profile...[/]")
+        
+        # Compute settings from host hardware
+        facts = self.get_host_facts()
+        disk_type = self.config.postgres_disk_type or facts.disk_type
+        settings = compute_postgres_settings(
+            facts, profile, self.config.postgres_max_connections, disk_type
+        )
+        for key, value in settings.items():
+            console.print(f"[dim]  {key} = {value}[/]")
+        
+        tune_conf = self.renderer.render_to_file(
+            "postgres-tune.conf",
+            extra_vars={
+                "settings": settings,
+                "postgres_profile": profile,
+                "cpu_count": facts.cpu_count,
+                "memory_mb": facts.memory_mb,
+                "disk_type": disk_type,
+            },
+        )
+        local_hash = hashlib.sha256(Path(tune_conf).read_bytes()).hexdigest()
+        
+        # Locate the conf.d include directory of the installed cluster
+        exit_code, stdout, stderr = self.ssh.execute(
+            "ls -d /etc/postgresql/*/main/conf.d 2>/dev/null | sort -V | tail -n1"
+        )
+        conf_dir = stdout.strip()
+        if exit_code != 0 or not conf_dir:
+            console.print("[bold red]Could not find the PostgreSQL conf.d directory[/]")
+            return False
+        conf_path = f"{conf_dir}/{POSTGRES_TUNE_FILE}"
+        
+        # Skip the reload if the settings are already in place
+        if self.ssh.file_hash(conf_path) == local_hash:
+            console.print("[green]PostgreSQL settings are already up to date[/]")
+            return True
+        
+        if not self.ssh.upload_file(tune_conf, f"/tmp/{POSTGRES_TUNE_FILE}"):
+            console.print("[bold red]Failed to upload PostgreSQL tuning configuration[/]")
+            return False
+        
+        if not self.sudo_execute(f"mv /tmp/{POSTGRES_TUNE_FILE} {conf_path}"):
+            console.print("[bold red]Failed to move PostgreSQL tuning configuration[/]")
+            return False
+        
+        if not self.sudo_execute(f"chown postgres:postgres {conf_path} && chmod 644 {conf_path}"):
+            console.print(f"[bold red]Failed to set permissions on {conf_path}[/]")
+            return False
+        
+        # Reload PostgreSQL
+        if not self.sudo_execute("systemctl reload postgresql"):
+            console.print("[bold red]Failed to reload PostgreSQL[/]")
+            return False
+        
+        # Settings such as shared_buffers and max_connections only apply after a restart
+        pending_cmd = "sudo -u postgres psql -tAc \"SELECT count(*) FROM pg_settings WHERE pending_restart;\""
+        exit_code, stdout, stderr = self.ssh.execute(pending_cmd, sudo=True)
+        if exit_code == 0 and stdout.strip() not in ("", "0"):
+            console.print("[cyan]Some settings require a restart. Restarting PostgreSQL...[/]")
+            if not self.sudo_execute("systemctl restart postgresql"):
+                console.print("[bold red]Failed to restart PostgreSQL[/]")
+                return False
+        
+        console.print("[green]Successfully tuned PostgreSQL[/]")
+        return True
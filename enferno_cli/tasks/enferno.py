@@ -3,12 +3,9 @@
 import os
 from pathlib import Path
 
-from rich.console import Console
-
+from enferno_cli.core.events import console
 from enferno_cli.core.task import Task
 
-console = Console()
-
 
 class EnfernoTask(Task):
     """Task for setting up Enferno application."""
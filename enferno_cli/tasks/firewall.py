@@ -1,10 +1,107 @@
 """Task for configuring UFW firewall."""
 
-from rich.console import Console
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
 
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import console
 from enferno_cli.core.task import Task
 
-console = Console()
+DEFAULT_POLICIES = {"incoming": "deny", "outgoing": "allow"}
+
+# Port or port range with an optional protocol, e.g. 8080, 51820/udp, 6000:6007/tcp
+PORT_RULE = re.compile(r"^\d+(:\d+)?(/(tcp|udp))?$")
+
+# Everything the task needs to know about UFW, in one round trip
+UFW_PROBE = "sh -c \"ufw status verbose; echo ---; ufw show added\""
+
+
+@dataclass
+class FirewallState:
+    """Current UFW state as reported by the server."""
+
+    active: bool = False
+    policies: Dict[str, str] = field(default_factory=dict)
+    rules: Set[str] = field(default_factory=set)
+    other_rules: List[str] = field(default_factory=list)
+
+
+def desired_rules(config: ServerConfig) -> List[str]:
+    """Build the allow rules the server should have.
+
+    Args:
+        config: Server configuration
+
+    Returns:
+        Rules in UFW 'port/proto' form, SSH first
+
+    Raises:
+        ValueError: If an extra port is not a valid UFW port rule
+    """
+    rules = [f"{config.ssh_port}/tcp", "80/tcp", "443/tcp"]
+    for port in config.firewall_extra_ports:
+        if not PORT_RULE.match(port):
+            raise ValueError(f"Invalid firewall port '{port}'. Use PORT, PORT/PROTO or START:END/PROTO")
+        rule = port if "/" in port else f"{port}/tcp"
+        if rule not in rules:
+            rules.append(rule)
+    return rules
+
+
+def parse_ufw_state(output: str) -> FirewallState:
+    """Parse the output of UFW_PROBE.
+
+    Args:
+        output: Output of `ufw status verbose` and `ufw show added`, separated by '---'
+
+    Returns:
+        FirewallState for the server
+    """
+    status_output, _, added_output = output.partition("---")
+    state = FirewallState(active="Status: active" in status_output)
+
+    # e.g. "Default: deny (incoming), allow (outgoing), disabled (routed)"
+    for policy, direction in re.findall(r"(\w+) \((incoming|outgoing)\)", status_output):
+        state.policies[direction] = policy
+
+    for line in added_output.splitlines():
+        line = line.strip()
+        if not line.startswith("ufw "):
+            continue
+        match = re.match(r"^ufw allow (\S+)$", line)
+        if match and PORT_RULE.match(match.group(1)):
+            state.rules.add(match.group(1))
+        else:
+            state.other_rules.append(line)
+    return state
+
+
+def plan_firewall(state: FirewallState, rules: List[str]) -> List[str]:
+    """Compute the UFW commands that converge the current state to the desired one.
+
+    Rules are added before stale ones are deleted and before UFW is enabled, so
+    SSH stays reachable throughout. Rules that are not plain port allows (source
+    restrictions, limits) are left alone.
+
+    Args:
+        state: Current UFW state
+        rules: Desired allow rules
+
+    Returns:
+        Commands to run, empty if the firewall has converged
+    """
+    commands = []
+    for direction, policy in DEFAULT_POLICIES.items():
+        if not state.active or state.policies.get(direction) != policy:
+            commands.append(f"ufw default {policy} {direction}")
+
+    commands.extend(f"ufw allow {rule}" for rule in rules if rule not in state.rules)
+    commands.extend(f"ufw delete allow {rule}" for rule in sorted(state.rules - set(rules)))
+
+    if not state.active:
+        commands.append("ufw --force enable")
+    return commands
 
 
 class FirewallTask(Task):
@@ -17,47 +114,34 @@ class FirewallTask(Task):
     def run(self) -> bool:
         """Run the task."""
         console.print("[cyan]Configuring UFW firewall...[/]")
-        
-        # Reset UFW
-        if not self.sudo_execute("ufw --force reset"):
-            console.print("[bold red]Failed to reset UFW[/]")
-            return False
-        
-        # Set default policies
-        if not self.sudo_execute("ufw default deny incoming"):
-            console.print("[bold red]Failed to set default incoming policy[/]")
-            return False
-        
-        if not self.sudo_execute("ufw default allow outgoing"):
-            console.print("[bold red]Failed to set default outgoing policy[/]")
-            return False
-        
-        # Allow SSH
-        ssh_port = self.config.ssh_port
-        if not self.sudo_execute(f"ufw allow {ssh_port}/tcp"):
-            console.print(f"[bold red]Failed to allow SSH on port {ssh_port}[/]")
-            return False
-        
-        # Allow HTTP and HTTPS
-        if not self.sudo_execute("ufw allow 80/tcp"):
-            console.print("[bold red]Failed to allow HTTP[/]")
-            return False
-        
-        if not self.sudo_execute("ufw allow 443/tcp"):
-            console.print("[bold red]Failed to allow HTTPS[/]")
-            return False
-        
-        # Enable UFW
-        if not self.sudo_execute("echo 'y' | ufw enable"):
-            console.print("[bold red]Failed to enable UFW[/]")
+
+        try:
+            rules = desired_rules(self.config)
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
             return False
-        
-        # Check UFW status
-        exit_code, stdout, stderr = self.ssh.execute("sudo ufw status", sudo=True)
+
+        # Read the current state
+        exit_code, stdout, stderr = self.ssh.execute(UFW_PROBE, sudo=True)
         if exit_code != 0:
-            console.print("[bold red]Failed to get UFW status[/]")
+            console.print("[bold red]Failed to read UFW status[/]")
             return False
-        
-        console.print(f"[dim]{stdout}[/]")
-        console.print("[green]Successfully configured UFW firewall[/]")
-        return True 
\ No newline at end of file
+        state = parse_ufw_state(stdout)
+
+        for rule in state.other_rules:
+            console.print(f"[yellow]Leaving unmanaged rule in place: {rule}[/]")
+
+        commands = plan_firewall(state, rules)
+        if not commands:
+            console.print(f"[green]UFW firewall already allows exactly {', '.join(rules)}[/]")
+            return True
+
+        # Apply the difference in a single batch
+        for command in commands:
+            console.print(f"[cyan]  {command}[/]")
+        if not self.sudo_execute(f"sh -c \"{' && '.join(commands)}\""):
+            console.print("[bold red]Failed to apply UFW changes[/]")
+            return False
+
+        console.print(f"[green]Successfully configured UFW firewall ({len(commands)} changes)[/]")
+        return True
@@ -1,13 +1,74 @@
 """Task for configuring Nginx web server."""
 
 import os
+import re
 from pathlib import Path
+from typing import List
 
-from rich.console import Console
-
+from enferno_cli.core.acme import (
+    LETSENCRYPT_DIRECTORY,
+    REUSE_MIN_VALIDITY,
+    IssuanceLedger,
+    certificate_matches,
+)
+from enferno_cli.core.events import console
+from enferno_cli.core.sizing import size_nginx
 from enferno_cli.core.task import Task
 
-console = Console()
+SSL_KEY_TYPES = ("ecdsa", "rsa")
+TICKET_KEY_ROTATE_SCRIPT = "/usr/local/sbin/enferno-rotate-ticket-keys"
+CERTBOT_DEPLOY_HOOK = "/etc/letsencrypt/renewal-hooks/deploy/enferno-reload-nginx"
+
+
+def reload_nginx(task: Task) -> bool:
+    """Validate the nginx configuration and reload nginx.
+    
+    Args:
+        task: Task whose SSH connection is used
+        
+    Returns:
+        True if the configuration is valid and nginx was reloaded, False otherwise
+    """
+    exit_code, stdout, stderr = task.ssh.execute("nginx -t", sudo=True)
+    if exit_code != 0:
+        console.print("[bold red]nginx configuration test failed, not reloading[/]")
+        console.print(f"[red]{stderr or stdout}[/]")
+        return False
+    
+    if not task.sudo_execute("systemctl reload nginx"):
+        console.print("[bold red]Failed to reload nginx[/]")
+        return False
+    
+    return True
+
+
+def install_template(task: Task, template_name: str, remote_path: str, mode: str = "644") -> bool:
+    """Render a template and install it on the server as root.
+    
+    Args:
+        task: Task whose renderer and SSH connection are used
+        template_name: Name of the template to render
+        remote_path: Destination path on the server
+        mode: File mode to set on the installed file
+        
+    Returns:
+        True if the file was installed, False otherwise
+    """
+    rendered = task.renderer.render_to_file(template_name)
+    tmp_path = f"/tmp/{os.path.basename(remote_path)}"
+    if not task.ssh.upload_file(rendered, tmp_path):
+        console.print(f"[bold red]Failed to upload {template_name}[/]")
+        return False
+    
+    install_cmd = (
+        f"mkdir -p {os.path.dirname(remote_path)} && mv {tmp_path} {remote_path} && "
+        f"chown root:root {remote_path} && chmod {mode} {remote_path}"
+    )
+    if not task.sudo_execute(install_cmd):
+        console.print(f"[bold red]Failed to install {remote_path}[/]")
+        return False
+    
+    return True
 
 
 class NginxBasicTask(Task):
@@ -26,12 +87,61 @@ class NginxBasicTask(Task):
             console.print("[bold red]Failed to remove default nginx configuration[/]")
             return False
         
-        # Create nginx.conf
-        nginx_conf = self.renderer.render_to_file("nginx.conf.j2")
+        # Size worker connections and descriptor limits from host facts
+        try:
+            sizing = size_nginx(self.get_host_facts(), self.config)
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
+            return False
+        console.print(
+            f"[cyan]nginx sizing: worker_connections={sizing.worker_connections} "
+            f"worker_rlimit_nofile={sizing.worker_rlimit_nofile}[/]"
+        )
+        
+        # Raise the systemd descriptor limit to match worker_rlimit_nofile
+        limits_conf = self.renderer.render_to_file("nginx-limits.conf", extra_vars=sizing.to_vars())
+        if not self.ssh.upload_file(limits_conf, "/tmp/nginx-limits.conf"):
+            console.print("[bold red]Failed to upload nginx systemd limits[/]")
+            return False
+        
+        if not self.sudo_execute(
+            "sh -c \"mkdir -p /etc/systemd/system/nginx.service.d && "
+            "mv /tmp/nginx-limits.conf /etc/systemd/system/nginx.service.d/limits.conf && "
+            "systemctl daemon-reload\""
+        ):
+            console.print("[bold red]Failed to install nginx systemd limits[/]")
+            return False
+        
+        # brotli_static needs the dynamic module; the static task writes the .br files
+        if self.config.static_brotli:
+            if not self.sudo_execute("apt install -y libnginx-mod-http-brotli-static"):
+                console.print("[bold red]Failed to install the nginx brotli module[/]")
+                return False
+        
+        # Create the microcache directory for the nginx worker user
+        if self.config.microcache_enabled:
+            cache_dir = "/var/cache/nginx/enferno"
+            if not self.sudo_execute(
+                f"mkdir -p {cache_dir} && chown {self.config.user_name}:{self.config.user_name} {cache_dir}"
+            ):
+                console.print(f"[bold red]Failed to create {cache_dir}[/]")
+                return False
+        
+        # Create nginx.conf, keeping a backup in case the new one fails validation
+        nginx_conf = self.renderer.render_to_file("nginx.conf.j2", extra_vars=sizing.to_vars())
         if not self.ssh.upload_file(nginx_conf, "/tmp/nginx.conf"):
             console.print("[bold red]Failed to upload nginx.conf[/]")
             return False
         
+        site_conf = f"/etc/nginx/conf.d/{self.config.server_hostname}.conf"
+        # One sh -c so every part of the chain runs as root
+        if not self.sudo_execute(
+            "sh -c \"cp /etc/nginx/nginx.conf /etc/nginx/nginx.conf.bak && "
+            f"if [ -e {site_conf} ]; then cp {site_conf} {site_conf}.bak; else rm -f {site_conf}.bak; fi\""
+        ):
+            console.print("[bold red]Failed to back up the nginx configuration[/]")
+            return False
+        
         if not self.sudo_execute("mv /tmp/nginx.conf /etc/nginx/nginx.conf"):
             console.print("[bold red]Failed to move nginx.conf[/]")
             return False
@@ -42,18 +152,40 @@ class NginxBasicTask(Task):
             console.print("[bold red]Failed to upload basic configuration[/]")
             return False
         
-        if not self.sudo_execute(f"mv /tmp/{self.config.server_hostname}.conf /etc/nginx/conf.d/{self.config.server_hostname}.conf"):
+        if not self.sudo_execute(f"mv /tmp/{self.config.server_hostname}.conf {site_conf}"):
             console.print("[bold red]Failed to move basic configuration[/]")
+            self.restore_previous_config(site_conf)
             return False
         
-        # Reload nginx
-        if not self.sudo_execute("systemctl reload nginx"):
-            console.print("[bold red]Failed to reload nginx[/]")
+        # Validate and reload nginx, restoring the previous configuration if it fails
+        if not reload_nginx(self):
+            self.restore_previous_config(site_conf)
             return False
         
         console.print("[green]Successfully configured Nginx without SSL[/]")
         return True
 
+    def restore_previous_config(self, site_conf: str) -> None:
+        """Put back nginx.conf and the site configuration saved before they were replaced.
+        
+        A site configuration that did not exist before is removed, and the
+        restored configuration is validated again so a broken one is reported
+        before the next reload, certificate renewal or reboot picks it up.
+        
+        Args:
+            site_conf: Path of the site configuration on the server
+        """
+        restored = self.sudo_execute(
+            "sh -c \"mv /etc/nginx/nginx.conf.bak /etc/nginx/nginx.conf && "
+            f"if [ -e {site_conf}.bak ]; then mv {site_conf}.bak {site_conf}; else rm -f {site_conf}; fi\""
+        )
+        exit_code, stdout, stderr = self.ssh.execute("nginx -t", sudo=True)
+        if restored and exit_code == 0:
+            console.print("[yellow]Restored the previous nginx configuration[/]")
+        else:
+            console.print("[bold red]The nginx configuration on the server is still invalid after restoring it; fix it before nginx reloads[/]")
+            console.print(f"[red]{stderr or stdout}[/]")
+
 
 class NginxSSLTask(Task):
     """Task for setting up Nginx with SSL."""
@@ -61,6 +193,13 @@ class NginxSSLTask(Task):
     name = "nginx_ssl"
     description = "Configure Nginx with SSL"
     depends_on = ["nginx_basic"]
+    # Certificates are checked on the server and issued through the local ledger
+    compilable = False
+    final_template = "default.conf"
+
+    def certificate_domains(self) -> List[str]:
+        """Domains to include in the certificate."""
+        return [self.config.server_hostname]
 
     def run(self) -> bool:
         """Run the task."""
@@ -73,8 +212,15 @@ class NginxSSLTask(Task):
         if not self.config.ssl_email:
             console.print("[bold red]SSL email is required for Let's Encrypt. Please provide an email address.[/]")
             return False
+        
+        if self.config.ssl_key_type not in SSL_KEY_TYPES:
+            console.print(
+                f"[bold red]Unknown SSL key type '{self.config.ssl_key_type}'. "
+                f"Choose one of: {', '.join(SSL_KEY_TYPES)}[/]"
+            )
+            return False
             
-        console.print("[cyan]Configuring Nginx with SSL...[/]")
+        console.print(f"[cyan]{self.description}...[/]")
         
         # Create initial SSL configuration
         initial_ssl_conf = self.renderer.render_to_file("initial-ssl.conf")
@@ -86,16 +232,15 @@ class NginxSSLTask(Task):
             console.print("[bold red]Failed to move initial SSL configuration[/]")
             return False
         
-        # Reload nginx
-        if not self.sudo_execute("systemctl reload nginx"):
-            console.print("[bold red]Failed to reload nginx[/]")
+        # Validate and reload nginx
+        if not reload_nginx(self):
             return False
         
         # Install certbot and obtain SSL certificate
         if not self._setup_ssl():
             return False
         
-        console.print("[green]Successfully configured Nginx with SSL[/]")
+        console.print(f"[green]Successfully completed: {self.description}[/]")
         return True
 
     def _setup_ssl(self) -> bool:
@@ -113,25 +258,28 @@ class NginxSSLTask(Task):
             return False
         
         # Obtain SSL certificate
-        certbot_cmd = (
-            f"certbot certonly --webroot -w /var/www/html -d {self.config.server_hostname} "
-            f"--non-interactive --agree-tos --email {self.config.ssl_email}"
-        )
-        if not self.sudo_execute(certbot_cmd):
+        if not self._obtain_certificate():
             console.print("[bold red]Failed to obtain SSL certificate[/]")
             return False
         
         # Setup auto-renewal
-        cron_cmd = (
-            "crontab -l | grep -q 'certbot renew' || "
-            "(crontab -l 2>/dev/null; echo '0 0 * * * certbot renew --quiet --no-self-upgrade && systemctl reload nginx') | crontab -"
-        )
-        if not self.sudo_execute(cron_cmd):
-            console.print("[bold red]Failed to setup certbot auto-renewal[/]")
+        if not self._setup_renewal():
+            return False
+        
+        # Session ticket keys must exist before nginx loads the final configuration
+        if self.config.ssl_session_tickets and not self._setup_session_tickets():
+            return False
+        
+        # Size the session cache like the rest of nginx
+        try:
+            sizing = size_nginx(self.get_host_facts(), self.config)
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
             return False
+        extra_vars = dict(sizing.to_vars(), ssl_ocsp_stapling=self._certificate_has_ocsp())
         
         # Create final nginx configuration
-        final_conf = self.renderer.render_to_file("default.conf")
+        final_conf = self.renderer.render_to_file(self.final_template, extra_vars=extra_vars)
         if not self.ssh.upload_file(final_conf, f"/tmp/{self.config.server_hostname}.conf"):
             console.print("[bold red]Failed to upload final nginx configuration[/]")
             return False
@@ -140,109 +288,136 @@ class NginxSSLTask(Task):
             console.print("[bold red]Failed to move final nginx configuration[/]")
             return False
         
-        # Reload nginx
-        if not self.sudo_execute("systemctl reload nginx"):
-            console.print("[bold red]Failed to reload nginx[/]")
+        # Validate and reload nginx
+        if not reload_nginx(self):
             return False
         
-        console.print("[green]Successfully set up SSL with Certbot[/]")
+        console.print(f"[green]Successfully set up SSL with Certbot for {', '.join(self.certificate_domains())}[/]")
         return True
 
-
-class NginxWWWTask(Task):
-    """Task for setting up Nginx with SSL and www redirection."""
-
-    name = "nginx_www"
-    description = "Configure Nginx with SSL and www redirection"
-    depends_on = ["nginx_basic"]
-
-    def run(self) -> bool:
-        """Run the task."""
-        # Check if SSL is enabled in the config
-        if not self.config.ssl_enabled:
-            console.print("[yellow]SSL setup is disabled in configuration. Skipping...[/]")
-            return True
-            
-        # Check if SSL email is provided
-        if not self.config.ssl_email:
-            console.print("[bold red]SSL email is required for Let's Encrypt. Please provide an email address.[/]")
-            return False
-            
-        console.print("[cyan]Configuring Nginx with SSL and www redirection...[/]")
-        
-        # Create initial SSL configuration
-        initial_ssl_conf = self.renderer.render_to_file("initial-ssl.conf")
-        if not self.ssh.upload_file(initial_ssl_conf, f"/tmp/{self.config.server_hostname}.conf"):
-            console.print("[bold red]Failed to upload initial SSL configuration[/]")
-            return False
+    def _obtain_certificate(self) -> bool:
+        """Reuse a valid certificate or request one through the issuance ledger."""
+        domains = self.certificate_domains()
+        server = self.config.acme_server or LETSENCRYPT_DIRECTORY
         
-        if not self.sudo_execute(f"mv /tmp/{self.config.server_hostname}.conf /etc/nginx/conf.d/{self.config.server_hostname}.conf"):
-            console.print("[bold red]Failed to move initial SSL configuration[/]")
-            return False
+        if self._has_reusable_certificate(domains, server):
+            console.print(f"[green]Reusing the existing certificate for {', '.join(domains)}[/]")
+            return True
         
-        # Reload nginx
-        if not self.sudo_execute("systemctl reload nginx"):
-            console.print("[bold red]Failed to reload nginx[/]")
-            return False
+        # --cert-name keeps one lineage when the key type changes
+        domain_args = " ".join(f"-d {domain}" for domain in domains)
+        certbot_cmd = (
+            f"certbot certonly --webroot -w /var/www/html {domain_args} "
+            f"--cert-name {self.config.server_hostname} --key-type {self.config.ssl_key_type} "
+            f"--non-interactive --agree-tos --email {self.config.ssl_email}"
+        )
+        if self.config.acme_server:
+            certbot_cmd += f" --server {self.config.acme_server}"
+        if self.config.acme_ca_bundle:
+            certbot_cmd = f"env REQUESTS_CA_BUNDLE={self.config.acme_ca_bundle} {certbot_cmd}"
         
-        # Install certbot and obtain SSL certificate for both www and non-www
-        if not self._setup_ssl():
+        # Issuances from parallel runs are serialized and counted against the CA's limits
+        return IssuanceLedger().issue(domains, server, lambda: self.sudo_execute(certbot_cmd))
+
+    def _has_reusable_certificate(self, domains: List[str], server: str) -> bool:
+        """Check whether the installed certificate covers the request and is far from expiry."""
+        name = self.config.server_hostname
+        cert_path = f"/etc/letsencrypt/live/{name}/cert.pem"
+        probe_cmd = (
+            f"sh -c \"openssl x509 -in {cert_path} -noout -checkend {REUSE_MIN_VALIDITY} >/dev/null && "
+            f"openssl x509 -in {cert_path} -noout -text && "
+            f"{{ grep -h '^server' /etc/letsencrypt/renewal/{name}.conf || true; }}\""
+        )
+        exit_code, stdout, stderr = self.ssh.execute(probe_cmd, sudo=True)
+        if exit_code != 0:
             return False
         
-        console.print("[green]Successfully configured Nginx with SSL and www redirection[/]")
-        return True
+        match = re.search(r"^server\s*=\s*(\S+)", stdout, re.MULTILINE)
+        renewal_server = match.group(1) if match else None
+        return certificate_matches(stdout, domains, self.config.ssl_key_type, server, renewal_server)
 
-    def _setup_ssl(self) -> bool:
-        """Setup SSL with Certbot for both www and non-www domains."""
-        console.print("[cyan]Setting up SSL with Certbot...[/]")
-        
-        # Install certbot
-        if not self.sudo_execute("apt update && apt install -y certbot python3-certbot-nginx"):
-            console.print("[bold red]Failed to install certbot[/]")
-            return False
+    def _setup_renewal(self) -> bool:
+        """Renew certificates from a randomized systemd timer that reloads nginx only on change."""
+        console.print("[cyan]Setting up certificate renewal timer...[/]")
         
-        # Create webroot directory
-        if not self.sudo_execute("mkdir -p /var/www/html/.well-known/acme-challenge"):
-            console.print("[bold red]Failed to create webroot directory[/]")
+        # certbot runs deploy hooks only after a certificate was renewed
+        if not install_template(self, "certbot-deploy-hook.sh", CERTBOT_DEPLOY_HOOK, mode="755"):
             return False
         
-        # Obtain SSL certificate for both www and non-www
-        certbot_cmd = (
-            f"certbot certonly --webroot -w /var/www/html -d {self.config.server_hostname} "
-            f"-d www.{self.config.server_hostname} "
-            f"--non-interactive --agree-tos --email {self.config.ssl_email}"
+        # Migrate the nightly crontab entry installed by earlier versions
+        migrate_cmd = (
+            "sh -c \"if crontab -l 2>/dev/null | grep -q 'certbot renew'; then "
+            "crontab -l | grep -v 'certbot renew' | crontab -; echo migrated; fi\""
         )
-        if not self.sudo_execute(certbot_cmd):
-            console.print("[bold red]Failed to obtain SSL certificate[/]")
+        exit_code, stdout, stderr = self.ssh.execute(migrate_cmd, sudo=True)
+        if exit_code != 0:
+            console.print("[bold red]Failed to remove the certbot crontab entry[/]")
             return False
-        
-        # Setup auto-renewal
-        cron_cmd = (
-            "crontab -l | grep -q 'certbot renew' || "
-            "(crontab -l 2>/dev/null; echo '0 0 * * * certbot renew --quiet --no-self-upgrade && systemctl reload nginx') | crontab -"
-        )
-        if not self.sudo_execute(cron_cmd):
-            console.print("[bold red]Failed to setup certbot auto-renewal[/]")
+        if "migrated" in stdout:
+            console.print("[cyan]Removed the nightly certbot crontab entry in favour of the systemd timer[/]")
+        
+        # The Debian/Ubuntu certbot package ships a randomized twice-daily timer
+        exit_code, stdout, stderr = self.ssh.execute("systemctl cat certbot.timer", sudo=True)
+        if exit_code == 0:
+            timer_name = "certbot.timer"
+        else:
+            timer_name = "certbot-renew.timer"
+            for unit_name in ("certbot-renew.service", timer_name):
+                if not install_template(self, unit_name, f"/etc/systemd/system/{unit_name}"):
+                    return False
+        
+        if not self.sudo_execute(f"systemctl daemon-reload && systemctl enable --now {timer_name}"):
+            console.print(f"[bold red]Failed to enable {timer_name}[/]")
             return False
         
-        # Create final nginx configuration with www redirection
-        final_conf = self.renderer.render_to_file("ssl.conf")
-        if not self.ssh.upload_file(final_conf, f"/tmp/{self.config.server_hostname}.conf"):
-            console.print("[bold red]Failed to upload final nginx configuration[/]")
+        console.print(f"[green]Certificates renew from {timer_name}, nginx reloads only after a renewal[/]")
+        return True
+
+    def _setup_session_tickets(self) -> bool:
+        """Create session ticket keys and a timer that rotates them."""
+        console.print("[cyan]Setting up TLS session ticket key rotation...[/]")
+        
+        if not install_template(self, "rotate-ticket-keys.sh", TICKET_KEY_ROTATE_SCRIPT, mode="755"):
             return False
         
-        if not self.sudo_execute(f"mv /tmp/{self.config.server_hostname}.conf /etc/nginx/conf.d/{self.config.server_hostname}.conf"):
-            console.print("[bold red]Failed to move final nginx configuration[/]")
+        if not self.sudo_execute(f"{TICKET_KEY_ROTATE_SCRIPT} --init"):
+            console.print("[bold red]Failed to create session ticket keys[/]")
             return False
         
-        # Reload nginx
-        if not self.sudo_execute("systemctl reload nginx"):
-            console.print("[bold red]Failed to reload nginx[/]")
+        for unit_name in ("nginx-ticket-keys.service", "nginx-ticket-keys.timer"):
+            if not install_template(self, unit_name, f"/etc/systemd/system/{unit_name}"):
+                return False
+        
+        if not self.sudo_execute("systemctl daemon-reload && systemctl enable --now nginx-ticket-keys.timer"):
+            console.print("[bold red]Failed to enable the session ticket key rotation timer[/]")
             return False
         
-        console.print("[green]Successfully set up SSL with Certbot for www and non-www domains[/]")
         return True
 
+    def _certificate_has_ocsp(self) -> bool:
+        """Check whether the certificate names an OCSP responder to staple from."""
+        cert_path = f"/etc/letsencrypt/live/{self.config.server_hostname}/cert.pem"
+        exit_code, stdout, stderr = self.ssh.execute(f"openssl x509 -noout -ocsp_uri -in {cert_path}", sudo=True)
+        if exit_code == 0 and stdout.strip():
+            console.print("[cyan]Certificate has an OCSP responder, enabling OCSP stapling[/]")
+            return True
+        
+        console.print("[dim]Certificate has no OCSP responder, OCSP stapling disabled[/]")
+        return False
+
+
+class NginxWWWTask(NginxSSLTask):
+    """Task for setting up Nginx with SSL and www redirection."""
+
+    name = "nginx_www"
+    description = "Configure Nginx with SSL and www redirection"
+    depends_on = ["nginx_basic"]
+    final_template = "ssl.conf"
+
+    def certificate_domains(self) -> List[str]:
+        """Domains to include in the certificate, both www and non-www."""
+        return [self.config.server_hostname, f"www.{self.config.server_hostname}"]
+
 
 # For backward compatibility
 class NginxTask(NginxSSLTask):
@@ -250,4 +425,4 @@ class NginxTask(NginxSSLTask):
 
     name = "nginx"
     description = "Configure Nginx with SSL"
-    depends_on = ["packages"] 
\ No newline at end of file
+    depends_on = ["packages"]
\ No newline at end of file
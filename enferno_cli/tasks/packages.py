@@ -1,11 +1,8 @@
 """Task for installing essential packages."""
 
-from rich.console import Console
-
+from enferno_cli.core.events import console
 from enferno_cli.core.task import Task
 
-console = Console()
-
 
 class PackagesTask(Task):
     """Task for installing essential packages."""
@@ -70,7 +67,7 @@ class PackagesTask(Task):
                 return False
             
             # Check PostgreSQL status using is-active (non-interactive)
-            exit_code, stdout, stderr = self.ssh.execute("systemctl is-active postgresql", sudo=True)
+            exit_code, stdout, stderr = self.ssh.service("is-active", "postgresql")
             if exit_code == 0 and stdout.strip() == "active":
                 console.print("[green]PostgreSQL is running correctly[/]")
             else:
@@ -0,0 +1,144 @@
+"""Task for setting up PgBouncer connection pooling."""
+
+from typing import Dict
+
+from enferno_cli.core.events import console
+from enferno_cli.core.sizing import CelerySizing, UwsgiSizing, size_celery, size_uwsgi
+from enferno_cli.core.task import Task
+
+PGBOUNCER_PORT = 6432
+
+# SQLAlchemy's default QueuePool keeps up to 5 connections plus 10 overflow per process
+SQLALCHEMY_CONNECTIONS_PER_PROCESS = 15
+
+# PostgreSQL throughput peaks well below this; extra transactions queue in PgBouncer
+MAX_SERVER_POOL_SIZE = 100
+
+
+def compute_pool_sizes(uwsgi: UwsgiSizing, celery: CelerySizing) -> Dict[str, int]:
+    """Size the PgBouncer pools from the worker counts.
+
+    In transaction pooling a server connection is only held for the duration of a
+    transaction, so the pool needs one connection per thread that can be inside a
+    transaction at the same time. Client connections are bounded by the SQLAlchemy
+    pool of every uwsgi and celery process.
+
+    Args:
+        uwsgi: Resolved uwsgi worker sizing
+        celery: Resolved celery worker sizing
+
+    Returns:
+        Mapping of pool setting name to value
+    """
+    concurrent_transactions = min(uwsgi.processes * uwsgi.threads + celery.autoscale_max, MAX_SERVER_POOL_SIZE)
+    processes = uwsgi.processes + celery.processes
+    return {
+        "default_pool_size": concurrent_transactions,
+        "reserve_pool_size": max(2, concurrent_transactions // 4),
+        "max_client_conn": max(100, processes * SQLALCHEMY_CONNECTIONS_PER_PROCESS),
+    }
+
+
+class PgBouncerTask(Task):
+    """Task for pooling PostgreSQL connections through PgBouncer."""
+
+    name = "pgbouncer"
+    description = "Set up PgBouncer connection pooling for PostgreSQL"
+    depends_on = ["database", "enferno"]
+
+    def run(self) -> bool:
+        """Run the task."""
+        if not self.config.pgbouncer_enabled:
+            console.print("[yellow]PgBouncer is disabled in configuration. Skipping...[/]")
+            return True
+
+        if not self.config.postgres_enabled:
+            console.print("[yellow]PgBouncer requires PostgreSQL, which is not enabled. Skipping...[/]")
+            return True
+
+        console.print("[cyan]Setting up PgBouncer connection pooling...[/]")
+
+        # Install PgBouncer if not installed
+        if self.ssh.package_versions(["pgbouncer"])["pgbouncer"] is None:
+            if not self.sudo_execute("apt install -y pgbouncer"):
+                console.print("[bold red]Failed to install PgBouncer[/]")
+                return False
+
+        # Render configuration with pools sized from the worker counts
+        facts = self.get_host_facts()
+        uwsgi = size_uwsgi(facts, self.config)
+        try:
+            celery = size_celery(facts, self.config)
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
+            return False
+        pool_sizes = compute_pool_sizes(uwsgi, celery)
+        console.print(
+            f"[cyan]Pool sizes: {pool_sizes['default_pool_size']} server connections "
+            f"(+{pool_sizes['reserve_pool_size']} reserve), "
+            f"{pool_sizes['max_client_conn']} client connections[/]"
+        )
+        extra_vars = dict(pool_sizes, pgbouncer_port=PGBOUNCER_PORT, **uwsgi.to_vars(), **celery.to_vars())
+
+        for template_name, remote_name in (
+            ("pgbouncer.ini", "pgbouncer.ini"),
+            ("pgbouncer-userlist.txt", "userlist.txt"),
+        ):
+            rendered = self.renderer.render_to_file(template_name, extra_vars=extra_vars)
+            if not self.ssh.upload_file(rendered, f"/tmp/{remote_name}"):
+                console.print(f"[bold red]Failed to upload {remote_name}[/]")
+                return False
+
+            remote_path = f"/etc/pgbouncer/{remote_name}"
+            if not self.sudo_execute(f"mv /tmp/{remote_name} {remote_path}"):
+                console.print(f"[bold red]Failed to move {remote_name}[/]")
+                return False
+
+            if not self.sudo_execute(f"chown postgres:postgres {remote_path} && chmod 640 {remote_path}"):
+                console.print(f"[bold red]Failed to set permissions on {remote_path}[/]")
+                return False
+
+        # Enable and restart PgBouncer
+        if not self.sudo_execute("systemctl enable pgbouncer"):
+            console.print("[bold red]Failed to enable pgbouncer service[/]")
+            return False
+
+        if not self.sudo_execute("systemctl restart pgbouncer"):
+            console.print("[bold red]Failed to restart pgbouncer service[/]")
+            return False
+
+        # Point the application at the pooler
+        if not self._update_database_url():
+            return False
+
+        console.print("[green]Successfully set up PgBouncer connection pooling[/]")
+        return True
+
+    def _update_database_url(self) -> bool:
+        """Point the application's database URL at PgBouncer."""
+        console.print("[cyan]Pointing the application database URL at PgBouncer...[/]")
+
+        app_dir = f"/home/{self.config.user_name}/{self.config.server_hostname}"
+        env_file = f"{app_dir}/.env"
+        database_url = (
+            f"postgresql://{self.config.user_name}:{self.config.password}"
+            f"@127.0.0.1:{PGBOUNCER_PORT}/{self.config.user_name}"
+        )
+
+        # Replace the existing setting or append it if missing
+        update_cmd = (
+            f"sudo -u {self.config.user_name} bash -c '"
+            f"touch {env_file} && "
+            f"if grep -q \"^SQLALCHEMY_DATABASE_URI=\" {env_file}; then "
+            f"sed -i \"s|^SQLALCHEMY_DATABASE_URI=.*|SQLALCHEMY_DATABASE_URI={database_url}|\" {env_file}; "
+            f"else echo \"SQLALCHEMY_DATABASE_URI={database_url}\" >> {env_file}; fi'"
+        )
+        if not self.sudo_execute(update_cmd):
+            console.print(f"[bold red]Failed to update database URL in {env_file}[/]")
+            return False
+
+        # Restart application services if they are already running
+        if not self.sudo_execute("systemctl try-restart enferno clry"):
+            console.print("[yellow]Failed to restart application services, restart them manually[/]")
+
+        return True
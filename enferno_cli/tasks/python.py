@@ -1,11 +1,8 @@
 """Task for installing modern Python version."""
 
-from rich.console import Console
-
+from enferno_cli.core.events import console
 from enferno_cli.core.task import Task
 
-console = Console()
-
 
 class PythonTask(Task):
     """Task for installing modern Python version."""
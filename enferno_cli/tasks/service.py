@@ -1,10 +1,14 @@
 """Task for configuring systemd services for Enferno."""
 
-from rich.console import Console
+from pathlib import Path
+from typing import Union
 
+from enferno_cli.core.events import console
+from enferno_cli.core.sizing import size_celery, size_uwsgi
 from enferno_cli.core.task import Task
 
-console = Console()
+# How nginx talks to uwsgi: HTTP on python_port or the uwsgi protocol on a unix socket
+UWSGI_TRANSPORTS = ("http", "socket")
 
 
 class ServiceTask(Task):
@@ -18,8 +22,24 @@ class ServiceTask(Task):
         """Run the task."""
         console.print("[cyan]Configuring systemd services for Enferno...[/]")
         
-        # Create service file for Enferno
-        service_file = self.renderer.render_to_file("enferno.service")
+        if self.config.uwsgi_transport not in UWSGI_TRANSPORTS:
+            console.print(
+                f"[bold red]Unknown uwsgi transport '{self.config.uwsgi_transport}'. "
+                f"Choose one of: {', '.join(UWSGI_TRANSPORTS)}[/]"
+            )
+            return False
+        
+        # Size uwsgi workers from host capacity
+        facts = self.get_host_facts()
+        uwsgi = size_uwsgi(facts, self.config)
+        console.print(
+            f"[cyan]uwsgi sizing: processes={uwsgi.processes} threads={uwsgi.threads} "
+            f"listen={uwsgi.listen} reload-on-rss={uwsgi.reload_on_rss}MB[/]"
+        )
+        
+        # Create service file for Enferno (the sizing is recorded in its header)
+        service_vars = dict(uwsgi.to_vars(), cpu_count=facts.cpu_count, memory_mb=facts.memory_mb)
+        service_file = self.renderer.render_to_file("enferno.service", extra_vars=service_vars)
         
         if not self.ssh.upload_file(service_file, "/tmp/enferno.service"):
             console.print("[bold red]Failed to upload enferno.service[/]")
@@ -59,46 +79,105 @@ class ServiceTask(Task):
         """Setup celery service for Enferno."""
         console.print("[cyan]Setting up celery service for Enferno...[/]")
         
+        # Size celery workers from host capacity
+        try:
+            celery = size_celery(self.get_host_facts(), self.config)
+        except ValueError as e:
+            console.print(f"[bold red]{e}[/]")
+            return False
+        
+        if celery.autoscale:
+            console.print(
+                f"[cyan]celery sizing: pool={celery.pool} "
+                f"autoscale={celery.autoscale_min}-{celery.autoscale_max}[/]"
+            )
+        else:
+            console.print(f"[cyan]celery sizing: pool={celery.pool} concurrency={celery.autoscale_max}[/]")
+        
+        # The gevent pool needs gevent installed in the application venv
+        if celery.pool == "gevent" and not self._install_gevent():
+            return False
+        
         # Create celery service file
-        celery_service_file = self.renderer.render_to_file("clry.service")
+        celery_service_file = self.renderer.render_to_file("clry.service", extra_vars=celery.to_vars())
+        if not self._install_unit(celery_service_file, "clry.service"):
+            return False
         
-        if not self.ssh.upload_file(celery_service_file, "/tmp/clry.service"):
-            console.print("[bold red]Failed to upload clry.service[/]")
+        # Run beat in its own unit, or remove a previously installed one
+        if self.config.celery_beat_separate:
+            beat_service_file = self.renderer.render_to_file("clry-beat.service")
+            if not self._install_unit(beat_service_file, "clry-beat.service"):
+                return False
+        else:
+            remove_beat_cmd = (
+                "sh -c 'if [ -f /etc/systemd/system/clry-beat.service ]; then "
+                "systemctl disable --now clry-beat && rm -f /etc/systemd/system/clry-beat.service; fi'"
+            )
+            if not self.sudo_execute(remove_beat_cmd):
+                console.print("[bold red]Failed to remove clry-beat service[/]")
+                return False
+        
+        console.print("[green]Successfully set up celery service for Enferno[/]")
+        return True
+    
+    def _install_unit(self, local_path: Union[str, Path], unit_name: str) -> bool:
+        """Upload, install and enable a systemd unit."""
+        if not self.ssh.upload_file(local_path, f"/tmp/{unit_name}"):
+            console.print(f"[bold red]Failed to upload {unit_name}[/]")
             return False
         
-        if not self.sudo_execute("mv /tmp/clry.service /etc/systemd/system/clry.service"):
-            console.print("[bold red]Failed to move clry.service[/]")
+        if not self.sudo_execute(f"mv /tmp/{unit_name} /etc/systemd/system/{unit_name}"):
+            console.print(f"[bold red]Failed to move {unit_name}[/]")
             return False
         
         # Set permissions
-        if not self.sudo_execute("chmod 644 /etc/systemd/system/clry.service"):
-            console.print("[bold red]Failed to set permissions on clry.service[/]")
+        if not self.sudo_execute(f"chmod 644 /etc/systemd/system/{unit_name}"):
+            console.print(f"[bold red]Failed to set permissions on {unit_name}[/]")
             return False
         
         # Enable service
-        if not self.sudo_execute("systemctl enable clry"):
-            console.print("[bold red]Failed to enable clry service[/]")
+        service_name = unit_name.rsplit(".", 1)[0]
+        if not self.sudo_execute(f"systemctl enable {service_name}"):
+            console.print(f"[bold red]Failed to enable {service_name} service[/]")
             return False
         
-        console.print("[green]Successfully set up celery service for Enferno[/]")
+        return True
+    
+    def _install_gevent(self) -> bool:
+        """Install gevent into the application venv."""
+        console.print("[cyan]Installing gevent for the celery gevent pool...[/]")
+        app_dir = f"/home/{self.config.user_name}/{self.config.server_hostname}"
+        install_cmd = (
+            f"sudo -u {self.config.user_name} bash -c 'cd {app_dir} && source ~/.profile && "
+            f"source ~/.bashrc 2>/dev/null || true && uv pip install --python .venv/bin/python gevent'"
+        )
+        exit_code, stdout, stderr = self.ssh.execute(install_cmd, sudo=True)
+        if exit_code != 0:
+            console.print(f"[bold red]Failed to install gevent. Error: {stderr}[/]")
+            return False
         return True
         
     def start_services(self) -> bool:
         """Start Enferno and Celery services."""
         console.print("[cyan]Starting Enferno and Celery services...[/]")
         
-        # Start Enferno service
-        if not self.sudo_execute("systemctl start enferno"):
+        # Restart rather than start so that unit changes apply on re-runs
+        if not self.sudo_execute("systemctl restart enferno"):
             console.print("[bold red]Failed to start enferno service[/]")
             return False
             
         # Start Celery service
-        if not self.sudo_execute("systemctl start clry"):
+        if not self.sudo_execute("systemctl restart clry"):
             console.print("[bold red]Failed to start celery service[/]")
             return False
+        
+        # Start Celery beat service
+        if self.config.celery_beat_separate and not self.sudo_execute("systemctl restart clry-beat"):
+            console.print("[bold red]Failed to start celery beat service[/]")
+            return False
             
-        # Ensure Nginx is running
-        if not self.sudo_execute("systemctl restart nginx"):
+        # Ensure Nginx is running with a valid configuration
+        if not self.sudo_execute("sh -c \"nginx -t && systemctl restart nginx\""):
             console.print("[bold red]Failed to restart nginx service[/]")
             return False
             
@@ -0,0 +1,147 @@
+"""Task for tuning the default SQLite database."""
+
+from typing import Optional
+
+from enferno_cli.core.events import console
+from enferno_cli.core.task import Task
+
+# WAL relies on shared memory between processes on the same host
+NETWORK_FILESYSTEMS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "ceph", "glusterfs",
+    "fuse.glusterfs", "fuse.sshfs", "lustre",
+}
+
+SQLITE_SYNCHRONOUS = "NORMAL"
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MAX_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class SQLiteTask(Task):
+    """Task for tuning SQLite for concurrent uwsgi and celery access."""
+
+    name = "sqlite"
+    description = "Enable WAL mode and tune SQLite for concurrent access"
+    depends_on = ["enferno"]
+    # The database path and site-packages directory are read from the server
+    compilable = False
+
+    def run(self) -> bool:
+        """Run the task."""
+        if self.config.postgres_enabled:
+            console.print("[yellow]PostgreSQL is enabled, SQLite tuning is not needed. Skipping...[/]")
+            return True
+
+        console.print("[cyan]Tuning SQLite database for concurrent access...[/]")
+
+        app_dir = f"/home/{self.config.user_name}/{self.config.server_hostname}"
+        venv_python = f"{app_dir}/.venv/bin/python"
+
+        db_path = self.config.sqlite_path or self._find_database(app_dir)
+        if not db_path:
+            console.print("[yellow]No SQLite database found for the application. Skipping...[/]")
+            return True
+        console.print(f"[cyan]SQLite database: {db_path}[/]")
+
+        # WAL requires a local filesystem
+        exit_code, stdout, stderr = self.ssh.execute(f"findmnt -no FSTYPE --target {db_path}")
+        fs_type = stdout.strip()
+        if exit_code != 0 or not fs_type:
+            console.print(f"[bold red]Could not determine the filesystem of {db_path}[/]")
+            return False
+        if fs_type in NETWORK_FILESYSTEMS:
+            console.print(
+                f"[bold red]{db_path} is on a {fs_type} network filesystem. "
+                "SQLite WAL mode requires a local filesystem; move the database or use PostgreSQL.[/]"
+            )
+            return False
+
+        # journal_mode=WAL is persistent and stored in the database file
+        wal_cmd = (
+            f"sudo -u {self.config.user_name} {venv_python} -c "
+            f"\"import sqlite3; print(sqlite3.connect('{db_path}', timeout=30)"
+            f".execute('PRAGMA journal_mode=WAL').fetchone()[0])\""
+        )
+        exit_code, stdout, stderr = self.ssh.execute(wal_cmd, sudo=True)
+        if exit_code != 0 or stdout.strip().lower() != "wal":
+            console.print(f"[bold red]Failed to enable WAL mode. Error: {stderr or stdout}[/]")
+            return False
+        console.print("[green]WAL journal mode enabled[/]")
+
+        # The remaining pragmas are per connection, so install a startup hook in the venv
+        if not self._install_pragmas_hook(venv_python):
+            return False
+
+        # Restart application services if they are already running
+        if not self.sudo_execute("systemctl try-restart enferno clry"):
+            console.print("[yellow]Failed to restart application services, restart them manually[/]")
+
+        console.print("[green]Successfully tuned SQLite database[/]")
+        return True
+
+    def _find_database(self, app_dir: str) -> Optional[str]:
+        """Resolve the SQLite database file from the application's .env."""
+        exit_code, stdout, stderr = self.ssh.execute(
+            f"grep -m1 '^SQLALCHEMY_DATABASE_URI=' {app_dir}/.env", sudo=True
+        )
+        uri = stdout.strip().partition("=")[2].strip("'\"") if exit_code == 0 else ""
+        if uri and not uri.startswith("sqlite:///"):
+            return None
+
+        # Relative paths are resolved against the Flask instance folder
+        path = uri[len("sqlite:///"):].split("?")[0] if uri else ""
+        if path.startswith("/"):
+            candidates = [path]
+        elif path:
+            candidates = [f"{app_dir}/instance/{path}", f"{app_dir}/{path}"]
+        else:
+            candidates = [f"{app_dir}/instance/enferno.sqlite3", f"{app_dir}/enferno.sqlite3"]
+
+        for candidate in candidates:
+            if self.ssh.file_exists(candidate):
+                return candidate
+        return None
+
+    def _install_pragmas_hook(self, venv_python: str) -> bool:
+        """Install a .pth hook that applies the connection pragmas in every venv process."""
+        exit_code, stdout, stderr = self.ssh.execute(
+            f"{venv_python} -c \"import sysconfig; print(sysconfig.get_paths()['purelib'])\"",
+            sudo=True,
+        )
+        site_packages = stdout.strip()
+        if exit_code != 0 or not site_packages:
+            console.print("[bold red]Failed to locate the application's site-packages[/]")
+            return False
+
+        facts = self.get_host_facts()
+        mmap_size = min(SQLITE_MAX_MMAP_SIZE, facts.memory_kb * 1024 // 8)
+        extra_vars = {
+            "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+            "synchronous": SQLITE_SYNCHRONOUS,
+            "mmap_size": mmap_size,
+        }
+        console.print(
+            f"[cyan]Connection pragmas: synchronous={SQLITE_SYNCHRONOUS}, "
+            f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}ms, mmap_size={mmap_size // (1024 * 1024)}MB[/]"
+        )
+
+        for template_name, remote_name in (
+            ("sqlite-pragmas.py", "enferno_sqlite_pragmas.py"),
+            ("enferno_sqlite.pth", "enferno_sqlite.pth"),
+        ):
+            rendered = self.renderer.render_to_file(template_name, extra_vars=extra_vars)
+            if not self.ssh.upload_file(rendered, f"/tmp/{remote_name}"):
+                console.print(f"[bold red]Failed to upload {remote_name}[/]")
+                return False
+
+            remote_path = f"{site_packages}/{remote_name}"
+            if not self.sudo_execute(f"mv /tmp/{remote_name} {remote_path}"):
+                console.print(f"[bold red]Failed to move {remote_name}[/]")
+                return False
+
+            if not self.sudo_execute(
+                f"chown {self.config.user_name}:{self.config.user_name} {remote_path} && chmod 644 {remote_path}"
+            ):
+                console.print(f"[bold red]Failed to set permissions on {remote_path}[/]")
+                return False
+
+        return True
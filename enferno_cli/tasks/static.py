@@ -0,0 +1,79 @@
+"""Task for precompressing the application's static assets."""
+
+from enferno_cli.core.events import console
+from enferno_cli.core.task import Task
+
+# Text formats worth compressing; images and fonts like woff2 are already compressed
+COMPRESSIBLE_EXTENSIONS = (
+    "css", "js", "mjs", "map", "json", "svg", "xml", "txt", "html", "wasm", "ttf", "otf", "eot", "ico",
+)
+
+# Below this size the compressed file saves less than a network packet
+MIN_COMPRESS_SIZE = "+1k"
+
+
+def precompress_command(static_dir: str, user: str, extension: str, compress: str) -> str:
+    """Build a shell command that writes compressed siblings for static files.
+
+    Files are only recompressed when the original is newer than its compressed
+    sibling, and compressed siblings of compressible files whose original was
+    removed are deleted.
+
+    Args:
+        static_dir: Directory holding the static assets
+        user: User owning the application files, who runs the command
+        extension: Extension of the compressed files ('gz' or 'br')
+        compress: Command that compresses "$f" to "$f.<extension>", keeping the original
+
+    Returns:
+        Shell command string
+    """
+    names = " -o ".join(f"-name '*.{ext}'" for ext in COMPRESSIBLE_EXTENSIONS)
+    # Only names this task writes, so archives the app ships (report.csv.gz) are left alone
+    compressed_names = " -o ".join(f"-name '*.{ext}.{extension}'" for ext in COMPRESSIBLE_EXTENSIONS)
+    return (
+        f"sudo -u {user} find {static_dir} -type f \\( {names} \\) -size {MIN_COMPRESS_SIZE} -exec sh -c '"
+        f"for f; do [ -e \"$f.{extension}\" ] && [ ! \"$f\" -nt \"$f.{extension}\" ] || {compress} || exit 1; done"
+        f"' sh {{}} + && "
+        f"sudo -u {user} find {static_dir} -type f \\( {compressed_names} \\) -exec sh -c '"
+        f"for f; do [ -e \"${{f%.{extension}}}\" ] || rm -f \"$f\"; done"
+        f"' sh {{}} +"
+    )
+
+
+class StaticTask(Task):
+    """Task for precompressing static assets so nginx can serve them with gzip_static."""
+
+    name = "static"
+    description = "Precompress static assets with gzip (and brotli) for nginx"
+    depends_on = ["enferno"]
+
+    def run(self) -> bool:
+        """Run the task."""
+        console.print("[cyan]Precompressing static assets...[/]")
+
+        static_dir = f"/home/{self.config.user_name}/{self.config.server_hostname}/enferno/static"
+        if not self.ssh.file_exists(static_dir):
+            console.print(f"[yellow]Static directory {static_dir} not found. Skipping...[/]")
+            return True
+
+        # gzip at maximum level; -k keeps the original and -n leaves the name and mtime out of the header
+        gzip_cmd = precompress_command(static_dir, self.config.user_name, "gz", "gzip -9 -k -n -f \"$f\"")
+        if not self.sudo_execute(gzip_cmd):
+            console.print("[bold red]Failed to precompress static assets with gzip[/]")
+            return False
+        console.print("[green]gzip variants written[/]")
+
+        if self.config.static_brotli:
+            if not self.sudo_execute("apt install -y brotli"):
+                console.print("[bold red]Failed to install brotli[/]")
+                return False
+
+            brotli_cmd = precompress_command(static_dir, self.config.user_name, "br", "brotli -Z -k -f \"$f\"")
+            if not self.sudo_execute(brotli_cmd):
+                console.print("[bold red]Failed to precompress static assets with brotli[/]")
+                return False
+            console.print("[green]brotli variants written[/]")
+
+        console.print("[green]Successfully precompressed static assets[/]")
+        return True
@@ -0,0 +1,7 @@
+#!/bin/sh
+# Reload nginx after certbot renewed a certificate.
+# certbot runs deploy hooks only for certificates that were actually renewed,
+# so nginx is left alone on the runs where nothing changed.
+set -eu
+
+nginx -t -q && systemctl reload nginx
@@ -0,0 +1,23 @@
+#!/bin/sh
+# Rotate the nginx TLS session ticket keys.
+# nginx encrypts new tickets with current.key and still accepts tickets
+# issued with previous.key, so clients resume across one rotation.
+set -eu
+
+KEY_DIR=/etc/nginx/ticket-keys
+
+umask 077
+mkdir -p "$KEY_DIR"
+
+# --init only creates missing keys, for the first nginx start
+if [ "${1:-}" = "--init" ]; then
+    [ -s "$KEY_DIR/current.key" ] || openssl rand 80 > "$KEY_DIR/current.key"
+    [ -s "$KEY_DIR/previous.key" ] || openssl rand 80 > "$KEY_DIR/previous.key"
+    exit 0
+fi
+
+openssl rand 80 > "$KEY_DIR/next.key"
+mv "$KEY_DIR/current.key" "$KEY_DIR/previous.key"
+mv "$KEY_DIR/next.key" "$KEY_DIR/current.key"
+
+nginx -t -q && systemctl reload nginx
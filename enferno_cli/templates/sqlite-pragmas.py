@@ -0,0 +1,28 @@
+"""SQLite connection tuning managed by enferno-cli - changes will be overwritten.
+
+Loaded at interpreter startup through enferno_sqlite.pth so that every SQLite
+connection opened by uwsgi, celery and the flask CLI uses the same pragmas.
+"""
+
+import sqlite3
+import sqlite3.dbapi2
+
+PRAGMAS = (
+    "PRAGMA busy_timeout = {{ busy_timeout }}",
+    "PRAGMA synchronous = {{ synchronous }}",
+    "PRAGMA mmap_size = {{ mmap_size }}",
+)
+
+_connect = sqlite3.dbapi2.connect
+
+
+def connect(*args, **kwargs):
+    """Open a SQLite connection and apply the tuning pragmas."""
+    connection = _connect(*args, **kwargs)
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+# SQLAlchemy's pysqlite dialect connects through sqlite3.dbapi2
+sqlite3.connect = sqlite3.dbapi2.connect = connect
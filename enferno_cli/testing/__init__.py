@@ -0,0 +1,8 @@
+"""Test harness for running the setup pipeline without a real server.
+
+Requires paramiko, which is a dependency of the CLI anyway.
+"""
+
+from enferno_cli.testing.fake_server import CommandRule, FakeSSHServer, ScriptedShell, ServerStats
+
+__all__ = ["CommandRule", "FakeSSHServer", "ScriptedShell", "ServerStats"]
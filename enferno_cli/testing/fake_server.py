@@ -0,0 +1,540 @@
+"""In-process SSH/SFTP server that stands in for an Ubuntu host.
+
+Example:
+    with FakeSSHServer(ScriptedShell.ubuntu(), rtt=0.1) as server:
+        manager = TaskManager(server.config(selected_tasks=["firewall"]))
+        manager.run_setup(preflight=False)
+        print(server.stats)
+"""
+
+import os
+import queue
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional
+
+import paramiko
+from paramiko import SFTPAttributes, SFTPHandle, SFTPServer, SFTPServerInterface
+from paramiko.sftp import SFTP_OK, SFTP_PERMISSION_DENIED
+
+from enferno_cli.core.config import ServerConfig
+
+DEFAULT_USERNAME = "root"
+DEFAULT_PASSWORD = "enferno"
+
+# Directories every sandbox starts with, so uploads to /tmp work as on a real host
+SANDBOX_DIRS = ("tmp", "etc", "home")
+
+RELAY_CHUNK = 65536
+
+
+@dataclass
+class CommandRule:
+    """Scripted response for commands matching a pattern."""
+
+    pattern: str
+    exit_code: int = 0
+    stdout: str = ""
+    stderr: str = ""
+    # Pad stdout to at least this many bytes, to simulate chatty commands
+    output_bytes: int = 0
+    # Seconds the command "runs" on the server
+    latency: float = 0.0
+
+    def matches(self, command: str) -> bool:
+        """Check whether the rule applies to a command."""
+        return re.search(self.pattern, command) is not None
+
+    def output(self) -> bytes:
+        """Build the stdout bytes sent back for the command."""
+        data = self.stdout.encode("utf-8")
+        missing = self.output_bytes - len(data)
+        if missing > 0:
+            line = b"x" * 79 + b"\n"
+            data += (line * (missing // len(line) + 1))[:missing]
+        return data
+
+
+class ScriptedShell:
+    """Answers commands from a list of rules instead of running them."""
+
+    def __init__(self, rules: Optional[List[CommandRule]] = None, default: Optional[CommandRule] = None):
+        """Initialize the shell.
+
+        Args:
+            rules: Rules tried in order; the first match answers the command
+            default: Response for commands no rule matches (exit 0, no output)
+        """
+        self.rules = list(rules or [])
+        self.default = default or CommandRule(".*")
+        self.history: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, pattern: str, **kwargs) -> "ScriptedShell":
+        """Add a rule that takes precedence over the existing ones.
+
+        Args:
+            pattern: Regular expression searched for in the command
+            **kwargs: CommandRule fields
+
+        Returns:
+            The shell, so calls can be chained
+        """
+        self.rules.insert(0, CommandRule(pattern, **kwargs))
+        return self
+
+    def respond(self, command: str) -> CommandRule:
+        """Record a command and pick its response."""
+        with self._lock:
+            self.history.append(command)
+        return next((rule for rule in self.rules if rule.matches(command)), self.default)
+
+    @classmethod
+    def ubuntu(cls, cpu_count: int = 2, memory_mb: int = 4096, latency: float = 0.0) -> "ScriptedShell":
+        """Build a shell that answers the setup probes like a fresh Ubuntu host.
+
+        Args:
+            cpu_count: CPUs reported by the host probes
+            memory_mb: Memory reported by the host probes
+            latency: Seconds every command takes
+
+        Returns:
+            ScriptedShell with the probe responses
+        """
+        probe = "\n".join([
+            f"cpu_count={cpu_count}",
+            f"memory_kb={memory_mb * 1024}",
+            "rotational=0",
+            "somaxconn=4096",
+            "nr_open=1048576",
+            "disk_free_kb=20971520",
+            "apt_busy=0",
+            "has_apt=1",
+            "os_id=ubuntu",
+            "os_version=24.04",
+            "uid=0",
+            "sudo=1",
+        ]) + "\n"
+        return cls(
+            rules=[
+                CommandRule(r"echo cpu_count=", stdout=probe, latency=latency),
+                CommandRule(
+                    r"ufw status verbose",
+                    stdout="Status: inactive\n---\nAdded user rules (see 'ufw status' for running firewall):\n(None)\n",
+                    latency=latency,
+                ),
+            ],
+            default=CommandRule(".*", latency=latency),
+        )
+
+
+@dataclass
+class ServerStats:
+    """What a client asked of the fake server."""
+
+    connections: int = 0
+    channels: int = 0
+    commands: int = 0
+    sftp_operations: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+
+@lru_cache(maxsize=None)
+def _host_key() -> paramiko.RSAKey:
+    """Generate the host key once per process; key generation is slow."""
+    return paramiko.RSAKey.generate(2048)
+
+
+class _LatencyRelay:
+    """Copy bytes between two sockets, delivering each chunk after a delay.
+
+    Data keeps flowing while earlier chunks are in flight, so the relay adds
+    latency without limiting throughput, like a long network path.
+    """
+
+    def __init__(self, outer: socket.socket, inner: socket.socket, one_way_delay: float):
+        """Start relaying in both directions."""
+        self.delay = one_way_delay
+        for src, dst in ((outer, inner), (inner, outer)):
+            chunks: "queue.Queue" = queue.Queue()
+            threading.Thread(target=self._read, args=(src, chunks), daemon=True).start()
+            threading.Thread(target=self._deliver, args=(dst, chunks), daemon=True).start()
+
+    def _read(self, src: socket.socket, chunks: "queue.Queue") -> None:
+        """Read chunks and stamp them with their delivery time."""
+        while True:
+            try:
+                data = src.recv(RELAY_CHUNK)
+            except OSError:
+                data = b""
+            chunks.put((time.monotonic() + self.delay, data))
+            if not data:
+                return
+
+    def _deliver(self, dst: socket.socket, chunks: "queue.Queue") -> None:
+        """Send chunks once they are due."""
+        while True:
+            due, data = chunks.get()
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                if not data:
+                    dst.shutdown(socket.SHUT_WR)
+                    return
+                dst.sendall(data)
+            except OSError:
+                return
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    """Authentication and channel policy of the fake server."""
+
+    def __init__(self, fake: "FakeSSHServer"):
+        """Initialize the interface for a fake server."""
+        self.fake = fake
+
+    def get_allowed_auths(self, username):
+        """Offer password and public key authentication."""
+        return "password,publickey"
+
+    def check_auth_password(self, username, password):
+        """Accept the configured username and password."""
+        if username == self.fake.username and password == self.fake.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_auth_publickey(self, username, key):
+        """Accept any key for the configured username."""
+        if username == self.fake.username:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        """Allow session channels only."""
+        if kind != "session":
+            return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+        self.fake.stats.count("channels")
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        """Grant PTYs; SSHClient.execute asks for one."""
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        """Answer the command from the scripted shell in the background."""
+        command = command.decode("utf-8") if isinstance(command, bytes) else command
+        threading.Thread(target=self.fake._run_command, args=(channel, command), daemon=True).start()
+        return True
+
+
+class _SandboxHandle(SFTPHandle):
+    """Open file in the SFTP sandbox."""
+
+    def stat(self):
+        """Return the attributes of the open file."""
+        try:
+            return SFTPAttributes.from_stat(os.fstat(self.readfile.fileno()))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, attr):
+        """Change the attributes of the open file."""
+        try:
+            SFTPServer.set_file_attr(self.filename, attr)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+
+class _SandboxSFTPServer(SFTPServerInterface):
+    """SFTP server confined to the fake server's root directory."""
+
+    def __init__(self, server: _ServerInterface, *args, **kwargs):
+        """Initialize the SFTP server for a fake server."""
+        super().__init__(server, *args, **kwargs)
+        self.fake = server.fake
+
+    def _local(self, path: str) -> Optional[str]:
+        """Map a remote path into the sandbox, or None if it escapes it."""
+        self.fake.stats.count("sftp_operations")
+        root = os.path.realpath(self.fake.root)
+        local = os.path.realpath(os.path.join(root, path.lstrip("/")))
+        if os.path.commonpath([root, local]) != root:
+            return None
+        return local
+
+    def list_folder(self, path):
+        """List a directory."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            entries = []
+            for name in os.listdir(local):
+                attr = SFTPAttributes.from_stat(os.lstat(os.path.join(local, name)))
+                attr.filename = name
+                entries.append(attr)
+            return entries
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def stat(self, path):
+        """Stat a path, following symlinks."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            return SFTPAttributes.from_stat(os.stat(local))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def lstat(self, path):
+        """Stat a path without following symlinks."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            return SFTPAttributes.from_stat(os.lstat(local))
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def open(self, path, flags, attr):
+        """Open a file for reading or writing."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            fd = os.open(local, flags | getattr(os, "O_BINARY", 0), getattr(attr, "st_mode", None) or 0o666)
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+        if flags & os.O_WRONLY:
+            mode = "ab" if flags & os.O_APPEND else "wb"
+        elif flags & os.O_RDWR:
+            mode = "a+b" if flags & os.O_APPEND else "r+b"
+        else:
+            mode = "rb"
+        handle = _SandboxHandle(flags)
+        handle.filename = local
+        handle.readfile = handle.writefile = os.fdopen(fd, mode)
+        return handle
+
+    def remove(self, path):
+        """Remove a file."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            os.remove(local)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def rename(self, oldpath, newpath):
+        """Rename a file."""
+        old_local, new_local = self._local(oldpath), self._local(newpath)
+        if old_local is None or new_local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            os.rename(old_local, new_local)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def mkdir(self, path, attr):
+        """Create a directory."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            os.mkdir(local)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def rmdir(self, path):
+        """Remove a directory."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            os.rmdir(local)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+    def chattr(self, path, attr):
+        """Change the attributes of a path."""
+        local = self._local(path)
+        if local is None:
+            return SFTP_PERMISSION_DENIED
+        try:
+            SFTPServer.set_file_attr(local, attr)
+            return SFTP_OK
+        except OSError as e:
+            return SFTPServer.convert_errno(e.errno)
+
+
+class FakeSSHServer:
+    """SSH and SFTP server running in background threads of this process.
+
+    Commands are answered by a ScriptedShell and never executed. SFTP is served
+    from a sandbox directory, so uploaded files can be inspected afterwards.
+    """
+
+    def __init__(
+        self,
+        shell: Optional[ScriptedShell] = None,
+        rtt: float = 0.0,
+        root: Optional[str] = None,
+        username: str = DEFAULT_USERNAME,
+        password: str = DEFAULT_PASSWORD,
+    ):
+        """Initialize the server.
+
+        Args:
+            shell: Shell answering commands (default: ScriptedShell.ubuntu())
+            rtt: Simulated network round-trip time in seconds
+            root: SFTP sandbox directory (default: a temporary directory removed on stop)
+            username: Login accepted by the server
+            password: Password accepted by the server
+        """
+        self.shell = shell or ScriptedShell.ubuntu()
+        self.rtt = rtt
+        self.username = username
+        self.password = password
+        self.stats = ServerStats()
+        self._owns_root = root is None
+        self.root = root or tempfile.mkdtemp(prefix="enferno-sftp-")
+        self._socket: Optional[socket.socket] = None
+        self._transports: List[paramiko.Transport] = []
+        self._stopped = threading.Event()
+
+    @property
+    def port(self) -> int:
+        """Port the server listens on."""
+        if self._socket is None:
+            raise RuntimeError("Server is not started")
+        return self._socket.getsockname()[1]
+
+    def start(self) -> "FakeSSHServer":
+        """Start listening on a free local port.
+
+        Returns:
+            The server, so it can be started inline
+        """
+        for name in SANDBOX_DIRS:
+            os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        _host_key()
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(16)
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the server and remove the temporary sandbox."""
+        self._stopped.set()
+        if self._socket is not None:
+            self._socket.close()
+        for transport in self._transports:
+            transport.close()
+        if self._owns_root:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def config(self, **overrides) -> ServerConfig:
+        """Build a ServerConfig that connects to this server.
+
+        Args:
+            **overrides: ServerConfig fields to set
+
+        Returns:
+            ServerConfig for the fake host
+        """
+        values = {
+            "host": "127.0.0.1",
+            "server_hostname": "enferno.test",
+            "user_name": "enferno",
+            "password": self.password,
+            "ssh_port": self.port,
+            "ansible_user": self.username,
+            "ssl_enabled": False,
+        }
+        values.update(overrides)
+        return ServerConfig(**values)
+
+    def _accept(self) -> None:
+        """Accept connections until stopped."""
+        while not self._stopped.is_set():
+            try:
+                client_socket, _ = self._socket.accept()
+            except OSError:
+                return
+            self.stats.count("connections")
+            threading.Thread(target=self._serve, args=(client_socket,), daemon=True).start()
+
+    def _serve(self, client_socket: socket.socket) -> None:
+        """Run the SSH handshake for one connection and serve its channels."""
+        # Without this, Nagle's algorithm and delayed ACKs add ~40 ms per reply
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        server_socket = client_socket
+        if self.rtt > 0:
+            server_socket, relay_socket = socket.socketpair()
+            _LatencyRelay(client_socket, relay_socket, self.rtt / 2)
+
+        transport = paramiko.Transport(server_socket)
+        transport.add_server_key(_host_key())
+        transport.set_subsystem_handler("sftp", SFTPServer, _SandboxSFTPServer)
+        self._transports.append(transport)
+        try:
+            transport.start_server(server=_ServerInterface(self))
+        except (paramiko.SSHException, EOFError):
+            return
+        self._drain_channels(transport)
+
+    def _drain_channels(self, transport: paramiko.Transport) -> None:
+        """Accept channels and hold them; paramiko only keeps weak references."""
+        channels: List[paramiko.Channel] = []
+        while transport.is_active() and not self._stopped.is_set():
+            channel = transport.accept(timeout=1)
+            if channel is not None:
+                channels = [open_channel for open_channel in channels if not open_channel.closed]
+                channels.append(channel)
+
+    def _run_command(self, channel: paramiko.Channel, command: str) -> None:
+        """Answer one exec request from the scripted shell."""
+        self.stats.count("commands")
+        rule = self.shell.respond(command)
+        if rule.latency:
+            time.sleep(rule.latency)
+        # The exec reply may still be in flight, so the channel is left for the
+        # client to close; closing it here could overtake the reply
+        output = rule.output()
+        if output:
+            channel.sendall(output)
+        if rule.stderr:
+            channel.sendall_stderr(rule.stderr.encode("utf-8"))
+        channel.send_exit_status(rule.exit_code)
+        channel.shutdown_write()
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.stop()
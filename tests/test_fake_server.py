@@ -0,0 +1,109 @@
+"""Run the setup pipeline against the in-process fake SSH server."""
+
+import os
+import shlex
+import shutil
+import subprocess
+
+import pytest
+
+from enferno_cli.core.manager import TaskManager
+from enferno_cli.testing import FakeSSHServer, ScriptedShell
+
+
+@pytest.fixture
+def shell():
+    return ScriptedShell.ubuntu()
+
+
+@pytest.fixture
+def server(shell):
+    with FakeSSHServer(shell) as server:
+        yield server
+
+
+def uploaded_files(server):
+    """Paths of the files uploaded into the SFTP sandbox, relative to its root."""
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), server.root)
+        for directory, _, names in os.walk(server.root)
+        for name in names
+    )
+
+
+def shell_syntax_errors(commands):
+    """Commands that bash cannot parse, as the server's login shell would reject them."""
+    return [
+        command for command in commands
+        if subprocess.run(["bash", "-n", "-c", command], capture_output=True).returncode != 0
+    ]
+
+
+def partly_unprivileged(commands):
+    """sudo commands whose later parts (after &&, ||, ; or |) run as the login user."""
+    operators = {"&&", "||", ";", "|", "&"}
+    partial = []
+    for command in commands:
+        if not command.startswith("sudo "):
+            continue
+        lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        if operators & set(lexer):
+            partial.append(command)
+    return partial
+
+
+def test_setup_succeeds_offline(server, shell):
+    manager = TaskManager(server.config(selected_tasks=["firewall", "nginx_basic"]))
+
+    assert manager.run_setup()
+
+    assert manager.executed_tasks == ["packages", "firewall", "nginx_basic"]
+    assert server.stats.connections == 1
+    assert server.stats.commands == len(shell.history) == 12
+    assert any("ufw --force enable" in command for command in shell.history)
+    assert shell.history[-2:] == ["sudo nginx -t", "sudo systemctl reload nginx"]
+
+    # Commands are answered, not run, so uploads stay where they were written
+    assert uploaded_files(server) == ["tmp/enferno.test.conf", "tmp/nginx-limits.conf", "tmp/nginx.conf"]
+    with open(os.path.join(server.root, "tmp", "enferno.test.conf")) as site_conf:
+        assert "server_name enferno.test" in site_conf.read()
+
+
+def test_failed_nginx_validation_restores_previous_config(server, shell):
+    shell.add(r"nginx -t", exit_code=1, stderr="nginx: configuration file test failed\n")
+    manager = TaskManager(server.config(selected_tasks=["nginx_basic"]))
+
+    assert not manager.run_setup(preflight=False)
+
+    assert "nginx_basic" not in manager.executed_tasks
+    assert not any("systemctl reload nginx" in command for command in shell.history)
+    restore = next(command for command in shell.history if "nginx.conf.bak /etc/nginx/nginx.conf" in command)
+    assert "/etc/nginx/conf.d/enferno.test.conf.bak" in restore
+    # The restored configuration is validated again
+    assert shell.history[-1] == "sudo nginx -t"
+
+
+@pytest.mark.skipif(shutil.which("bash") is None, reason="needs bash to parse the commands")
+def test_service_commands_are_valid_shell(server, shell):
+    manager = TaskManager(server.config(selected_tasks=["service"]))
+
+    assert manager.run_setup(preflight=False)
+
+    # The fake server answers every command, so check what a real shell would do with them
+    assert shell_syntax_errors(shell.history) == []
+    assert any("clry-beat.service" in command for command in shell.history)
+
+
+def test_nginx_commands_run_entirely_as_root_for_sudo_users():
+    shell = ScriptedShell.ubuntu().add(r"nginx -t", exit_code=1)
+    with FakeSSHServer(shell, username="ubuntu") as server:
+        manager = TaskManager(server.config(selected_tasks=["nginx_basic"]))
+        assert manager.config.use_sudo
+
+        assert not manager.run_setup(preflight=False)
+
+    # Backup, restore and validation all ran, and none of them drops root halfway
+    assert any("nginx.conf.bak" in command for command in shell.history)
+    assert partly_unprivileged(shell.history) == []
+    assert shell_syntax_errors(shell.history) == []
@@ -0,0 +1,71 @@
+"""Operations served by the remote helper, run against a local helper process."""
+
+import getpass
+import hashlib
+import subprocess
+import sys
+
+import pytest
+
+from enferno_cli.core.config import ServerConfig
+from enferno_cli.core.events import COMMAND_FINISH, COMMAND_START, EventSink, events
+from enferno_cli.core.helper import HELPER_SOURCE, RemoteHelper
+from enferno_cli.core.ssh import SSHClient
+
+
+class ListSink(EventSink):
+    def __init__(self):
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture
+def client():
+    process = subprocess.Popen(
+        [sys.executable, "-u", str(HELPER_SOURCE)], stdin=subprocess.PIPE, stdout=subprocess.PIPE
+    )
+    helper = RemoteHelper(process.stdout, process.stdin)
+    helper.info, _ = helper.call("hello", user=getpass.getuser())
+
+    config = ServerConfig(
+        host="127.0.0.1", server_hostname="enferno.test", user_name="enferno", password="", remote_helper=True
+    )
+    ssh = SSHClient(config)
+    ssh.helper = helper
+    ssh._connected = True
+    yield ssh
+
+    helper.close()
+    process.wait(timeout=5)
+
+
+@pytest.fixture
+def sink():
+    sink = ListSink()
+    previous = events.sinks
+    events.set_sinks([sink])
+    yield sink
+    events.set_sinks(previous)
+
+
+def commands(sink, event_type):
+    return [event.data["command"] for event in sink.events if event.type == event_type]
+
+
+def test_helper_operations_emit_command_events(client, sink, tmp_path):
+    path = tmp_path / "pgbouncer.ini"
+    path.write_bytes(b"[databases]\n")
+
+    assert client.file_hash(str(path)) == hashlib.sha256(b"[databases]\n").hexdigest()
+    assert client.file_hash(str(tmp_path / "missing")) is None
+    client.package_versions(["pgbouncer"])
+    client.service("is-active", "postgresql")
+
+    started = commands(sink, COMMAND_START)
+    assert commands(sink, COMMAND_FINISH) == started
+    assert len(started) == 4
+    assert started[0].startswith("sudo sha256sum ")
+    assert started[2].startswith("dpkg-query ")
+    assert started[3] == "sudo systemctl is-active postgresql"